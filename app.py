@@ -1,29 +1,208 @@
 import os
-import json
-import requests
+import time
+import datetime
+import itertools
+import importlib
+import threading
+from contextlib import asynccontextmanager
+import orjson
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, StreamingResponse, FileResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import (
+    HTMLResponse, StreamingResponse, FileResponse, JSONResponse, PlainTextResponse, Response
+)
 from fastapi.templating import Jinja2Templates
+from starlette.background import BackgroundTask
 from core.llm_client import TourismAssistant
-from core.memory_manager import SessionManager, CacheManager
+from core.memory_manager import SessionManager, CacheManager, plan_cache_key
+from core.semantic_cache import SemanticCache
+from core.knowledge_index import KnowledgeIndex
+from core.model_router import ModelRouter
+from core.backend_pool import BackendPool
+from core.llm_scheduler import LLMScheduler, LLMOverloadedError
 from core.agents import MultiAgentOrchestrator
-from utils.pdf_generator import generate_pdf
+from core.plan_warmer import PlanWarmer
+from core.plan_jobs import PlanJobQueue
+from core.budget_engine import BudgetEngine, RatesUnavailableError
 from utils.database import UserDatabase
+from utils.sse import TokenFramer, sse_event
+from utils.metrics import metrics
+from utils.rate_limiter import RateLimiter
+from utils.geocoding import GeocodingService, parse_coordinates
+from utils.flight_search import FlightSearchService, date_range
+from utils.compression import encode_body, make_etag, etag_matches
+from utils.static_assets import StaticAssets, StaticAsset
+from config.settings import (
+    SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_DIM, CACHE_EXPIRY,
+    SSE_FRAME_MAX_BYTES, SSE_FRAME_MAX_INTERVAL, RATE_LIMIT_ENABLED, PLAN_WARM_ENABLED,
+    STARTUP_PRELOAD, LLM_WARMUP, PLAN_JOBS_ENABLED, LLM_MAX_CONCURRENT, HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE,
+    BUDGET_RATES_RETRY, FLIGHT_RESULT_LIMIT, FLIGHT_MAX_DATES, STATIC_MAX_AGE, STATIC_UNVERSIONED_MAX_AGE
+)
 
-# === FASTAPI APP ===
-app = FastAPI(title="SmartTour Assistant")
-templates = Jinja2Templates(directory="templates")
+# İlk kullanımda yüklenen ağır modüller (import süresini kısaltmak için)
+DEFERRED_MODULES = ("langchain_ollama", "utils.pdf_generator")
 
 # === GLOBAL MANAGERS ===
-session_manager = SessionManager()
-cache_manager = CacheManager(expiry_seconds=1800)
-agent_orchestrator = MultiAgentOrchestrator()
+# Import yan etkisizdir: veritabanı bağlantısı, bilgi indeksi ve modeller ilk kullanımda
+# (ya da STARTUP_PRELOAD ile arka planda) açılır; arka plan işçileri lifespan'de başlar
 db = UserDatabase()
+session_manager = SessionManager(db=db)
+cache_manager = CacheManager(expiry_seconds=CACHE_EXPIRY)
+response_cache = SemanticCache(
+    max_entries=SEMANTIC_CACHE_SIZE,
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    dim=SEMANTIC_CACHE_DIM,
+    expiry_seconds=CACHE_EXPIRY
+)
+knowledge_index = KnowledgeIndex()
+backend_pool = BackendPool()
+llm_scheduler = LLMScheduler(max_concurrent=LLM_MAX_CONCURRENT * len(backend_pool))
+model_router = ModelRouter(scheduler=llm_scheduler, pool=backend_pool)
+agent_orchestrator = MultiAgentOrchestrator(knowledge_index=knowledge_index, router=model_router)
+rate_limiter = RateLimiter() if RATE_LIMIT_ENABLED else None
+plan_warmer = PlanWarmer(agent_orchestrator, cache_manager, db, model_router, llm_scheduler)
+plan_jobs = PlanJobQueue(db, agent_orchestrator, cache_manager)
+geocoder = GeocodingService(cache_manager)
+budget_engine = BudgetEngine()
+flight_search = FlightSearchService(cache_manager)
+
+metrics.gauge("smarttour_llm_queue_depth", "Requests waiting for an LLM slot", llm_scheduler.queue_depths)
+metrics.gauge("smarttour_llm_active_requests", "Requests holding an LLM slot", lambda: llm_scheduler.active)
+metrics.gauge("smarttour_llm_backend_outstanding", "In-flight LLM requests by model server", backend_pool.outstanding)
+metrics.gauge("smarttour_llm_backend_up", "Model server is in the pool (1) or ejected (0)", backend_pool.up)
+
+
+def warm_up():
+    """Ertelenen modülleri ve (istenirse) modelleri arka planda yükle"""
+    started = time.perf_counter()
+    if STARTUP_PRELOAD:
+        for module in DEFERRED_MODULES:
+            importlib.import_module(module)
+        knowledge_index.ensure_loaded()
+    if LLM_WARMUP:
+        print(f"Model warm-up: {model_router.warm_up()}")
+    metrics.observe("smarttour_span_seconds", time.perf_counter() - started, span="startup.warm_up")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Paylaşılan kaynakların yaşam döngüsü"""
+    if STARTUP_PRELOAD or LLM_WARMUP:
+        # Sunucu hazır olmayı beklemeden isteklere açılır
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    backend_pool.start()
+    if PLAN_WARM_ENABLED:
+        plan_warmer.start()
+    if PLAN_JOBS_ENABLED:
+        plan_jobs.start()
+    yield
+    plan_jobs.stop()
+    plan_warmer.stop()
+    backend_pool.stop()
+    geocoder.close()
+    flight_search.close()
+    db.close()
+
+
+# === FASTAPI APP ===
+app = FastAPI(title="SmartTour Assistant", lifespan=lifespan)
+templates = Jinja2Templates(directory="templates")
+static_assets = StaticAssets()
+# Ana sayfada isteğe bağlı veri yok: şablon başlangıçta bir kez işlenip sıkıştırılır
+index_page = static_assets.add_page(
+    "index.html", templates.get_template("index.html").render(asset=static_assets.url)
+)
+
+
+def overloaded_response(error: LLMOverloadedError) -> JSONResponse:
+    """Model kuyruğu dolu: istemci Retry-After süresi sonra tekrar denesin"""
+    return JSONResponse(
+        {"error": str(error), "retry_after": error.retry_after},
+        status_code=503,
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
 
-@app.get("/", response_class=HTMLResponse)
+def rates_unavailable_response(error: RatesUnavailableError) -> JSONResponse:
+    """Kur tablosu alınamadı: bir sonraki yenileme denemesinden sonra tekrar denensin"""
+    return JSONResponse(
+        {"error": str(error), "retry_after": BUDGET_RATES_RETRY},
+        status_code=503,
+        headers={"Retry-After": str(BUDGET_RATES_RETRY)}
+    )
+
+
+def cached_json(request: Request, payload, etag: str) -> Response:
+    """ETag'li (koşullu GET destekli) ve gerekirse sıkıştırılmış JSON yanıtı"""
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    body, encoding_headers = encode_body(orjson.dumps(payload), request.headers.get("accept-encoding"))
+    headers.update(encoding_headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def asset_response(request: Request, asset: StaticAsset, cache_control: str) -> Response:
+    """Önceden sıkıştırılmış temsil ya da 304 (istek başına sıkıştırma/işleme yok)"""
+    status, body, headers = asset.select(
+        request.headers.get("accept-encoding"), request.headers.get("if-none-match"), cache_control
+    )
+    if status == 304:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type=asset.media_type, headers=headers)
+
+
+def page(rows: list, limit: int, oldest_first: bool = False) -> tuple:
+    """limit + 1 satırdan sayfa ve sonraki sayfanın imleci (en eski kaydın id'si)"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[1:] if oldest_first else rows[:limit]
+    return rows, rows[0 if oldest_first else -1]["id"]
+
+
+@app.middleware("http")
+async def rate_limit(request: Request, call_next):
+    """Kullanıcı ve endpoint sınıfı başına token-bucket limiti"""
+    route_class = rate_limiter.classify(request.url.path) if rate_limiter else None
+    if route_class is None:
+        return await call_next(request)
+
+    user_id = session_manager.generate_user_id(request.client.host)
+    if rate_limiter.blocking:
+        # Paylaşılan SQLite deposu event loop'u bloklamasın
+        result = await run_in_threadpool(rate_limiter.hit, route_class, user_id)
+    else:
+        result = rate_limiter.hit(route_class, user_id)
+    headers = result.headers()
+    if not result.allowed:
+        return JSONResponse(
+            {"error": "Rate limit exceeded", "retry_after": int(headers["Retry-After"])},
+            status_code=429,
+            headers=headers
+        )
+
+    response = await call_next(request)
+    response.headers.update(headers)
+    return response
+
+
+@app.api_route("/", methods=["GET", "HEAD"], response_class=HTMLResponse)
 async def home(request: Request):
-    """Ana sayfa"""
-    return templates.TemplateResponse("index.html", {"request": request})
+    """Ana sayfa (load balancer sağlık kontrolleri HEAD gönderebilir)"""
+    return asset_response(request, index_page, "public, no-cache")
+
+
+@app.api_route("/static/{name:path}", methods=["GET", "HEAD"])
+async def static_file(request: Request, name: str):
+    """CSS/JS dosyaları; güncel sürümü isteyen URL'ler süresiz önbelleklenir"""
+    asset = static_assets.get(name)
+    if asset is None:
+        return JSONResponse({"error": "Not found"}, status_code=404)
+    if request.query_params.get("v") == asset.version:
+        cache_control = f"public, max-age={STATIC_MAX_AGE}, immutable"
+    else:
+        cache_control = f"public, max-age={STATIC_UNVERSIONED_MAX_AGE}"
+    return asset_response(request, asset, cache_control)
 
 
 @app.post("/chat")
@@ -40,47 +219,67 @@ async def chat(request: Request):
         
         # Kullanıcı oturumunu al
         memory = session_manager.get_session(user_id)
-        assistant = TourismAssistant(memory=memory)
+        assistant = TourismAssistant(
+            router=model_router,
+            memory=memory,
+            response_cache=response_cache,
+            knowledge_index=knowledge_index,
+            user_id=user_id,
+            budget_engine=budget_engine,
+            flight_search=flight_search,
+            interest_summary=session_manager.get_interest_summary(user_id)
+        )
 
         # === LOCATION ENRICHMENT ===
-        if user_location:
-            lat, lon = user_location["lat"], user_location["lon"]
-            cache_key = f"geo:{lat}:{lon}"
-            
-            city = cache_manager.get(cache_key)
-            if not city:
-                try:
-                    geo_url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={lon}"
-                    geo_resp = requests.get(geo_url, headers={"User-Agent": "SmartTour"}, timeout=5)
-                    if geo_resp.status_code == 200:
-                        geo_data = geo_resp.json()
-                        city = (geo_data.get("address", {}).get("city") or
-                               geo_data.get("address", {}).get("town") or
-                               geo_data.get("address", {}).get("village") or "your location")
-                        cache_manager.set(cache_key, city)
-                except Exception as e:
-                    print(f"Geocoding error: {e}")
-                    city = "your location"
+        coordinates = parse_coordinates(user_location) if user_location else None
+        if coordinates:
+            # Cache ya da yerel tablodan hemen; bilinmeyen hücreler arka planda çözülür
+            city = geocoder.lookup(*coordinates) or "your location"
             
             if "around me" in user_input.lower() or "near me" in user_input.lower():
                 user_input = f"I'm currently in {city}. {user_input}"
 
         # === STREAMING RESPONSE ===
+        request_started = time.perf_counter()
+        stream = assistant.chat_stream(user_input)
+
+        # İlk parça yanıt başlamadan alınır: LLM kuyruğu reddederse 503 dönebilsin
+        try:
+            first_chunk = await run_in_threadpool(next, stream, None)
+        except LLMOverloadedError as e:
+            return overloaded_response(e)
+
+        parts = []
+        
+        def collect():
+            chunks = itertools.chain([first_chunk], stream) if first_chunk is not None else stream
+            for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+        
+        # Model token'ları thread pool'da üretilir (event loop bloklanmaz); çerçeve
+        # süresi dolunca tampon, sonraki token beklenmeden gönderilir
         async def generate_stream():
-            full_response = ""
+            framer = TokenFramer(max_bytes=SSE_FRAME_MAX_BYTES, max_interval=SSE_FRAME_MAX_INTERVAL)
             try:
-                for chunk in assistant.chat_stream(user_input):
-                    full_response += chunk
-                    yield f"data: {json.dumps({'token': chunk})}\n\n"
+                async for frame in framer.aframe_stream(collect(), run_in_threadpool):
+                    yield frame
                 
                 # Veritabanına kaydet
-                session_manager.save_message(user_id, user_input, full_response)
+                with metrics.span("chat.save"):
+                    await run_in_threadpool(session_manager.save_message, user_id, user_input, "".join(parts))
+                metrics.observe("smarttour_span_seconds", time.perf_counter() - request_started, span="chat.request")
                 
-                yield f"data: {json.dumps({'done': True})}\n\n"
+                yield sse_event({"done": True})
             except Exception as e:
-                yield f"data: {json.dumps({'error': str(e)})}\n\n"
+                yield sse_event({"error": str(e)})
+        
+        def refresh_interests():
+            # Yanıt bittikten sonra: done olayı ilgi alanı özetini beklemez
+            session_manager.set_interest_summary(user_id, assistant.update_interest_summary())
         
-        return StreamingResponse(generate_stream(), media_type="text/event-stream")
+        return StreamingResponse(generate_stream(), media_type="text/event-stream",
+                                 background=BackgroundTask(refresh_interests))
     
     except Exception as e:
         print(f"Chat error: {e}")
@@ -105,6 +304,8 @@ async def generate_pdf_route(request: Request):
         if "recommendations" not in data:
             data["recommendations"] = ["No recommendations provided"]
         
+        from utils.pdf_generator import generate_pdf
+        
         filename = f"travel_plan_{data.get('city', 'plan')}_{os.urandom(4).hex()}.pdf"
         output_path = generate_pdf(data, filename)
         
@@ -140,22 +341,44 @@ async def create_plan(request: Request):
         days = data.get("days", 3)
         interests = data.get("interests", [])
         
+        # İsteğe bağlı gider kalemleri: özet, tahmin yerine hesaplanan toplamları kullanır
+        budget = None
+        budget_request = data.get("budget")
+        if budget_request:
+            try:
+                if not isinstance(budget_request, dict):
+                    raise ValueError("budget must be an object with items")
+                budget = await run_in_threadpool(
+                    budget_engine.estimate, budget_request.get("items"), budget_request.get("currency"),
+                    days, budget_request.get("travelers", 1)
+                )
+            except ValueError as e:
+                return JSONResponse({"error": f"Invalid budget: {e}"}, status_code=400)
+            except RatesUnavailableError as e:
+                return rates_unavailable_response(e)
+        
         # Cache kontrolü
-        cache_key = f"plan:{city}:{days}:{'-'.join(interests)}"
+        cache_key = plan_cache_key(city, days, interests, budget)
         cached_plan = cache_manager.get(cache_key)
         
         if cached_plan:
             return JSONResponse(cached_plan)
         
-        # Multi-agent ile plan oluştur
-        plan = agent_orchestrator.create_complete_plan(city, days, interests)
+        client_ip = request.client.host
+        user_id = session_manager.generate_user_id(client_ip)
+        
+        # Multi-agent ile plan oluştur (thread pool'da: LLM kuyruğu event loop'u bloklamasın)
+        try:
+            plan = await run_in_threadpool(
+                agent_orchestrator.create_complete_plan, city, days, interests, user_id=user_id, budget=budget
+            )
+        except LLMOverloadedError as e:
+            return overloaded_response(e)
         
         # Cache'e kaydet
         cache_manager.set(cache_key, plan)
         
         # Veritabanına kaydet
-        client_ip = request.client.host
-        user_id = session_manager.generate_user_id(client_ip)
         db.save_travel_plan(
             user_id=user_id,
             title=f"{city} - {days} Days",
@@ -171,24 +394,182 @@ async def create_plan(request: Request):
         return JSONResponse({"error": str(e)}, status_code=500)
 
 
+def job_status(job: dict) -> dict:
+    """İşin istemciye gösterilen durumu"""
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "error": job["error"] if job["status"] in ("queued", "failed") else None,
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+
+@app.post("/budget")
+async def estimate_budget(request: Request):
+    """Gider kalemlerini tek kur tablosuyla hedef para birimine çevir ve topla"""
+    try:
+        data = await request.json()
+        budget = await run_in_threadpool(
+            budget_engine.estimate, data.get("items"), data.get("currency"),
+            data.get("days", 1), data.get("travelers", 1)
+        )
+        return JSONResponse(budget)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except RatesUnavailableError as e:
+        return rates_unavailable_response(e)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@app.post("/plan_jobs")
+async def submit_plan_job(request: Request):
+    """Plan üretimini kuyruğa al; sonuç /plan_jobs/{job_id}/result ile alınır"""
+    try:
+        data = await request.json()
+        city = data.get("city", "Paris")
+        days = data.get("days", 3)
+        interests = data.get("interests", [])
+        
+        client_ip = request.client.host
+        user_id = session_manager.generate_user_id(client_ip)
+        
+        job, created = plan_jobs.submit(user_id, city, days, interests)
+        if job is None:
+            return JSONResponse({"error": "Too many pending plan jobs"}, status_code=429,
+                                headers={"Retry-After": "30"})
+        
+        return JSONResponse(
+            dict(job_status(job), deduplicated=not created),
+            status_code=202,
+            headers={"Location": f"/plan_jobs/{job['id']}"}
+        )
+    
+    except Exception as e:
+        print(f"Plan job error: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@app.get("/plan_jobs/{job_id}")
+async def get_plan_job(job_id: str, request: Request):
+    """İş durumu"""
+    user_id = session_manager.generate_user_id(request.client.host)
+    job = plan_jobs.get(job_id, user_id)
+    if job is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    return job_status(job)
+
+
+@app.get("/plan_jobs/{job_id}/result")
+async def get_plan_job_result(job_id: str, request: Request):
+    """Tamamlanan plan; iş sürüyorsa 202 + Retry-After"""
+    user_id = session_manager.generate_user_id(request.client.host)
+    job = plan_jobs.get(job_id, user_id)
+    if job is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    
+    if job["status"] == "done":
+        return JSONResponse(job["result"])
+    if job["status"] in ("queued", "running"):
+        return JSONResponse(job_status(job), status_code=202, headers={"Retry-After": "2"})
+    if job["status"] == "cancelled":
+        return JSONResponse(job_status(job), status_code=409)
+    return JSONResponse(dict(job_status(job), error=job["error"]), status_code=500)
+
+
+@app.delete("/plan_jobs/{job_id}")
+async def cancel_plan_job(job_id: str, request: Request):
+    """Bekleyen ya da çalışan işi iptal et"""
+    user_id = session_manager.generate_user_id(request.client.host)
+    if plan_jobs.cancel(job_id, user_id):
+        return {"job_id": job_id, "status": "cancelled"}
+    
+    job = plan_jobs.get(job_id, user_id)
+    if job is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    return JSONResponse(job_status(job), status_code=409)
+
+
 @app.get("/user/history")
-async def get_user_history(request: Request):
-    """Kullanıcı geçmişini getir"""
+async def get_user_history(request: Request, limit: int = HISTORY_PAGE_SIZE, history_before: int = None,
+                           plans_before: int = None, favorites_before: int = None, full_plans: bool = False):
+    """
+    Kullanıcı geçmişini getir. Her liste ayrı sayfalanır: "next" içindeki
+    imleç, aynı listenin sonraki sayfası için *_before parametresine verilir.
+    Planlar varsayılan olarak plan_data olmadan döner (/user/plans/{id}).
+    """
     try:
         client_ip = request.client.host
         user_id = session_manager.generate_user_id(client_ip)
+        limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
         
-        history = db.get_chat_history(user_id, limit=20)
-        plans = db.get_travel_plans(user_id)
-        favorites = db.get_favorites(user_id)
-        stats = session_manager.get_user_stats(user_id)
+        # Değişmeyen geçmiş için kayıtlar hiç okunmadan 304 döner
+        version = db.get_history_version(user_id)
+        etag = make_etag(user_id, version, limit, history_before, plans_before, favorites_before, full_plans)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return cached_json(request, None, etag)
         
-        return JSONResponse({
+        history, history_next = page(
+            db.get_chat_history(user_id, limit=limit + 1, before_id=history_before), limit, oldest_first=True
+        )
+        plans, plans_next = page(
+            db.get_travel_plans(user_id, limit=limit + 1, before_id=plans_before, summary=not full_plans), limit
+        )
+        favorites, favorites_next = page(
+            db.get_favorites(user_id, limit=limit + 1, before_id=favorites_before), limit
+        )
+        stats = session_manager.get_user_stats(user_id, version)
+        
+        return cached_json(request, {
             "success": True,
             "history": history,
             "plans": plans,
             "favorites": favorites,
-            "stats": stats
+            "stats": stats,
+            "next": {"history": history_next, "plans": plans_next, "favorites": favorites_next}
+        }, etag)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@app.get("/user/plans/{plan_id}")
+async def get_user_plan(plan_id: int, request: Request):
+    """Kayıtlı tek bir planın tamamı"""
+    try:
+        user_id = session_manager.generate_user_id(request.client.host)
+        plan = db.get_travel_plan(user_id, plan_id)
+        if plan is None:
+            return JSONResponse({"error": "Plan not found"}, status_code=404)
+        # Kayıtlı planlar değişmez
+        return cached_json(request, {"success": True, "plan": plan}, make_etag(user_id, plan_id, plan["created_at"]))
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@app.get("/user/search")
+async def search_user_history(request: Request, q: str = "", scope: str = "all",
+                              limit: int = 20, offset: int = 0):
+    """Sohbet geçmişi ve planlarda arama"""
+    try:
+        if scope not in ("all", "chat", "plans"):
+            return JSONResponse({"error": "scope must be one of: all, chat, plans"}, status_code=400)
+
+        client_ip = request.client.host
+        user_id = session_manager.generate_user_id(client_ip)
+
+        limit = max(1, min(limit, 50))
+        offset = max(0, offset)
+        found = db.search(user_id, q, scope=scope, limit=limit, offset=offset)
+
+        return JSONResponse({
+            "success": True,
+            "query": q,
+            "results": found["results"],
+            "has_more": found["has_more"],
+            "truncated": found["truncated"],
+            "next_offset": offset + limit if found["has_more"] else None
         })
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=500)
@@ -213,6 +594,53 @@ async def add_favorite(request: Request):
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=500)
 
+@app.get("/flights")
+async def search_flights(origin: str, destination: str, date: str = None, days: int = 1,
+                         limit: int = FLIGHT_RESULT_LIMIT):
+    """Çoklu havalimanı (virgülle) ve tarih aralığı için uçuşlar: /flights?origin=IST,SAW&destination=FCO"""
+    origins = [code.strip().upper() for code in origin.split(",") if code.strip()]
+    destinations = [code.strip().upper() for code in destination.split(",") if code.strip()]
+    if not origins or not destinations or any(len(code) != 3 or not code.isalpha()
+                                              for code in origins + destinations):
+        return JSONResponse({"error": "origin and destination must be IATA airport codes"}, status_code=400)
+    if not 1 <= days <= FLIGHT_MAX_DATES or not 1 <= limit <= 100:
+        return JSONResponse({"error": f"days must be 1-{FLIGHT_MAX_DATES} and limit 1-100"}, status_code=400)
+    try:
+        dates = date_range(datetime.date.fromisoformat(date), days) if date else None
+    except ValueError:
+        return JSONResponse({"error": "date must be YYYY-MM-DD"}, status_code=400)
+    try:
+        result = await run_in_threadpool(flight_search.search, origins, destinations, dates, limit)
+        return JSONResponse(result)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@app.get("/stats")
+async def stats():
+    """Cache ve model istatistikleri"""
+    return {
+        "response_cache": response_cache.stats(),
+        "llm": model_router.stats(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "llm_backends": backend_pool.stats(),
+        "rate_limiter": rate_limiter.stats() if rate_limiter else None,
+        "plan_warmer": plan_warmer.stats(),
+        "plan_jobs": plan_jobs.stats(),
+        "geocoding": geocoder.stats(),
+        "budget": budget_engine.stats(),
+        "flights": flight_search.stats(),
+        "static": static_assets.stats()
+    }
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus metrikleri (text exposition formatı)"""
+    if not metrics.enabled:
+        return JSONResponse({"error": "metrics are disabled (METRICS_ENABLED=0)"}, status_code=404)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 
 @app.get("/health")
 async def health():
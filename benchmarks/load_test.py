@@ -0,0 +1,395 @@
+"""
+Uçtan uca yük testi: stub model/API sunucularıyla gerçek uygulama süreci.
+
+Uygulama ayrı bir uvicorn sürecinde, geçici bir veritabanı ve PDF klasörüyle
+çalışır; Ollama ve harici API'ler benchmarks.stub_servers ile taklit edilir.
+Her senaryo için p50/p95/p99 gecikme, throughput, hata oranı ve (chat için)
+TTFT; uygulama süreci için RSS raporlanır. Çıktı JSON'dur ve --baseline ile
+önceki bir raporla karşılaştırılabilir.
+
+Kullanım:
+    python -m benchmarks.load_test --scenarios chat create_plan --concurrency 8 --requests 100
+    python -m benchmarks.load_test --output after.json --baseline before.json --max-regression 10
+    python -m benchmarks.load_test --scenarios chat --backends 3 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+from benchmarks.stub_servers import start_stubs, add_stub_arguments, config_from_args
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHAT_MESSAGES = [
+    "What should I eat in Rome?",
+    "Top places to visit in Paris",
+    "What is the weather in Tokyo?",
+    "Show me flights from IST to FCO",
+    "Convert 250 USD to EUR",
+    "Plan a relaxed evening in Barcelona for a couple who love food",
+    "How many days do I need to see London properly?",
+    "Suggest a rainy day itinerary for Amsterdam with museums",
+    "What are some cultural experiences in Istanbul?",
+    "Recommend something fun to do near me tonight",
+]
+PLAN_CITIES = ["Rome", "Paris", "Istanbul", "Tokyo", "Barcelona", "London"]
+PLAN_INTERESTS = [["food"], ["history", "art"], ["nightlife"], ["nature", "food"], []]
+LOCATIONS = [(41.9, 12.5), (48.86, 2.35), (41.01, 28.97), (35.68, 139.69)]
+
+
+# === İSTEK ÜRETİCİLERİ ===
+def chat_request(rng: random.Random, i: int, unique: bool) -> dict:
+    message = rng.choice(CHAT_MESSAGES)
+    if unique:
+        # Sayı varlık olarak eşleştiği için semantic cache isabetini engeller
+        message = f"{message} (request {i})"
+    body = {"message": message}
+    if "near me" in message:
+        lat, lon = rng.choice(LOCATIONS)
+        body["location"] = {"lat": lat, "lon": lon}
+    return {"method": "POST", "path": "/chat", "json": body, "stream": True}
+
+
+def plan_request(rng: random.Random, i: int, unique: bool) -> dict:
+    days = rng.randint(1, 5) if not unique else 1 + i % 30
+    body = {"city": rng.choice(PLAN_CITIES), "days": days, "interests": rng.choice(PLAN_INTERESTS)}
+    return {"method": "POST", "path": "/create_plan", "json": body}
+
+
+def pdf_request(rng: random.Random, i: int, unique: bool) -> dict:
+    city = rng.choice(PLAN_CITIES)
+    body = {
+        "title": f"{city} Getaway",
+        "city": city,
+        "date": "3 days",
+        "plan": [f"Day {d}: Explore {city} highlights, local lunch, evening walk" for d in range(1, 4)],
+        "recommendations": ["Book museum tickets early", "Try the street food", "Use public transport"],
+    }
+    return {"method": "POST", "path": "/generate_pdf", "json": body}
+
+
+def history_request(rng: random.Random, i: int, unique: bool) -> dict:
+    return {"method": "GET", "path": "/user/history"}
+
+
+SCENARIOS = {
+    "chat": [(chat_request, 1)],
+    "create_plan": [(plan_request, 1)],
+    "generate_pdf": [(pdf_request, 1)],
+    "user_history": [(history_request, 1)],
+    # Gerçekçi karışım: çoğunlukla sohbet
+    "mixed": [(chat_request, 6), (history_request, 2), (plan_request, 1), (pdf_request, 1)],
+}
+
+
+# === ÖLÇÜM ===
+def percentile(values: list, pct: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def summarize_ms(values: list) -> dict:
+    if not values:
+        return {}
+    return {
+        "p50": round(percentile(values, 0.50) * 1000, 1),
+        "p95": round(percentile(values, 0.95) * 1000, 1),
+        "p99": round(percentile(values, 0.99) * 1000, 1),
+        "mean": round(sum(values) / len(values) * 1000, 1),
+        "max": round(max(values) * 1000, 1),
+    }
+
+
+def read_rss_mb(pid: int):
+    """Sürecin RSS değeri (Linux /proc; yoksa psutil)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    try:
+        import psutil
+        return round(psutil.Process(pid).memory_info().rss / 1024 / 1024, 1)
+    except Exception:
+        return None
+
+
+async def sample_rss(pid: int, samples: list, stop: asyncio.Event, interval: float = 0.1):
+    while not stop.is_set():
+        rss = read_rss_mb(pid)
+        if rss is not None:
+            samples.append(rss)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def send(client: httpx.AsyncClient, spec: dict, user_ip: str) -> dict:
+    """Tek isteği gönder; gecikme, TTFT ve hata durumunu döndür"""
+    headers = {"X-Forwarded-For": user_ip}
+    started = time.perf_counter()
+    ttft = None
+    error = None
+    try:
+        if spec.get("stream"):
+            async with client.stream(spec["method"], spec["path"], json=spec.get("json"),
+                                     headers=headers) as response:
+                if response.status_code != 200:
+                    error = f"HTTP {response.status_code}"
+                buffer = b""
+                async for chunk in response.aiter_bytes():
+                    if ttft is None and b'"token"' in chunk:
+                        ttft = time.perf_counter() - started
+                    buffer = (buffer + chunk)[-256:]
+                    if b'"error"' in chunk:
+                        error = error or "stream error"
+                if error is None and b'"done"' not in buffer:
+                    error = "incomplete stream"
+        else:
+            response = await client.request(spec["method"], spec["path"], json=spec.get("json"),
+                                            headers=headers)
+            await response.aread()
+            if response.status_code != 200:
+                error = f"HTTP {response.status_code}"
+    except httpx.HTTPError as e:
+        error = type(e).__name__
+
+    return {"latency": time.perf_counter() - started, "ttft": ttft, "error": error}
+
+
+async def run_scenario(base_url: str, name: str, requests: int, concurrency: int,
+                       seed: int, unique: bool, timeout: float) -> dict:
+    """Senaryoyu sabit eşzamanlılıkla çalıştır (her worker ayrı bir kullanıcı)"""
+    rng = random.Random(seed)
+    makers, weights = zip(*SCENARIOS[name])
+    specs = [rng.choices(makers, weights)[0](rng, i, unique) for i in range(requests)]
+    queue = asyncio.Queue()
+    for spec in specs:
+        queue.put_nowait(spec)
+
+    results = []
+
+    async def worker(worker_id: int):
+        user_ip = f"10.0.{worker_id // 250}.{worker_id % 250 + 1}"
+        while True:
+            try:
+                spec = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            result = await send(client, spec, user_ip)
+            result["path"] = spec["path"]
+            results.append(result)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        duration = time.perf_counter() - started
+
+    ok = [r for r in results if r["error"] is None]
+    errors = {}
+    for r in results:
+        if r["error"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+
+    report = {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "error_rate": round((len(results) - len(ok)) / len(results), 4) if results else 0,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(ok) / duration, 2) if duration else 0,
+        "latency_ms": summarize_ms([r["latency"] for r in ok]),
+    }
+    ttfts = [r["ttft"] for r in ok if r["ttft"] is not None]
+    if ttfts:
+        report["ttft_ms"] = summarize_ms(ttfts)
+    paths = sorted({r["path"] for r in results})
+    if len(paths) > 1:
+        report["by_path"] = {
+            path: summarize_ms([r["latency"] for r in ok if r["path"] == path]) for path in paths
+        }
+    if errors:
+        report["error_types"] = errors
+    return report
+
+
+# === UYGULAMA SÜRECİ ===
+def start_app(env: dict, port: int, log_path: str) -> subprocess.Popen:
+    """Uygulamayı stub ortamıyla ayrı bir uvicorn sürecinde başlat"""
+    log = open(log_path, "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+         "--proxy-headers", "--forwarded-allow-ips", "*", "--log-level", "warning", "--no-access-log"],
+        cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+
+def wait_ready(base_url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"app exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("app did not become ready")
+
+
+def free_port() -> int:
+    import socket
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# === KARŞILAŞTIRMA ===
+def compare(report: dict, baseline: dict) -> dict:
+    """Senaryo bazında p95 gecikme ve throughput değişimi (%)"""
+    changes = {}
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        entry = {}
+        old_p95 = previous.get("latency_ms", {}).get("p95")
+        new_p95 = current.get("latency_ms", {}).get("p95")
+        if old_p95 and new_p95:
+            entry["latency_p95_change_pct"] = round((new_p95 - old_p95) / old_p95 * 100, 1)
+        old_rps, new_rps = previous.get("throughput_rps"), current.get("throughput_rps")
+        if old_rps and new_rps:
+            entry["throughput_change_pct"] = round((new_rps - old_rps) / old_rps * 100, 1)
+        changes[name] = entry
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SmartTour load test with stub backends")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=["mixed"])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100, help="Senaryo başına istek sayısı")
+    parser.add_argument("--warmup", type=int, default=5, help="Ölçülmeyen ısınma istekleri")
+    parser.add_argument("--unique", action="store_true",
+                        help="İstekleri benzersiz yap (cache isabetlerini engeller)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="Uygulamanın istek limitini açık bırak (varsayılan: kapalı)")
+    parser.add_argument("--output", help="JSON raporunun yazılacağı dosya")
+    parser.add_argument("--baseline", help="Karşılaştırılacak önceki JSON raporu")
+    parser.add_argument("--max-regression", type=float,
+                        help="p95 bu yüzdeden fazla kötüleşirse çıkış kodu 1")
+    parser.add_argument("--backends", type=int, default=1, help="Model stub sunucusu sayısı (backend havuzu)")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    stub_config = config_from_args(args)
+    servers, stub_env = start_stubs(stub_config, backends=args.backends)
+
+    with tempfile.TemporaryDirectory(prefix="smarttour-bench-") as workdir:
+        env = dict(os.environ, **stub_env)
+        env.update({
+            "DATABASE_PATH": os.path.join(workdir, "users.db"),
+            "PDF_OUTPUT_DIR": os.path.join(workdir, "outputs"),
+            "OPENWEATHER_API_KEY": "stub",
+            "AVIATIONSTACK_API_KEY": "stub",
+            "CURRENCYAPI_KEY": "stub",
+            "RATE_LIMIT_ENABLED": "1" if args.rate_limit else "0",
+            "PLAN_WARM_ENABLED": "0",  # arka plan işleri ölçümleri etkilemesin
+        })
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        log_path = os.path.join(workdir, "app.log")
+        process = start_app(env, port, log_path)
+
+        try:
+            wait_ready(base_url, process)
+            rss_start = read_rss_mb(process.pid)
+
+            async def run_all():
+                if args.warmup:
+                    await run_scenario(base_url, "mixed", args.warmup, min(args.warmup, args.concurrency),
+                                       args.seed + 1, True, args.timeout)
+                samples, stop = [], asyncio.Event()
+                sampler = asyncio.create_task(sample_rss(process.pid, samples, stop))
+                scenarios = {}
+                for name in args.scenarios:
+                    scenarios[name] = await run_scenario(
+                        base_url, name, args.requests, args.concurrency, args.seed, args.unique, args.timeout
+                    )
+                stop.set()
+                await sampler
+                return scenarios, samples
+
+            scenarios, rss_samples = asyncio.run(run_all())
+            server_stats = httpx.get(f"{base_url}/stats", timeout=5).json()
+        except Exception:
+            with open(log_path) as f:
+                sys.stderr.write(f.read()[-4000:])
+            raise
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            for server in servers:
+                server.shutdown()
+
+    report = {
+        "config": {
+            "scenarios": args.scenarios,
+            "concurrency": args.concurrency,
+            "backends": args.backends,
+            "requests": args.requests,
+            "unique": args.unique,
+            "token_rate": args.token_rate,
+            "first_token_delay": args.first_token_delay,
+            "max_tokens": args.max_tokens,
+            "fail_rate": args.fail_rate,
+            "fail_mode": args.fail_mode,
+            "api_latency": args.api_latency,
+            "seed": args.seed,
+        },
+        "scenarios": scenarios,
+        "rss_mb": {
+            "start": rss_start,
+            "peak": max(rss_samples) if rss_samples else None,
+            "end": rss_samples[-1] if rss_samples else None,
+        },
+        "stub": {"requests": stub_config.requests, "injected_failures": stub_config.failures},
+        "server_stats": server_stats,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare(report, json.load(f))
+        if args.max_regression is not None:
+            for name, change in report["comparison"].items():
+                if change.get("latency_p95_change_pct", 0) > args.max_regression:
+                    print(f"Regression in {name}: p95 +{change['latency_p95_change_pct']}%", file=sys.stderr)
+                    exit_code = 1
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Çok turlu sohbette ilk token gecikmesi (TTFT) karşılaştırması.
+
+"legacy": eski düzen, ilgi alanı özeti her turda sistem mesajında değişir.
+"prefix": TourismAssistant._build_prompt, sabit önek + değişken bağlam sonda.
+
+Kullanım (çalışan bir Ollama sunucusu gerekir):
+    python -m benchmarks.prompt_prefix_benchmark --turns 6 --repeat 2
+"""
+import argparse
+import json
+import time
+from langchain_ollama import ChatOllama
+from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_community.chat_message_histories import ChatMessageHistory
+from core.llm_client import TourismAssistant
+from config.settings import LLM_MODEL, LLM_KEEP_ALIVE, LLM_NUM_CTX
+
+QUESTIONS = [
+    "I'm planning a trip to Rome in spring. Where should I start?",
+    "Which neighbourhood is best to stay in for a first visit?",
+    "What are some must-try dishes there?",
+    "Can you suggest a relaxed evening activity?",
+    "How many days do I need for the Vatican and the Colosseum?",
+    "Any tips for avoiding queues?",
+    "What should I pack for the weather?",
+    "Give me one hidden gem most tourists miss.",
+]
+
+# Her turda değişen özet, gerçek update_interest_summary davranışını taklit eder
+INTEREST_SUMMARIES = [
+    "",
+    "Rome, spring travel",
+    "Rome, spring travel, central neighbourhoods",
+    "Rome, food, Roman cuisine, central neighbourhoods",
+    "Rome, food, relaxed evenings",
+    "Rome, Vatican, Colosseum, food",
+    "Rome, skipping queues, history",
+    "Rome, packing, weather, history, food",
+]
+
+
+def legacy_prompt(history: ChatMessageHistory, interest_summary: str, user_input: str) -> list:
+    """Eski _build_prompt düzeni: değişken kısım sistem mesajında"""
+    system_content = (
+        "You are SmartTour, a professional, friendly, and knowledgeable tourism assistant. "
+        "You help users explore destinations, plan trips, and discover cultural and culinary highlights. "
+        "You have access to real-time weather, flight, and currency data. "
+        "Provide concise yet inspiring answers with practical travel tips and local insights."
+    )
+    if interest_summary:
+        system_content += (
+            f"\n\nThe user is particularly interested in: {interest_summary}. "
+            "You should tailor your responses with this context in mind."
+        )
+    return [SystemMessage(content=system_content)] + history.messages + [HumanMessage(content=user_input)]
+
+
+def run_conversation(llm: ChatOllama, layout: str, turns: int) -> list:
+    """Bir sohbeti çalıştır, her tur için TTFT ve prefill ölçümlerini döndür"""
+    assistant = TourismAssistant()
+    results = []
+
+    for turn in range(turns):
+        question = QUESTIONS[turn % len(QUESTIONS)]
+        assistant.interest_summary = INTEREST_SUMMARIES[turn % len(INTEREST_SUMMARIES)]
+
+        if layout == "legacy":
+            messages = legacy_prompt(assistant.memory, assistant.interest_summary, question)
+        else:
+            messages = assistant._build_prompt(question)
+
+        started = time.perf_counter()
+        ttft = None
+        answer = []
+        metadata = {}
+        for chunk in llm.stream(messages):
+            if ttft is None and chunk.content:
+                ttft = time.perf_counter() - started
+            answer.append(chunk.content)
+            metadata = chunk.response_metadata or metadata
+
+        assistant.memory.add_user_message(question)
+        assistant.memory.add_ai_message("".join(answer))
+        results.append({
+            "turn": turn + 1,
+            "ttft_ms": round((ttft or 0.0) * 1000, 1),
+            "prompt_eval_count": metadata.get("prompt_eval_count"),
+            "prompt_eval_ms": round(metadata.get("prompt_eval_duration", 0) / 1e6, 1),
+        })
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt prefix reuse TTFT benchmark")
+    parser.add_argument("--model", default=LLM_MODEL)
+    parser.add_argument("--base-url", default=None, help="Ollama URL (varsayılan: yerel)")
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--num-predict", type=int, default=128)
+    args = parser.parse_args()
+
+    llm_kwargs = {
+        "model": args.model,
+        "keep_alive": LLM_KEEP_ALIVE,
+        "num_ctx": LLM_NUM_CTX,
+        "num_predict": args.num_predict,
+        "temperature": 0,
+    }
+    if args.base_url:
+        llm_kwargs["base_url"] = args.base_url
+    llm = ChatOllama(**llm_kwargs)
+
+    # Modeli önceden yükle; ilk ölçüm model yükleme süresini içermesin
+    llm.invoke([HumanMessage(content="hi")])
+
+    report = {"model": args.model, "turns": args.turns, "layouts": {}}
+    for layout in ("legacy", "prefix"):
+        runs = [run_conversation(llm, layout, args.turns) for _ in range(args.repeat)]
+        # Tur bazında ortalama; ilk tur her iki düzende de soğuk başlar
+        per_turn = []
+        for turn in range(args.turns):
+            samples = [run[turn] for run in runs]
+            per_turn.append({
+                "turn": turn + 1,
+                "ttft_ms": round(sum(s["ttft_ms"] for s in samples) / len(samples), 1),
+                "prompt_eval_count": samples[-1]["prompt_eval_count"],
+                "prompt_eval_ms": round(sum(s["prompt_eval_ms"] for s in samples) / len(samples), 1),
+            })
+        later = per_turn[1:] or per_turn
+        report["layouts"][layout] = {
+            "per_turn": per_turn,
+            "mean_ttft_ms_after_first_turn": round(sum(t["ttft_ms"] for t in later) / len(later), 1),
+        }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Semantic cache doğruluğu ve arama süresi.
+
+Her çift için ilk soru cache'e yazılır, ikincisi sorulur:
+"hit" çiftleri aynı yanıtı almalı (yakın tekrar), "miss" çiftleri almamalı
+(farklı şehir, sayı ya da kısıt). Yanlış sonuç varsa çıkış kodu 1.
+Arama süresi --entries kadar dolu bir indeks üzerinde ölçülür.
+
+Kullanım:
+    python -m benchmarks.semantic_cache_benchmark
+    python -m benchmarks.semantic_cache_benchmark --entries 2048 --output cache.json
+"""
+import argparse
+import json
+import sys
+import time
+from benchmarks.stub_servers import STUB_CITIES
+from core.semantic_cache import SemanticCache
+
+HIT_PAIRS = (
+    ("what to eat in Rome", "best food in Rome?"),
+    ("What are the best restaurants and food to eat in rome", "what are the best restaurants and food to eat in Rome?"),
+    ("Best food in Rome?", "best food in rome"),
+    ("What are the top attractions in Paris?", "what are the best sights in Paris"),
+)
+
+MISS_PAIRS = (
+    ("what are the best restaurants and food to eat in rome", "what are the best restaurants and food to eat in paris"),
+    ("what are the best restaurants and food to eat in rome", "what are the best restaurants and food to eat in milan?"),
+    ("best food in Rome?", "best vegetarian food in Rome?"),
+    ("what to eat in Rome", "what not to eat in Rome"),
+    ("what to do in Tokyo in 3 days", "what to do in Tokyo in 5 days"),
+)
+
+
+def check_pairs() -> dict:
+    wrong = []
+    for expected, pairs in (("hit", HIT_PAIRS), ("miss", MISS_PAIRS)):
+        for cached, asked in pairs:
+            cache = SemanticCache(max_entries=8)
+            cache.set(cached, "answer")
+            got = "hit" if cache.get(asked) is not None else "miss"
+            if got != expected:
+                wrong.append({"cached": cached, "asked": asked, "expected": expected})
+    return {"pairs": len(HIT_PAIRS) + len(MISS_PAIRS), "wrong": wrong}
+
+
+def measure_lookup(entries: int, repeat: int) -> dict:
+    cache = SemanticCache(max_entries=entries)
+    for i in range(entries):
+        cache.set(f"question {i} about things to do in {STUB_CITIES[i % len(STUB_CITIES)]}", f"answer {i}")
+    started = time.perf_counter()
+    for i in range(repeat):
+        cache.get(f"what to eat in {STUB_CITIES[i % len(STUB_CITIES)]}")
+    return {"entries": entries, "lookup_us": round((time.perf_counter() - started) / repeat * 1e6, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SmartTour semantic cache check")
+    parser.add_argument("--entries", type=int, default=2048)
+    parser.add_argument("--repeat", type=int, default=500)
+    parser.add_argument("--output", help="JSON raporunun yazılacağı dosya")
+    args = parser.parse_args()
+
+    report = {"correctness": check_pairs(), "lookup": measure_lookup(args.entries, args.repeat)}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+    sys.exit(1 if report["correctness"]["wrong"] else 0)
+
+
+if __name__ == "__main__":
+    main()
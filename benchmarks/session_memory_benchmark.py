@@ -0,0 +1,156 @@
+"""
+Canlı oturum belleği: 10k oturum başına geçmişin kapladığı bellek.
+
+"langchain": InMemoryChatMessageHistory (tur başına iki pydantic mesaj nesnesi)
+"compact": CompactHistory (halka tampon, intern/zlib metinler)
+
+Her oturumda farklı metinlerle --turns kadar tur saklanır; bellek tracemalloc
+ile ölçülür (metinlerin kendisi dahil). Ayrıca bir oturumdan prompt için mesaj
+listesi üretme ve ilgi özeti için son mesajları okuma süresi raporlanır.
+Çıktı JSON'dur ve --baseline ile önceki bir raporla karşılaştırılabilir.
+
+Kullanım:
+    python -m benchmarks.session_memory_benchmark --sessions 10000 --turns 5
+    python -m benchmarks.session_memory_benchmark --output after.json --baseline before.json --max-regression 10
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from benchmarks.stub_servers import SAMPLE_REPLY, STUB_CITIES
+from core.memory_manager import CompactHistory
+
+QUESTIONS = (
+    "hi",
+    "What should I see in {city} in {days} days?",
+    "Where can I eat local food in {city}?",
+    "Is {city} expensive for a {days}-day trip with a budget of {budget} EUR?",
+    "thanks",
+)
+
+
+def make_turn(session: int, turn: int) -> tuple:
+    """Oturuma özgü soru ve yanıt (her çağrıda yeni string nesneleri)"""
+    city = STUB_CITIES[(session + turn) % len(STUB_CITIES)]
+    values = {"city": city, "days": 2 + session % 5, "budget": 300 + session % 700}
+    question = QUESTIONS[turn % len(QUESTIONS)].format(**values)
+    answer = f"{city} #{session}-{turn}: " + SAMPLE_REPLY * (1 + (session + turn) % 3)
+    return question, answer
+
+
+def langchain_history():
+    from langchain_core.chat_history import InMemoryChatMessageHistory
+    return InMemoryChatMessageHistory()
+
+
+IMPLEMENTATIONS = {
+    "langchain": langchain_history,
+    "compact": CompactHistory,
+}
+
+
+def measure_memory(factory, sessions: int, turns: int) -> dict:
+    """Oturumlar canlıyken ayrılmış bellek (sözlük dahil)"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    live = {}
+    for session in range(sessions):
+        history = factory()
+        for turn in range(turns):
+            question, answer = make_turn(session, turn)
+            history.add_user_message(question)
+            history.add_ai_message(answer)
+        live[f"user-{session}"] = history
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del live
+    return {
+        "mb_per_10k_sessions": round(used / sessions * 10000 / 1e6, 2),
+        "bytes_per_session": round(used / sessions),
+        "build_ms_per_session": round(elapsed / sessions * 1000, 3),
+    }
+
+
+def measure_access(factory, turns: int, repeat: int) -> dict:
+    """Prompt için mesaj listesi ve son 6 mesajın metni (tur başına bir kez yapılır)"""
+    history = factory()
+    for turn in range(turns):
+        history.add_user_message(make_turn(0, turn)[0])
+        history.add_ai_message(make_turn(0, turn)[1])
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        history.messages
+    messages_us = (time.perf_counter() - started) / repeat * 1e6
+
+    def recent():
+        if isinstance(history, CompactHistory):
+            return history.tail(6)
+        return [(m.type, m.content) for m in history.messages[-6:]]
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        recent()
+    recent_us = (time.perf_counter() - started) / repeat * 1e6
+    return {"messages_us": round(messages_us, 1), "recent_6_us": round(recent_us, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SmartTour live session memory benchmark")
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--turns", type=int, default=5, help="Oturum başına soru-yanıt turu")
+    parser.add_argument("--repeat", type=int, default=2000, help="Erişim ölçümü tekrarı")
+    parser.add_argument("--implementations", nargs="+", choices=sorted(IMPLEMENTATIONS),
+                        default=list(IMPLEMENTATIONS))
+    parser.add_argument("--output", help="JSON raporunun yazılacağı dosya")
+    parser.add_argument("--baseline", help="Karşılaştırılacak önceki JSON raporu")
+    parser.add_argument("--max-regression", type=float,
+                        help="Oturum başına bellek bu yüzdeden fazla artarsa çıkış kodu 1")
+    args = parser.parse_args()
+
+    report = {
+        "config": {"sessions": args.sessions, "turns": args.turns, "python": sys.version.split()[0]},
+        "implementations": {},
+    }
+    for name in args.implementations:
+        factory = IMPLEMENTATIONS[name]
+        report["implementations"][name] = dict(
+            measure_memory(factory, args.sessions, args.turns),
+            **measure_access(factory, args.turns, args.repeat)
+        )
+
+    results = report["implementations"]
+    if "langchain" in results and "compact" in results:
+        old, new = results["langchain"]["bytes_per_session"], results["compact"]["bytes_per_session"]
+        report["memory_reduction_pct"] = round((old - new) / old * 100, 1)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f).get("implementations", {})
+        report["comparison"] = {}
+        for name, entry in results.items():
+            previous = (baseline.get(name) or {}).get("bytes_per_session")
+            if previous:
+                change = round((entry["bytes_per_session"] - previous) / previous * 100, 1)
+                report["comparison"][name] = change
+                if args.max_regression is not None and change > args.max_regression:
+                    print(f"Regression in {name}: +{change}%", file=sys.stderr)
+                    exit_code = 1
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
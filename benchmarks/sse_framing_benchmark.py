@@ -0,0 +1,148 @@
+"""
+SSE çerçeveleme karşılaştırması: 1k token başına ağ baytı ve CPU süresi.
+
+"legacy": token başına json.dumps olayı + string '+=' biriktirme
+"framed": TokenFramer (orjson, liste biriktirme, zaman/boyut sınırlı çerçeveler)
+
+Token akışı sanal bir saatle farklı üretim hızlarında simüle edilir; model
+gerekmez. Tarayıcı tarafı için yeniden işlenen karakter sayısı da raporlanır
+(eski istemci her token'da tüm metni, artımlı istemci yalnızca son paragrafı işler).
+
+Kullanım:
+    python -m benchmarks.sse_framing_benchmark --tokens 1000 --rates 20 60 200 1000
+"""
+import argparse
+import json
+import re
+import time
+from utils.sse import TokenFramer, sse_event
+from config.settings import SSE_FRAME_MAX_BYTES, SSE_FRAME_MAX_INTERVAL
+
+SAMPLE_TEXT = (
+    "## Day 1: Ancient Rome\n\n"
+    "Start your morning at the **Colosseum** and continue to the Roman Forum. "
+    "Grab a quick supplì for lunch near Piazza Venezia, then climb the Capitoline Hill for views. "
+    "In the evening, walk to Trastevere for dinner; try cacio e pepe at a family trattoria.\n\n"
+    "### Practical tips\n\n"
+    "Book timed tickets online, carry water, and wear comfortable shoes for the cobblestones. "
+)
+
+
+def make_tokens(count: int) -> list:
+    """Ollama benzeri kısa token'lar üret"""
+    pieces = re.findall(r"\s*\S{1,4}|\s+", SAMPLE_TEXT)
+    return [pieces[i % len(pieces)] for i in range(count)]
+
+
+class VirtualClock:
+    """Simülasyon için elle ilerletilen saat"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def run_legacy(tokens: list) -> dict:
+    started = time.process_time()
+    full_response = ""
+    wire_bytes = 0
+    rendered_chars = 0
+    for token in tokens:
+        full_response += token
+        wire_bytes += len(f"data: {json.dumps({'token': token})}\n\n".encode())
+        rendered_chars += len(full_response)  # istemci tüm metni yeniden işler
+    wire_bytes += len(f"data: {json.dumps({'done': True})}\n\n".encode())
+    return {
+        "events": len(tokens) + 1,
+        "wire_bytes": wire_bytes,
+        "cpu_ms": (time.process_time() - started) * 1000,
+        "client_chars_processed": rendered_chars,
+    }
+
+
+def client_chars_processed(frames: list) -> int:
+    """Artımlı istemci: tamamlanan paragraflar bir kez, son paragraf her çerçevede işlenir"""
+    processed = 0
+    pending = 0
+    for frame in frames:
+        text = json.loads(frame[6:])["token"]
+        boundary = text.rfind("\n\n")
+        if boundary == -1:
+            pending += len(text)
+        else:
+            processed += pending + boundary
+            pending = len(text) - boundary - 2
+        processed += pending
+    return processed
+
+
+def run_framed(tokens: list, rate: float) -> dict:
+    clock = VirtualClock()
+    framer = TokenFramer(max_bytes=SSE_FRAME_MAX_BYTES, max_interval=SSE_FRAME_MAX_INTERVAL, clock=clock)
+    started = time.process_time()
+    parts = []
+    frames = []
+
+    for token in tokens:
+        clock.now += 1.0 / rate
+        parts.append(token)
+        frame = framer.push(token)
+        if frame:
+            frames.append(frame)
+    tail = framer.flush()
+    if tail:
+        frames.append(tail)
+    "".join(parts)
+    frames.append(sse_event({"done": True}))
+
+    cpu_ms = (time.process_time() - started) * 1000
+    return {
+        "events": len(frames),
+        "wire_bytes": sum(len(f) for f in frames),
+        "cpu_ms": cpu_ms,
+        "client_chars_processed": client_chars_processed(frames[:-1]),
+    }
+
+
+def per_1k(result: dict, count: int) -> dict:
+    scale = 1000 / count
+    return {
+        "events": round(result["events"] * scale, 1),
+        "wire_bytes": round(result["wire_bytes"] * scale),
+        "cpu_ms": round(result["cpu_ms"] * scale, 3),
+        "client_chars_processed": round(result["client_chars_processed"] * scale),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSE framing benchmark")
+    parser.add_argument("--tokens", type=int, default=1000)
+    parser.add_argument("--rates", type=float, nargs="+", default=[20, 60, 200, 1000],
+                        help="Saniyedeki token sayısı (model üretim hızı)")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    tokens = make_tokens(args.tokens)
+
+    def best(fn, *fn_args):
+        # CPU ölçümü gürültülü: en iyi sonucu al
+        runs = [fn(*fn_args) for _ in range(args.repeat)]
+        return min(runs, key=lambda r: r["cpu_ms"])
+
+    report = {
+        "tokens": args.tokens,
+        "frame_max_bytes": SSE_FRAME_MAX_BYTES,
+        "frame_max_interval_s": SSE_FRAME_MAX_INTERVAL,
+        "legacy_per_1k_tokens": per_1k(best(run_legacy, tokens), args.tokens),
+        "framed_per_1k_tokens": {
+            f"{rate:g}_tok_per_s": per_1k(best(run_framed, tokens, rate), args.tokens)
+            for rate in args.rates
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
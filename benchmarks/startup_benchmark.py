@@ -0,0 +1,162 @@
+"""
+Başlatma süresi ölçümü: modül import süresi ve uvicorn worker'ının hazır olma süresi.
+
+Her ölçüm temiz bir Python sürecinde yapılır. "-X importtime" çıktısından en
+pahalı modüller listelenir; boot ölçümü stub sunucularla çalışan bir uvicorn
+sürecinin /health yanıtı verene kadar geçen süresidir. Çıktı JSON'dur ve
+--baseline ile önceki bir raporla karşılaştırılabilir.
+
+Kullanım:
+    python -m benchmarks.startup_benchmark --runs 5
+    python -m benchmarks.startup_benchmark --output after.json --baseline before.json --max-regression 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+from benchmarks.stub_servers import start_stubs, StubConfig
+from benchmarks.load_test import REPO_ROOT, start_app, wait_ready, free_port, read_rss_mb
+
+MODULES = ("app", "main")
+
+
+def bench_env(workdir: str, stub_env: dict = None) -> dict:
+    """Ölçüm süreçleri için ortam: geçici veritabanı, arka plan işleri kapalı"""
+    env = dict(os.environ, **(stub_env or {}))
+    env.update({
+        "DATABASE_PATH": os.path.join(workdir, "users.db"),
+        "PDF_OUTPUT_DIR": os.path.join(workdir, "outputs"),
+        "RATE_LIMIT_DB_PATH": os.path.join(workdir, "ratelimit.db"),
+        "PLAN_WARM_ENABLED": "0",
+        "LLM_WARMUP": "0",
+    })
+    return env
+
+
+def import_seconds(module: str, env: dict) -> float:
+    """Modülü temiz bir süreçte import etme süresi"""
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def import_profile(module: str, env: dict, top: int = 15) -> list:
+    """-X importtime çıktısından en pahalı üst düzey paketler (kümülatif ms)"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True)
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # başlık satırı
+        name = name.rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 1:  # doğrudan import edilen modüller
+            packages[name.strip()] = int(cumulative) / 1000
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{"module": name, "ms": round(ms, 1)} for name, ms in ranked]
+
+
+def boot_seconds(env: dict, workdir: str) -> tuple:
+    """uvicorn sürecinin başlatılmasından ilk /health yanıtına kadar geçen süre ve RSS"""
+    port = free_port()
+    started = time.perf_counter()
+    process = start_app(env, port, os.path.join(workdir, "app.log"))
+    try:
+        wait_ready(f"http://127.0.0.1:{port}", process, timeout=60.0)
+        elapsed = time.perf_counter() - started
+        rss = read_rss_mb(process.pid)
+        httpx.get(f"http://127.0.0.1:{port}/stats", timeout=5)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return elapsed, rss
+
+
+def summarize(values: list) -> dict:
+    return {
+        "median_ms": round(statistics.median(values) * 1000, 1),
+        "min_ms": round(min(values) * 1000, 1),
+        "max_ms": round(max(values) * 1000, 1),
+    }
+
+
+def compare(report: dict, baseline: dict) -> dict:
+    """Medyan sürelerdeki değişim (%)"""
+    changes = {}
+    for section in ("imports", "boot"):
+        current, previous = report.get(section, {}), baseline.get(section, {})
+        if section == "boot":
+            current, previous = {"boot": current}, {"boot": previous}
+        for name, entry in current.items():
+            old = (previous.get(name) or {}).get("median_ms")
+            new = (entry or {}).get("median_ms")
+            if old and new:
+                changes[name] = round((new - old) / old * 100, 1)
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SmartTour import and startup benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Ölçüm başına tekrar sayısı")
+    parser.add_argument("--modules", nargs="+", default=list(MODULES))
+    parser.add_argument("--no-boot", action="store_true", help="uvicorn boot ölçümünü atla")
+    parser.add_argument("--output", help="JSON raporunun yazılacağı dosya")
+    parser.add_argument("--baseline", help="Karşılaştırılacak önceki JSON raporu")
+    parser.add_argument("--max-regression", type=float,
+                        help="Medyan süre bu yüzdeden fazla kötüleşirse çıkış kodu 1")
+    args = parser.parse_args()
+
+    servers, stub_env = start_stubs(StubConfig())
+    report = {"config": {"runs": args.runs, "python": sys.version.split()[0]}, "imports": {}}
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="smarttour-startup-") as workdir:
+            env = bench_env(workdir, stub_env)
+            for module in args.modules:
+                import_seconds(module, env)  # ilk çalıştırma .pyc dosyalarını üretir
+                times = [import_seconds(module, env) for _ in range(args.runs)]
+                report["imports"][module] = dict(summarize(times), top=import_profile(module, env))
+
+            if not args.no_boot:
+                boots, rss = [], []
+                for _ in range(args.runs):
+                    elapsed, memory = boot_seconds(env, workdir)
+                    boots.append(elapsed)
+                    rss.append(memory)
+                report["boot"] = dict(summarize(boots), rss_mb=max(filter(None, rss), default=None))
+    finally:
+        for server in servers:
+            server.shutdown()
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare(report, json.load(f))
+        if args.max_regression is not None:
+            for name, change in report["comparison"].items():
+                if change > args.max_regression:
+                    print(f"Regression in {name}: +{change}%", file=sys.stderr)
+                    exit_code = 1
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+Benchmark için yerel stub sunucular (yalnızca stdlib, model gerekmez).
+
+StubOllama: /api/chat (NDJSON streaming ya da tek yanıt), /api/tags, /api/show.
+    Token hızı, ilk token gecikmesi ve hata enjeksiyonu ayarlanabilir.
+StubAPIs: OpenWeatherMap, Aviationstack, CurrencyAPI ve Nominatim yanıt biçimleri.
+
+Uygulamayı stub'lara yönlendirmek için start_stubs() dönen ortam değişkenleri
+(OLLAMA_BASE_URL(S), WEATHER_API_URL, ...) kullanılır. backends > 1 ile birden
+çok model stub'ı açılır (yük dağıtımı ve sunucu çıkarma testleri için).
+
+Tek başına kullanım:
+    python -m benchmarks.stub_servers --ollama-port 11500 --api-port 11501 --token-rate 40
+    python -m benchmarks.stub_servers --ollama-port 11510 --api-port 11501 --backends 3
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+SAMPLE_REPLY = (
+    "## Day 1: Old Town\n\n"
+    "Start early at the main square and visit the cathedral before the crowds arrive. "
+    "Have lunch at a small family restaurant and try the local speciality. "
+    "In the afternoon, walk along the river and stop at the covered market.\n\n"
+    "### Practical tips\n\n"
+    "Buy a transit day pass, book museum tickets online and carry a refillable bottle. "
+)
+SAMPLE_TOKENS = [w + " " for w in SAMPLE_REPLY.split(" ") if w]
+
+STUB_CITIES = ["Rome", "Paris", "Istanbul", "Tokyo", "Barcelona", "London", "Amsterdam"]
+STUB_AIRLINES = ["Turkish Airlines", "ITA Airways", "Lufthansa", "Air France", "KLM"]
+
+
+class StubConfig:
+    """Stub sunucuların davranış ayarları"""
+
+    def __init__(self, token_rate: float = 50.0, first_token_delay: float = 0.2, max_tokens: int = 200,
+                 fail_rate: float = 0.0, fail_mode: str = "error", api_latency: float = 0.05,
+                 api_fail_rate: float = 0.0, seed: int = 42):
+        self.token_rate = token_rate  # saniyedeki token
+        self.first_token_delay = first_token_delay  # prefill süresi (saniye)
+        self.max_tokens = max_tokens  # num_predict yoksa/büyükse üst sınır
+        self.fail_rate = fail_rate  # model isteklerinde hata oranı
+        self.fail_mode = fail_mode  # "error" (HTTP 500) | "disconnect" (akış yarıda kesilir)
+        self.api_latency = api_latency
+        self.api_fail_rate = api_fail_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+
+    def should_fail(self, rate: float) -> bool:
+        with self.lock:
+            self.requests += 1
+            failed = rate > 0 and self.random.random() < rate
+            if failed:
+                self.failures += 1
+            return failed
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # benchmark çıktısını kirletmesin
+
+    @property
+    def config(self) -> StubConfig:
+        return self.server.config
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _send_json(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+class StubOllamaHandler(_StubHandler):
+    """Ollama /api/chat protokolünün yeterli bir alt kümesi"""
+
+    def do_GET(self):
+        if self.path.startswith("/api/tags"):
+            models = [{"name": m, "model": m, "size": 0, "details": {"family": "stub"}}
+                      for m in self.server.models]
+            self._send_json({"models": models})
+        elif self.path.startswith("/api/version"):
+            self._send_json({"version": "0.0.0-stub"})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        body = self._read_json()
+        if self.path.startswith("/api/chat"):
+            self._chat(body)
+        elif self.path.startswith("/api/show"):
+            self._send_json({"modelfile": "", "parameters": "", "template": "",
+                             "details": {"family": "stub"}, "capabilities": ["completion"]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    @staticmethod
+    def _message(model: str, content: str, done: bool = False, **extra) -> bytes:
+        payload = {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "message": {"role": "assistant", "content": content},
+            "done": done,
+        }
+        payload.update(extra)
+        return json.dumps(payload).encode() + b"\n"
+
+    def _chat(self, body: dict):
+        config = self.config
+        model = body.get("model", "stub")
+        options = body.get("options") or {}
+        num_predict = options.get("num_predict")
+        count = min(num_predict, config.max_tokens) if num_predict and num_predict > 0 else config.max_tokens
+        tokens = [SAMPLE_TOKENS[i % len(SAMPLE_TOKENS)] for i in range(count)]
+
+        prompt_chars = sum(len(str(m.get("content", ""))) for m in body.get("messages", []))
+        final = {
+            "done_reason": "stop",
+            "load_duration": 0,
+            "prompt_eval_count": max(1, prompt_chars // 4),
+            "prompt_eval_duration": int(config.first_token_delay * 1e9),
+            "eval_count": count,
+            "eval_duration": int(count / config.token_rate * 1e9) if config.token_rate else 0,
+        }
+        final["total_duration"] = final["prompt_eval_duration"] + final["eval_duration"]
+
+        failed = config.should_fail(config.fail_rate)
+        if failed and config.fail_mode == "error":
+            self._send_json({"error": "injected failure"}, status=500)
+            return
+
+        time.sleep(config.first_token_delay)
+        interval = 1.0 / config.token_rate if config.token_rate else 0.0
+
+        if body.get("stream", True) is False:
+            time.sleep(interval * count)
+            self._send_json(json.loads(self._message(model, "".join(tokens), done=True, **final)))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        next_at = time.perf_counter()
+        for i, token in enumerate(tokens):
+            if failed and i == count // 2:
+                # Akışı bitirmeden bağlantıyı kapat
+                self.close_connection = True
+                return
+            self._write_chunk(self._message(model, token))
+            next_at += interval
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        self._write_chunk(self._message(model, "", done=True, **final))
+        self._write_chunk(b"")
+
+
+class StubAPIHandler(_StubHandler):
+    """Hava durumu, uçuş, döviz ve ters geocoding stub'ları"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        time.sleep(self.config.api_latency)
+        if self.config.should_fail(self.config.api_fail_rate):
+            self._send_json({"error": "injected failure"}, status=500)
+            return
+
+        if url.path.endswith("/weather"):
+            self._send_json(self._weather(params.get("q", "Rome")))
+        elif url.path.endswith("/flights"):
+            self._send_json(self._flights(params.get("dep_iata", "IST"), params.get("arr_iata", "FCO"),
+                                          params.get("flight_date"), int(params.get("limit", 100))))
+        elif url.path.endswith("/latest"):
+            self._send_json(self._currency(params.get("base_currency", "USD"), params.get("currencies", "")))
+        elif url.path.endswith("/reverse"):
+            self._send_json(self._reverse(params.get("lat", "0"), params.get("lon", "0")))
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    @staticmethod
+    def _seed(*parts) -> int:
+        return zlib.crc32("|".join(str(p) for p in parts).encode())
+
+    def _weather(self, city: str) -> dict:
+        seed = self._seed(city)
+        return {
+            "name": city,
+            "main": {"temp": round(5 + seed % 250 / 10, 1), "humidity": 40 + seed % 50},
+            "weather": [{"description": ["clear sky", "few clouds", "light rain"][seed % 3]}],
+            "wind": {"speed": round(seed % 90 / 10, 1)},
+        }
+
+    def _flights(self, dep: str, arr: str, date: str = None, limit: int = 100) -> dict:
+        date = date or "2026-01-01"
+        seed = self._seed(dep, arr, date)
+        flights = []
+        for i in range(min(8, limit)):
+            hour = 6 + (seed + i * 3) % 16
+            flights.append({
+                "flight_date": date,
+                "airline": {"name": STUB_AIRLINES[(seed + i) % len(STUB_AIRLINES)], "iata": "XX"},
+                "flight": {"iata": f"{dep[:2]}{100 + (seed + i * 37) % 900}", "number": str(i)},
+                "departure": {"airport": dep, "iata": dep, "scheduled": f"{date}T{hour:02d}:00:00+00:00",
+                              "terminal": "1", "gate": None, "delay": None},
+                "arrival": {"airport": arr, "iata": arr, "scheduled": f"{date}T{hour + 2:02d}:30:00+00:00",
+                            "terminal": None, "gate": None, "delay": None},
+                "flight_status": "scheduled",
+                "aircraft": None,
+                "live": None,
+            })
+        return {"pagination": {"limit": limit, "count": len(flights), "total": 8}, "data": flights}
+
+    def _currency(self, base: str, currencies: str) -> dict:
+        codes = [c for c in currencies.split(",") if c] or ["EUR", "USD", "GBP", "TRY", "JPY"]
+        return {"data": {
+            code: {"code": code, "value": round(0.5 + self._seed(base, code) % 4000 / 1000, 4)}
+            for code in codes
+        }}
+
+    def _reverse(self, lat: str, lon: str) -> dict:
+        city = STUB_CITIES[self._seed(lat, lon) % len(STUB_CITIES)]
+        return {"lat": lat, "lon": lon, "address": {"city": city}}
+
+
+def start_server(handler_cls, config: StubConfig, host: str = "127.0.0.1", port: int = 0,
+                 models: tuple = ("llama3.2:3b", "llama3.2:1b")) -> ThreadingHTTPServer:
+    """Sunucuyu arka plan thread'inde başlat (port=0: boş bir port seçilir)"""
+    server = ThreadingHTTPServer((host, port), handler_cls)
+    server.daemon_threads = True
+    server.config = config
+    server.models = models
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_stubs(config: StubConfig, host: str = "127.0.0.1", ollama_port: int = 0, api_port: int = 0,
+                backends: int = 1):
+    """Model ve API stub'larını başlat; (sunucular, ortam değişkenleri) döndür.
+    backends > 1 ise ardışık portlarda birden çok model stub'ı (OLLAMA_BASE_URLS) açılır."""
+    ollamas = [start_server(StubOllamaHandler, config, host, ollama_port + i if ollama_port else 0)
+               for i in range(backends)]
+    apis = start_server(StubAPIHandler, config, host, api_port)
+    ollama_urls = [f"http://{host}:{ollama.server_address[1]}" for ollama in ollamas]
+    api_url = f"http://{host}:{apis.server_address[1]}"
+    env = {
+        "OLLAMA_BASE_URL": ollama_urls[0],
+        "OLLAMA_BASE_URLS": ",".join(ollama_urls),
+        "WEATHER_API_URL": f"{api_url}/data/2.5/weather",
+        "AVIATION_API_URL": f"{api_url}/v1/flights",
+        "CURRENCY_API_URL": f"{api_url}/v3/latest",
+        "NOMINATIM_URL": f"{api_url}/reverse",
+    }
+    return ollamas + [apis], env
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    """Stub ayarlarını komut satırı argümanı olarak ekle"""
+    parser.add_argument("--token-rate", type=float, default=50.0, help="Saniyedeki model token'ı")
+    parser.add_argument("--first-token-delay", type=float, default=0.2, help="İlk token gecikmesi (s)")
+    parser.add_argument("--max-tokens", type=int, default=200, help="Yanıt başına en fazla token")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Model isteklerinde hata oranı (0-1)")
+    parser.add_argument("--fail-mode", choices=("error", "disconnect"), default="error")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="Harici API gecikmesi (s)")
+    parser.add_argument("--api-fail-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def config_from_args(args) -> StubConfig:
+    return StubConfig(
+        token_rate=args.token_rate,
+        first_token_delay=args.first_token_delay,
+        max_tokens=args.max_tokens,
+        fail_rate=args.fail_rate,
+        fail_mode=args.fail_mode,
+        api_latency=args.api_latency,
+        api_fail_rate=args.api_fail_rate,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SmartTour stub servers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--ollama-port", type=int, default=11500)
+    parser.add_argument("--api-port", type=int, default=11501)
+    parser.add_argument("--backends", type=int, default=1, help="Model stub sayısı (--ollama-port'tan itibaren)")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    servers, env = start_stubs(config_from_args(args), args.host, args.ollama_port, args.api_port,
+                               args.backends)
+    print("Stub servers running. Export these before starting the app:")
+    for key, value in env.items():
+        print(f"export {key}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
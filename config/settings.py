@@ -8,18 +8,184 @@ OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY", "")
 AVIATIONSTACK_API_KEY = os.getenv("AVIATIONSTACK_API_KEY", "")
 CURRENCYAPI_KEY = os.getenv("CURRENCYAPI_KEY", "")
 
+# Service URLs (benchmark için stub sunuculara yönlendirilebilir)
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+WEATHER_API_URL = os.getenv("WEATHER_API_URL", "https://api.openweathermap.org/data/2.5/weather")
+AVIATION_API_URL = os.getenv("AVIATION_API_URL", "http://api.aviationstack.com/v1/flights")
+CURRENCY_API_URL = os.getenv("CURRENCY_API_URL", "https://api.currencyapi.com/v3/latest")
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/reverse")
+
+# Model sunucu havuzu: virgülle ayrılmış Ollama adresleri (boşsa yalnızca OLLAMA_BASE_URL)
+OLLAMA_BASE_URLS = [url.strip().rstrip("/") for url in os.getenv("OLLAMA_BASE_URLS", OLLAMA_BASE_URL).split(",")
+                    if url.strip()]
+LLM_BACKEND_HEALTH_INTERVAL = float(os.getenv("LLM_BACKEND_HEALTH_INTERVAL", "10"))  # saniye
+LLM_BACKEND_HEALTH_TIMEOUT = 2.0
+LLM_BACKEND_EJECT_AFTER = 3  # art arda bu kadar hatada sunucu havuzdan çıkarılır
+LLM_BACKEND_EJECT_SECONDS = 30.0  # çıkarılan sunucu bu süre sonra deneme isteği alabilir
+LLM_BACKEND_STICKY_TTL = 1800  # kullanıcı aynı sunucuda kalır (KV-cache yeniden kullanımı)
+LLM_BACKEND_STICKY_MAX = 10000
+LLM_BACKEND_FAILOVER = 1  # bağlantı hatasında başka sunucuda ek deneme sayısı
+
 # LLM Settings
-LLM_MODEL = "llama3.2:3b"
+LLM_MODEL = os.getenv("LLM_MODEL", "llama3.2:3b")
 LLM_TEMPERATURE = 0.7
+LLM_KEEP_ALIVE = "30m"  # model ve KV-cache bellekte kalsın
+LLM_NUM_CTX = 4096  # tüm çağrılarda aynı olmalı; değişirse model yeniden yüklenir
+# Kısa ve ucuz görevler için (ör. "llama3.2:1b"); varsayılan ana model, çünkü
+# yalnızca ana modeli indiren kurulumlarda ayrı model 404 döndürür
+LLM_SMALL_MODEL = os.getenv("LLM_SMALL_MODEL", LLM_MODEL)
+
+# Model Routing: görev tipi -> model ve üretim ayarları
+# Aynı modeli kullanan görevlerde num_ctx aynı tutulmalı (aksi halde model yeniden yüklenir)
+# priority: LLM scheduler sınıfı (interactive > plan > background)
+LLM_TASK_PROFILES = {
+    "chat": {"model": LLM_MODEL, "temperature": LLM_TEMPERATURE, "num_predict": 768,
+             "priority": "interactive"},
+    "tool_answer": {"model": LLM_SMALL_MODEL, "temperature": 0.3, "num_predict": 256,
+                    "priority": "interactive"},
+    "interest_summary": {"model": LLM_SMALL_MODEL, "temperature": 0.2, "num_predict": 64,
+                         "priority": "background"},
+    "itinerary": {"model": LLM_MODEL, "temperature": LLM_TEMPERATURE, "num_predict": 1536,
+                  "priority": "plan"},
+    "experiences": {"model": LLM_MODEL, "temperature": LLM_TEMPERATURE, "num_predict": 768,
+                    "priority": "plan"},
+    "summary": {"model": LLM_SMALL_MODEL, "temperature": 0.3, "num_predict": 512,
+                "priority": "plan"},
+}
+
+# LLM Scheduler: model sunucusuna aynı anda giden istek sınırı
+LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", "2"))  # sunucu başına; OLLAMA_NUM_PARALLEL ile aynı olmalı
+LLM_QUEUE_LIMITS = {"interactive": 32, "plan": 16, "background": 8}  # sınıf başına bekleyen
+LLM_QUEUE_TIMEOUTS = {"interactive": 20.0, "plan": 60.0, "background": 2.0}  # saniye
+
+# Startup: ağır modüller ve modeller sunucu isteklere açıldıktan sonra arka planda yüklenir
+STARTUP_PRELOAD = os.getenv("STARTUP_PRELOAD", "1") == "1"  # langchain_ollama, fpdf
+LLM_WARMUP = os.getenv("LLM_WARMUP", "0") == "1"  # her modele 1 token'lık istek (belleğe yükler)
 
 # Database
-DATABASE_PATH = "data/users.db"
+DATABASE_PATH = os.getenv("DATABASE_PATH", "data/users.db")
 
 # PDF Settings
-PDF_OUTPUT_DIR = "outputs"
+PDF_OUTPUT_DIR = os.getenv("PDF_OUTPUT_DIR", "outputs")
 
 # Session Settings
-SESSION_TIMEOUT = 3600  # 1 hour
+SESSION_TIMEOUT = 3600  # 1 hour; bu süre boşta kalan oturum bellekten atılır (geçmiş DB'den yüklenir)
+SESSION_HISTORY_MESSAGES = 20  # oturum başına bellekte tutulan mesaj (halka tampon)
+SESSION_HISTORY_TOKENS = 2500  # modele gönderilen geçmişin token bütçesi (LLM_NUM_CTX içinde kalsın)
+SESSION_COMPRESS_MIN_CHARS = 400  # bundan uzun mesajlar zlib ile sıkıştırılarak tutulur
+
+# CLI (main.py)
+CLI_HISTORY_TOKENS = 2000  # modele gönderilen geçmişin token bütçesi
+CLI_RESUME_TURNS = 20  # devam edilen oturumda veritabanından yüklenen tur sayısı
+
+# SSE Streaming: token'lar bu sınırlara kadar tek olayda birleştirilir
+SSE_FRAME_MAX_BYTES = 512
+SSE_FRAME_MAX_INTERVAL = 0.05  # saniye
+
+# Response Compression: bu boyutun üzerindeki JSON yanıtları zstd ya da gzip ile sıkıştırılır
+COMPRESSION_MIN_BYTES = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_ZSTD_LEVEL = 3
+
+# Static UI: statik dosyalar ve ana sayfa başlangıçta bir kez okunup en yüksek seviyede sıkıştırılır
+STATIC_DIR = "static"
+STATIC_MAX_AGE = 31536000  # içerik özetiyle sürümlenen (?v=...) URL'ler hiç değişmez
+STATIC_UNVERSIONED_MAX_AGE = 300
+STATIC_GZIP_LEVEL = 9
+STATIC_ZSTD_LEVEL = 19
+
+# User History: /user/history sayfa boyutları (keyset sayfalama)
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
+
+# Rate Limiting: kullanıcı (IP) ve endpoint sınıfı başına token-bucket
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # "sqlite": worker'lar arasında paylaşılır
+RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", "data/ratelimit.db")
+RATE_LIMITS = {
+    "chat": {"capacity": 20, "refill_per_second": 20 / 60},  # 20'lik burst, dakikada 20
+    "plan": {"capacity": 5, "refill_per_second": 5 / 300},  # 5 dakikada 5 plan
+    "pdf": {"capacity": 10, "refill_per_second": 10 / 60},
+    "api": {"capacity": 60, "refill_per_second": 1.0},
+}
+RATE_LIMIT_ROUTES = {  # yol öneki -> sınıf; listede olmayan yollar limitsiz
+    "/chat": "chat",
+    "/create_plan": "plan",
+    "/plan_jobs": "api",  # gönderim kullanıcı başına PLAN_JOB_MAX_PENDING ile sınırlı
+    "/generate_pdf": "pdf",
+    "/budget": "api",
+    "/flights": "api",
+    "/user": "api",
+    "/stats": "api",
+}
 
 # Cache Settings
-CACHE_EXPIRY = 1800  # 30 minutes
\ No newline at end of file
+CACHE_EXPIRY = 1800  # 30 minutes
+AGENT_CACHE_EXPIRY = 3600  # ajan çıktıları (plan düzenlemelerinde yeniden kullanılır)
+CACHE_MAX_ENTRIES = 10000  # paylaşılan cache (planlar, geohash hücreleri, uçuş rotaları)
+AGENT_CACHE_MAX_ENTRIES = 1000  # tam LLM çıktıları: kayıt başına birkaç KB
+# Plan ajanları paralel akar; özet, bölüm özütleri hazır olunca ajanlar bitmeden başlar.
+# Plan en fazla LLM slotlarının bir eksiği kadar slot tutar (tek slot kalıyorsa sıralı çalışır)
+PLAN_PIPELINE = os.getenv("PLAN_PIPELINE", "1") == "1"
+
+# Flight Search: rota x tarih sorguları paralel, sağlayıcı limitine uyarak gönderilir
+FLIGHT_SEARCH_WORKERS = 4
+FLIGHT_RATE_PER_SECOND = 5.0  # sağlayıcıya saniyede en fazla istek
+FLIGHT_RATE_BURST = 5
+FLIGHT_RATE_MAX_WAIT = 10.0  # limit yüzünden bundan uzun beklenecekse sorgu atlanır (saniye)
+FLIGHT_ROUTE_LIMIT = 5  # rota/tarih başına sağlayıcıdan istenen satır
+FLIGHT_RESULT_LIMIT = 10  # birleştirilmiş sonuçta en fazla uçuş
+FLIGHT_MAX_DATES = 7
+FLIGHT_MAX_QUERIES = 21  # arama başına rota x tarih sorgusu
+
+# Budget Engine: tek kur tablosu (baz para birimine göre) önbellekte tutulur
+BUDGET_RATE_BASE = "USD"
+BUDGET_RATES_TTL = 3600  # saniye; kur tablosu bu sürede bir yenilenir
+BUDGET_RATES_RETRY = 60  # yenileme başarısızsa eski tabloyla devam, bu süre sonra tekrar dene
+BUDGET_MAX_ITEMS = 500  # istek başına gider kalemi
+
+# Plan Warmer: popüler planları model boştayken önceden hesapla
+PLAN_WARM_ENABLED = os.getenv("PLAN_WARM_ENABLED", "1") == "1"
+PLAN_WARM_INTERVAL = 60  # saniye
+PLAN_WARM_TOP_N = 20  # tur başına en fazla aday
+PLAN_WARM_MIN_REQUESTS = 2  # tek seferlik istekler ön hesaplanmaz
+PLAN_WARM_LOOKBACK_DAYS = 30
+PLAN_WARM_REFRESH_MARGIN = 300  # süresi bu kadar saniye içinde dolacaksa yenile
+PLAN_WARM_CONCURRENCY = 1  # LLM_MAX_CONCURRENT'tan küçük olmalı
+PLAN_WARM_DEFAULT_DAYS = 3  # favori şehirler için
+
+# Plan Jobs: /plan_jobs ile kuyruğa alınan, SQLite'ta kalıcı plan üretim işleri
+PLAN_JOBS_ENABLED = os.getenv("PLAN_JOBS_ENABLED", "1") == "1"
+PLAN_JOB_WORKERS = int(os.getenv("PLAN_JOB_WORKERS", "1"))
+PLAN_JOB_MAX_ATTEMPTS = 3
+PLAN_JOB_RETRY_BACKOFF = 5  # saniye; her denemede iki katına çıkar
+PLAN_JOB_POLL_INTERVAL = 1.0  # saniye
+PLAN_JOB_LEASE_SECONDS = 60  # worker düşerse iş bu süre sonunda tekrar alınır
+PLAN_JOB_CANCEL_CHECK_INTERVAL = 2.0  # saniye; iptal edilen çalışan iş en geç bu sürede durur
+PLAN_JOB_MAX_PENDING = 3  # kullanıcı başına bekleyen iş
+PLAN_JOB_RETENTION_DAYS = 7  # bitmiş işler bu süre sonra silinir
+
+# Semantic Response Cache
+SEMANTIC_CACHE_SIZE = 2048  # en fazla yanıt sayısı
+SEMANTIC_CACHE_THRESHOLD = 0.8  # kosinüs benzerliği
+SEMANTIC_CACHE_DIM = 1024
+
+# Local Knowledge Index
+KNOWLEDGE_SOURCE_PATH = "data/knowledge_base.json"
+KNOWLEDGE_INDEX_DIR = "data/knowledge"  # python -m core.knowledge_index ile oluşturulur
+KNOWLEDGE_INDEX_DIM = 512
+KNOWLEDGE_TOP_K = 5
+
+# Geocoding: koordinatlar geohash hücresine yuvarlanır; önce yerel şehir tablosu
+GEOCODE_GEOHASH_PRECISION = 5  # ~5 km x 5 km hücre
+GEOCODE_OFFLINE_ENABLED = os.getenv("GEOCODE_OFFLINE_ENABLED", "1") == "1"
+GEOCODE_CENTROIDS_PATH = "data/city_centroids.csv"
+GEOCODE_OFFLINE_MAX_KM = 30  # en yakın şehir merkezi bundan uzaksa uzak servise sor
+GEOCODE_REMOTE_ENABLED = os.getenv("GEOCODE_REMOTE_ENABLED", "1") == "1"
+GEOCODE_REMOTE_WORKERS = 2
+GEOCODE_REMOTE_RATE = 1.0  # saniyede en fazla Nominatim isteği (kullanım politikası: 1/s)
+GEOCODE_NEGATIVE_TTL = 300  # şehir bulunamayan/hata veren hücre bu süre tekrar sorulmaz (saniye)
+GEOCODE_NEGATIVE_MAX = 10000
+
+# Metrics: /metrics (Prometheus text formatı); kapalıyken ölçüm kodu devre dışı
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
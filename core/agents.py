@@ -1,18 +1,29 @@
-from langchain_ollama import ChatOllama
+import json
+import hashlib
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.messages import SystemMessage, HumanMessage
+from core.model_router import ModelRouter
+from core.memory_manager import CacheManager
+from core.plan_sections import itinerary_buffer, experience_buffer
+from core.budget_engine import format_budget
+from utils.metrics import metrics
+from config.settings import AGENT_CACHE_EXPIRY, AGENT_CACHE_MAX_ENTRIES, PLAN_PIPELINE
+
+
+class PlanCancelledError(Exception):
+    """Plan üretimi iptal edildi (ör. kuyruktaki iş kullanıcı tarafından iptal edildi)"""
+
+# Not: Sistem mesajları sabittir; şehir, gün sayısı gibi değişken kısımlar
+# her zaman en son mesajdadır. Böylece model sunucusu aynı ajanın ardışık
+# çağrılarında prompt önekini (KV-cache) yeniden kullanabilir.
+
 
 class PlannerAgent:
     """🧭 Rota planlama ajanı"""
     
-    def __init__(self, model_name: str = "llama3.2:3b"):
-        self.llm = ChatOllama(model=model_name)
-    
-    def create_itinerary(self, city: str, days: int, interests: list = None) -> str:
-        """Günlük gezilir yer planı oluştur"""
-        interests_str = ", ".join(interests) if interests else "general sightseeing"
-        
-        prompt = f"""You are a travel planner. Create a detailed {days}-day itinerary for {city}.
-User interests: {interests_str}
+    SYSTEM_MESSAGE = SystemMessage(content="""You are a professional travel planner. You create detailed day-by-day itineraries.
 
 Format:
 Day 1:
@@ -23,107 +34,350 @@ Day 1:
 Day 2:
 ...
 
-Be specific with places, times, and practical tips."""
-
-        messages = [
-            SystemMessage(content="You are a professional travel planner."),
-            HumanMessage(content=prompt)
-        ]
+Be specific with places, times, and practical tips.""")
+    
+    def __init__(self, router: ModelRouter = None, knowledge_index=None):
+        self.router = router or ModelRouter()
+        self.knowledge_index = knowledge_index
+    
+    def _messages(self, city: str, days: int, interests: list = None) -> list:
+        interests_str = ", ".join(interests) if interests else "general sightseeing"
+        
+        prompt = f"Create a detailed {days}-day itinerary for {city}.\nUser interests: {interests_str}"
         
-        response = self.llm.invoke(messages)
+        # Yerel bilgi indeksindeki yerleri plana dahil et
+        indexed_city = self.knowledge_index.detect_city(city) if self.knowledge_index else None
+        if indexed_city:
+            entries = self.knowledge_index.search(
+                f"{city} {interests_str}", city=indexed_city, kinds=("poi", "culture"), k=8
+            )
+            if entries:
+                prompt += (
+                    "\n\nVerified places you can use where they fit:\n"
+                    f"{self.knowledge_index.format_facts(entries)}"
+                )
+
+        return [self.SYSTEM_MESSAGE, HumanMessage(content=prompt)]
+    
+    def create_itinerary(self, city: str, days: int, interests: list = None, user_id: str = None) -> str:
+        """Günlük gezilir yer planı oluştur"""
+        response = self.router.invoke("itinerary", self._messages(city, days, interests), user_id=user_id)
         return response.content
+    
+    def stream_itinerary(self, city: str, days: int, interests: list = None, user_id: str = None):
+        """Planı token token üret"""
+        for chunk in self.router.stream("itinerary", self._messages(city, days, interests), user_id=user_id):
+            if chunk.content:
+                yield chunk.content
 
 
 class ExperienceAgent:
     """🍽️ Yemek ve kültür deneyimi ajanı"""
     
-    def __init__(self, model_name: str = "llama3.2:3b"):
-        self.llm = ChatOllama(model=model_name)
+    SYSTEM_MESSAGE = SystemMessage(content=(
+        "You are a local food and culture expert. "
+        "When asked about dishes, include dish names, descriptions, and where to find them. "
+        "When asked about cultural experiences (museums, theaters, festivals, traditions), "
+        "include practical details. "
+        "When given a list of verified items, present them as two short lists (Food, Culture), "
+        "add one practical tip in a single sentence for each item and do not invent new items."
+    ))
     
-    def recommend_experiences(self, city: str, cuisine: bool = True, culture: bool = True) -> str:
-        """Yemek ve kültür önerileri"""
+    # İndeksten gelen bilgiler yalnızca kısaca zenginleştirilir
+    GROUNDED_NUM_PREDICT = 400
+    
+    def __init__(self, router: ModelRouter = None, knowledge_index=None):
+        self.router = router or ModelRouter()
+        self.knowledge_index = knowledge_index
+    
+    def _grounded_experiences(self, city: str, cuisine: bool, culture: bool):
+        """İndeksteki yemek ve kültür kayıtlarını döndür (yetersizse None)"""
+        if not self.knowledge_index:
+            return None
+        
+        indexed_city = self.knowledge_index.detect_city(city)
+        if not indexed_city:
+            return None
+        
+        kinds = [kind for kind, wanted in (("dish", cuisine), ("culture", culture)) if wanted]
+        entries = self.knowledge_index.facts_for(indexed_city, tuple(kinds), limit=10)
+        if len(entries) < 3 * len(kinds):
+            return None
+        return entries
+    
+    def _messages(self, city: str, cuisine: bool, culture: bool) -> tuple:
+        """Mesajlar ve çağrıya özel model ayarları"""
+        entries = self._grounded_experiences(city, cuisine, culture)
+        if entries:
+            # Bilgiler hazır: model yalnızca kısa ipuçları ekler
+            prompt = (
+                f"Verified local dishes and cultural experiences in {city}:\n"
+                f"{self.knowledge_index.format_facts(entries)}"
+            )
+            return [self.SYSTEM_MESSAGE, HumanMessage(content=prompt)], {"num_predict": self.GROUNDED_NUM_PREDICT}
+        
         prompt_parts = []
         
         if cuisine:
-            prompt_parts.append(
-                f"Recommend 5 must-try local dishes and best restaurants in {city}. "
-                "Include dish names, descriptions, and where to find them."
-            )
+            prompt_parts.append(f"Recommend 5 must-try local dishes and best restaurants in {city}.")
         
         if culture:
-            prompt_parts.append(
-                f"Suggest 5 cultural experiences in {city} (museums, theaters, festivals, traditions). "
-                "Include practical details."
-            )
+            prompt_parts.append(f"Suggest 5 cultural experiences in {city}.")
         
         prompt = "\n\n".join(prompt_parts)
         
-        messages = [
-            SystemMessage(content="You are a local food and culture expert."),
-            HumanMessage(content=prompt)
-        ]
-        
-        response = self.llm.invoke(messages)
+        return [self.SYSTEM_MESSAGE, HumanMessage(content=prompt)], {}
+    
+    def recommend_experiences(self, city: str, cuisine: bool = True, culture: bool = True,
+                              user_id: str = None) -> str:
+        """Yemek ve kültür önerileri"""
+        messages, overrides = self._messages(city, cuisine, culture)
+        response = self.router.invoke("experiences", messages, user_id=user_id, **overrides)
         return response.content
+    
+    def stream_experiences(self, city: str, cuisine: bool = True, culture: bool = True,
+                           user_id: str = None):
+        """Önerileri token token üret"""
+        messages, overrides = self._messages(city, cuisine, culture)
+        for chunk in self.router.stream("experiences", messages, user_id=user_id, **overrides):
+            if chunk.content:
+                yield chunk.content
 
 
 class SummaryAgent:
     """🧠 Özet ve analiz ajanı"""
     
-    def __init__(self, model_name: str = "llama3.2:3b"):
-        self.llm = ChatOllama(model=model_name)
+    SYSTEM_MESSAGE = SystemMessage(content="""You are a travel summarization expert. Summarize the travel plan you are given concisely.
+
+Provide:
+1. Overview (2-3 sentences)
+2. Key highlights (3-5 bullet points)
+3. Budget estimate (if a COMPUTED BUDGET is given, use exactly those totals)
+4. Best time to visit
+5. Pro tips (2-3 practical advice)""")
     
-    def summarize_plan(self, itinerary: str, experiences: str) -> str:
+    def __init__(self, router: ModelRouter = None):
+        self.router = router or ModelRouter()
+    
+    @staticmethod
+    def _with_budget(prompt: str, budget_text: str = None) -> str:
+        return f"{prompt}\n\nCOMPUTED BUDGET:\n{budget_text}" if budget_text else prompt
+    
+    def summarize_plan(self, itinerary: str, experiences: str, user_id: str = None,
+                       budget_text: str = None) -> str:
         """Planı özetle ve kilit noktaları çıkar"""
-        prompt = f"""Summarize this travel plan concisely:
-
-ITINERARY:
+        prompt = self._with_budget(f"""ITINERARY:
 {itinerary}
 
 EXPERIENCES:
-{experiences}
+{experiences}""", budget_text)
 
-Provide:
-1. Overview (2-3 sentences)
-2. Key highlights (3-5 bullet points)
-3. Budget estimate
-4. Best time to visit
-5. Pro tips (2-3 practical advice)"""
+        messages = [self.SYSTEM_MESSAGE, HumanMessage(content=prompt)]
+        
+        response = self.router.invoke("summary", messages, user_id=user_id)
+        return response.content
+    
+    def summarize_highlights(self, city: str, days: int, itinerary_highlights: str,
+                             experience_highlights: str, user_id: str = None, budget_text: str = None) -> str:
+        """Tam metin yerine bölüm özetlerinden özet üret (daha kısa prompt)"""
+        prompt = self._with_budget(f"""{days}-day trip to {city}.
+
+ITINERARY HIGHLIGHTS:
+{itinerary_highlights}
+
+EXPERIENCES:
+{experience_highlights}""", budget_text)
 
-        messages = [
-            SystemMessage(content="You are a travel summarization expert."),
-            HumanMessage(content=prompt)
-        ]
+        messages = [self.SYSTEM_MESSAGE, HumanMessage(content=prompt)]
         
-        response = self.llm.invoke(messages)
+        response = self.router.invoke("summary", messages, user_id=user_id)
         return response.content
 
 
 class MultiAgentOrchestrator:
     """🎭 Tüm ajanları koordine eden orkestratör"""
     
-    def __init__(self):
-        self.planner = PlannerAgent()
-        self.experience = ExperienceAgent()
-        self.summary = SummaryAgent()
+    def __init__(self, knowledge_index=None, router: ModelRouter = None, cache: CacheManager = None):
+        self.router = router or ModelRouter()
+        self.planner = PlannerAgent(router=self.router, knowledge_index=knowledge_index)
+        self.experience = ExperienceAgent(router=self.router, knowledge_index=knowledge_index)
+        self.summary = SummaryAgent(router=self.router)
+        # Ajan çıktıları kendi girdilerine göre cache'lenir: gün sayısı ya da ilgi alanları
+        # değişince deneyimler yeniden kullanılır, yalnızca rota ve özet yeniden üretilir
+        self.cache = cache or CacheManager(expiry_seconds=AGENT_CACHE_EXPIRY, max_entries=AGENT_CACHE_MAX_ENTRIES)
+    
+    @staticmethod
+    def _agent_key(agent: str, *parts) -> str:
+        digest = hashlib.sha1(json.dumps(parts, ensure_ascii=False).encode()).hexdigest()[:20]
+        return f"agent:{agent}:{digest}"
+    
+    @staticmethod
+    def _check_cancelled(cancelled):
+        if cancelled is not None and cancelled.is_set():
+            raise PlanCancelledError("Plan generation was cancelled")
+    
+    def _run_agent(self, agent: str, key: str, reuse: bool, run, cancelled=None):
+        """Ajanı çalıştır; aynı girdilerle üretilmiş çıktı varsa onu kullan"""
+        # İptal her ajan çağrısından önce kontrol edilir
+        self._check_cancelled(cancelled)
+        if reuse:
+            cached = self.cache.get(key)
+            if cached is not None:
+                print(f"♻️ {agent}: reusing previous output")
+                return cached
+        with metrics.span(f"agent.{agent}"):
+            result = run()
+        self.cache.set(key, result)
+        return result
+    
+    def _stream_sections(self, agent: str, key: str, reuse: bool, stream, sections, cancelled=None):
+        """Ajan çıktısını akarken bölüm tamponuna yaz; cache'ten gelen metin de tampondan geçer"""
+        streamed = False
+        
+        def run():
+            nonlocal streamed
+            streamed = True
+            parts = []
+            tokens = stream()
+            try:
+                for token in tokens:
+                    # İptalde akış kapatılır: model slotu hemen serbest kalır
+                    self._check_cancelled(cancelled)
+                    parts.append(token)
+                    sections.feed(token)
+            finally:
+                tokens.close()
+            return "".join(parts)
+        
+        try:
+            text = self._run_agent(agent, key, reuse, run, cancelled)
+            if not streamed:
+                sections.feed(text)
+        finally:
+            # Hata olsa da ready işaretlenir; özeti bekleyen taraf takılmaz
+            sections.close()
+        return text
+    
+    def plan_fan_out(self) -> int:
+        """Bir planın aynı anda tutabileceği model slotu: en az bir slot diğer isteklere kalır"""
+        scheduler = self.router.scheduler
+        if scheduler is None:
+            return 3
+        return min(3, max(1, scheduler.max_concurrent - 1))
     
-    def create_complete_plan(self, city: str, days: int, interests: list = None) -> dict:
-        """Komple seyahat planı oluştur"""
+    def _sequential_plan(self, city, days, interests, user_id, reuse, city_key, interest_key,
+                         budget_text=None, cancelled=None) -> tuple:
         print("🧭 Planner Agent: Creating itinerary...")
-        itinerary = self.planner.create_itinerary(city, days, interests)
+        itinerary = self._run_agent(
+            "planner", self._agent_key("planner", city_key, days, interest_key), reuse,
+            lambda: self.planner.create_itinerary(city, days, interests, user_id=user_id), cancelled
+        )
         
         print("🍽️ Experience Agent: Finding best experiences...")
-        experiences = self.experience.recommend_experiences(city, cuisine=True, culture=True)
+        experiences = self._run_agent(
+            "experience", self._agent_key("experience", city_key, True, True), reuse,
+            lambda: self.experience.recommend_experiences(city, cuisine=True, culture=True,
+                                                          user_id=user_id), cancelled
+        )
         
         print("🧠 Summary Agent: Generating summary...")
-        summary = self.summary.summarize_plan(itinerary, experiences)
+        summary = self._run_agent(
+            "summary", self._agent_key("summary", itinerary, experiences, budget_text), reuse,
+            lambda: self.summary.summarize_plan(itinerary, experiences, user_id=user_id, budget_text=budget_text),
+            cancelled
+        )
+        return itinerary, experiences, summary
+    
+    def _pipelined_plan(self, city, days, interests, user_id, reuse, city_key, interest_key,
+                        budget_text=None, cancelled=None) -> tuple:
+        fan_out = self.plan_fan_out()
+        if fan_out < 2:
+            # Tek slot: paralel akış planı diğer isteklerin önüne geçirir
+            return self._sequential_plan(city, days, interests, user_id, reuse, city_key, interest_key,
+                                         budget_text, cancelled)
+        itinerary_sections, experience_sections = itinerary_buffer(days), experience_buffer()
+        
+        print("🧭🍽️ Planner + Experience Agents: Streaming itinerary and experiences...")
+        # Özet de aynı havuzda çalışır: fan_out 2 ise ajanlardan biri bitene kadar sırada bekler
+        with ThreadPoolExecutor(max_workers=fan_out, thread_name_prefix="plan-agent") as pool:
+            # Her görev kendi context kopyasıyla: arka plan önceliği gibi ayarlar thread'e taşınır
+            itinerary_future = pool.submit(
+                contextvars.copy_context().run, self._stream_sections,
+                "planner", self._agent_key("planner", city_key, days, interest_key), reuse,
+                lambda: self.planner.stream_itinerary(city, days, interests, user_id=user_id),
+                itinerary_sections, cancelled
+            )
+            experience_future = pool.submit(
+                contextvars.copy_context().run, self._stream_sections,
+                "experience", self._agent_key("experience", city_key, True, True), reuse,
+                lambda: self.experience.stream_experiences(city, cuisine=True, culture=True, user_id=user_id),
+                experience_sections, cancelled
+            )
+            
+            # Tüm bölüm özütleri hazır olunca özet başlar; ajanların kalan akışı (ipuçları,
+            # açıklamalar) özetle aynı anda sürer
+            itinerary_sections.ready.wait()
+            experience_sections.ready.wait()
+            itinerary_highlights = itinerary_sections.render()
+            experience_highlights = experience_sections.render(", ")
+            # Taşan tampon son günleri/bölümleri düşürür: o durumda tam metinden özetlenir
+            complete = not (itinerary_sections.overflowed or experience_sections.overflowed)
+            summary_future = None
+            if itinerary_highlights and experience_highlights and complete:
+                print("🧠 Summary Agent: Generating summary from section highlights...")
+                summary_future = pool.submit(
+                    contextvars.copy_context().run, self._run_agent,
+                    "summary",
+                    self._agent_key("summary", city_key, days, itinerary_highlights, experience_highlights,
+                                    budget_text), reuse,
+                    lambda: self.summary.summarize_highlights(city, days, itinerary_highlights,
+                                                              experience_highlights, user_id=user_id,
+                                                              budget_text=budget_text),
+                    cancelled
+                )
+            itinerary = itinerary_future.result()
+            experiences = experience_future.result()
+            summary = summary_future.result() if summary_future else None
+        
+        if summary is None:
+            # Bölüm yapısı tanınmadı ya da özetler eksik: tam metinden özetle
+            print("🧠 Summary Agent: Generating summary...")
+            summary = self._run_agent(
+                "summary", self._agent_key("summary", itinerary, experiences, budget_text), reuse,
+                lambda: self.summary.summarize_plan(itinerary, experiences, user_id=user_id,
+                                                    budget_text=budget_text), cancelled
+            )
+        return itinerary, experiences, summary
+    
+    def create_complete_plan(self, city: str, days: int, interests: list = None, user_id: str = None,
+                             reuse: bool = True, pipelined: bool = PLAN_PIPELINE, budget: dict = None,
+                             cancelled: threading.Event = None) -> dict:
+        """
+        Komple seyahat planı oluştur (reuse=False: tüm ajanları yeniden çalıştır).
+        pipelined: rota ve deneyim ajanları paralel akar; özet, bölüm özütleri hazır olur olmaz
+        ajanların akışı bitmeden başlar (plan en fazla plan_fan_out() model slotu tutar)
+        budget: BudgetEngine.estimate sonucu; özet tahmin yerine bu toplamları kullanır
+        cancelled: işaretlenirse sıradaki ajan çağrısında (akışta sıradaki token'da) PlanCancelledError
+        """
+        city_key = city.strip().lower()
+        interest_key = sorted({i.strip().lower() for i in interests or [] if i.strip()})
+        budget_text = format_budget(budget) if budget else None
+        
+        build = self._pipelined_plan if pipelined else self._sequential_plan
+        itinerary, experiences, summary = build(city, days, interests, user_id, reuse, city_key, interest_key,
+                                                budget_text, cancelled)
         
-        return {
+        full_text = f"# {city} Travel Plan ({days} Days)\n\n{summary}\n\n## Itinerary\n{itinerary}\n\n## Experiences\n{experiences}"
+        plan = {
             "city": city,
             "days": days,
             "interests": interests or [],
             "itinerary": itinerary,
             "experiences": experiences,
             "summary": summary,
-            "full_text": f"# {city} Travel Plan ({days} Days)\n\n{summary}\n\n## Itinerary\n{itinerary}\n\n## Experiences\n{experiences}"
-        }
\ No newline at end of file
+            "full_text": full_text
+        }
+        if budget:
+            plan["budget"] = budget
+            plan["full_text"] = f"{full_text}\n\n## Budget\n{budget_text}"
+        return plan
@@ -0,0 +1,208 @@
+import time
+import threading
+from collections import OrderedDict
+import requests
+from utils.metrics import metrics
+from config.settings import (
+    OLLAMA_BASE_URLS, LLM_BACKEND_HEALTH_INTERVAL, LLM_BACKEND_HEALTH_TIMEOUT, LLM_BACKEND_EJECT_AFTER,
+    LLM_BACKEND_EJECT_SECONDS, LLM_BACKEND_STICKY_TTL, LLM_BACKEND_STICKY_MAX
+)
+
+LATENCY_ALPHA = 0.2  # gecikme EMA ağırlığı
+
+
+def is_backend_error(error: Exception) -> bool:
+    """Sunucudan kaynaklı hata mı? (bağlantı, zaman aşımı, 5xx; 4xx istek hatasıdır)"""
+    status = getattr(error, "status_code", None)
+    return status is None or status >= 500
+
+
+class Backend:
+    """Havuzdaki tek bir model sunucusunun durumu"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.latency = None  # başarılı isteklerin EMA'sı (saniye)
+        self.failures = 0  # art arda hata
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.ejections = 0
+
+    def available(self, now: float) -> bool:
+        """Havuzda mı? Süresi dolan çıkarma, bir deneme isteğine izin verir"""
+        return now >= self.ejected_until
+
+    def as_dict(self, now: float) -> dict:
+        return {
+            "url": self.url,
+            "available": self.available(now),
+            "outstanding": self.outstanding,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "consecutive_failures": self.failures,
+            "requests": self.requests,
+            "errors": self.errors,
+            "ejections": self.ejections,
+        }
+
+
+class BackendPool:
+    """
+    Birden çok Ollama sunucusu arasında yük dağıtımı.
+    Yeni istek en az bekleyen isteği olan sunucuya gider (eşitlikte gecikme
+    EMA'sı düşük olana). Bir kullanıcının çağrıları aynı sunucuda tutulur;
+    böylece sohbet geçmişinin KV-cache'i yeniden kullanılır. Art arda hata
+    veren sunucu çıkarılır; sağlık kontrolü geçince ya da süre dolunca geri döner.
+    """
+
+    def __init__(self, urls: list = None, eject_after: int = LLM_BACKEND_EJECT_AFTER,
+                 eject_seconds: float = LLM_BACKEND_EJECT_SECONDS, sticky_ttl: float = LLM_BACKEND_STICKY_TTL,
+                 sticky_max: int = LLM_BACKEND_STICKY_MAX, health_interval: float = LLM_BACKEND_HEALTH_INTERVAL):
+        urls = urls or OLLAMA_BASE_URLS
+        self.backends = {url: Backend(url) for url in urls}
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.sticky_ttl = sticky_ttl
+        self.sticky_max = sticky_max
+        self.health_interval = health_interval
+        self.sticky = OrderedDict()  # anahtar -> (url, son kullanım)
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def __len__(self):
+        return len(self.backends)
+
+    @property
+    def urls(self) -> list:
+        return list(self.backends)
+
+    # === SEÇİM ===
+    @staticmethod
+    def _load(backend: Backend) -> tuple:
+        return backend.outstanding, backend.latency if backend.latency is not None else 0.0
+
+    def candidates(self, key: str = None) -> list:
+        """Denenecek sunucular, tercih sırasıyla (ilki yapışkan/en az yüklü olan)"""
+        now = time.monotonic()
+        with self.lock:
+            backends = list(self.backends.values())
+            if len(backends) == 1:
+                return backends
+            available = [b for b in backends if b.available(now)]
+            ordered = sorted(available, key=self._load)
+            # Hepsi çıkarılmışsa yine de en az yüklü olanla dene
+            ordered += sorted((b for b in backends if b not in available), key=self._load)
+
+            if key is not None:
+                entry = self.sticky.get(key)
+                if entry and now - entry[1] < self.sticky_ttl and entry[0] in self.backends:
+                    preferred = self.backends[entry[0]]
+                    if preferred.available(now):
+                        ordered.remove(preferred)
+                        ordered.insert(0, preferred)
+                self._bind(key, ordered[0].url, now)
+            return ordered
+
+    def _bind(self, key: str, url: str, now: float):
+        self.sticky[key] = (url, now)
+        self.sticky.move_to_end(key)
+        while len(self.sticky) > self.sticky_max:
+            self.sticky.popitem(last=False)
+
+    def acquire(self, backend: Backend):
+        with self.lock:
+            backend.outstanding += 1
+            backend.requests += 1
+
+    def release(self, backend: Backend, latency: float = None, error: Exception = None, key: str = None):
+        """İsteği bitir; hata sunucudan kaynaklıysa say ve gerekirse sunucuyu çıkar"""
+        failed = error is not None and is_backend_error(error)
+        with self.lock:
+            backend.outstanding -= 1
+            if failed:
+                self._mark_failure(backend, key)
+            elif error is None:
+                backend.failures = 0
+                backend.ejected_until = 0.0
+                if latency is not None:
+                    backend.latency = latency if backend.latency is None else (
+                        LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * backend.latency
+                    )
+        if failed:
+            metrics.inc("smarttour_llm_backend_errors_total", backend=backend.url)
+
+    def _mark_failure(self, backend: Backend, key: str = None):
+        backend.errors += 1
+        backend.failures += 1
+        if key is not None and self.sticky.get(key, (None,))[0] == backend.url:
+            del self.sticky[key]  # sonraki çağrı yeniden seçsin
+        if len(self.backends) > 1 and backend.failures >= self.eject_after:
+            if backend.ejected_until <= time.monotonic():
+                backend.ejections += 1
+                print(f"LLM backend ejected: {backend.url} ({backend.failures} consecutive failures)")
+            backend.ejected_until = time.monotonic() + self.eject_seconds
+
+    # === SAĞLIK KONTROLÜ ===
+    def check(self, backend: Backend) -> bool:
+        """/api/version ile sağlık kontrolü; sonucu sunucu durumuna yansıt"""
+        try:
+            healthy = requests.get(f"{backend.url}/api/version", timeout=LLM_BACKEND_HEALTH_TIMEOUT).ok
+        except requests.RequestException:
+            healthy = False
+        with self.lock:
+            if healthy:
+                if backend.ejected_until:
+                    print(f"LLM backend re-admitted: {backend.url}")
+                backend.failures = 0
+                backend.ejected_until = 0.0
+            else:
+                # Kontrol hatası bir istek hatası gibi sayılır (ama istatistiğe girmez)
+                backend.failures += 1
+                if backend.failures >= self.eject_after:
+                    backend.ejected_until = time.monotonic() + self.eject_seconds
+        return healthy
+
+    def check_all(self) -> dict:
+        return {backend.url: self.check(backend) for backend in list(self.backends.values())}
+
+    def _health_loop(self):
+        while not self.stop_event.wait(self.health_interval):
+            try:
+                self.check_all()
+            except Exception as e:
+                print(f"LLM backend health check error: {e}")
+
+    def start(self):
+        """Birden fazla sunucu varsa düzenli sağlık kontrolünü başlat"""
+        if self.thread or len(self.backends) < 2:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._health_loop, name="llm-backend-health", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout)
+            self.thread = None
+
+    # === İSTATİSTİK ===
+    def outstanding(self) -> dict:
+        """Prometheus gauge: sunucu başına bekleyen istek"""
+        with self.lock:
+            return {(("backend", b.url),): b.outstanding for b in self.backends.values()}
+
+    def up(self) -> dict:
+        now = time.monotonic()
+        with self.lock:
+            return {(("backend", b.url),): int(b.available(now)) for b in self.backends.values()}
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self.lock:
+            return {
+                "backends": [b.as_dict(now) for b in self.backends.values()],
+                "sticky_sessions": len(self.sticky),
+            }
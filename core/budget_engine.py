@@ -0,0 +1,220 @@
+import math
+import time
+import threading
+import numpy as np
+from utils.api_clients import CurrencyAPI
+from config.settings import BUDGET_RATE_BASE, BUDGET_RATES_TTL, BUDGET_RATES_RETRY, BUDGET_MAX_ITEMS
+
+
+class RatesUnavailableError(Exception):
+    """Döviz kuru tablosu alınamadı (HTTP 503)"""
+
+
+class RateTable:
+    """Baz para birimine göre kurlar: kod -> indeks sözlüğü ve NumPy kur vektörü"""
+
+    def __init__(self, base: str, rates: dict, fetched_at: float):
+        rates = {code.upper(): float(value) for code, value in rates.items()}
+        rates[base] = 1.0  # 1 baz = 1 baz
+        codes = sorted(code for code, value in rates.items() if math.isfinite(value) and value > 0)
+        self.base = base
+        self.codes = codes
+        self.index = {code: i for i, code in enumerate(codes)}
+        self.rates = np.array([rates[code] for code in codes], dtype=np.float64)
+        self.fetched_at = fetched_at
+
+    def __len__(self):
+        return len(self.codes)
+
+    def indices(self, currencies: list) -> np.ndarray:
+        try:
+            return np.fromiter((self.index[c] for c in currencies), dtype=np.intp, count=len(currencies))
+        except KeyError as e:
+            raise ValueError(f"Unknown currency: {e.args[0]}") from None
+
+    def convert(self, amounts, currencies: list, to_currency: str) -> np.ndarray:
+        """Her tutarı kendi para biriminden hedefe çevir (tek vektör işlemi)"""
+        target = self.rates[self.indices([to_currency])[0]]
+        return np.asarray(amounts, dtype=np.float64) / self.rates[self.indices(currencies)] * target
+
+
+class BudgetEngine:
+    """
+    Seyahat bütçesi hesaplayıcı.
+    Kur tablosu CurrencyAPI.get_rates ile tek istekte alınır ve ttl boyunca
+    paylaşılır; tüm gider kalemleri tek seferde vektör olarak çevrilir.
+    Yenileme kilit dışında tek bir istek tarafından yapılır; diğerleri bu sırada
+    eski tabloyla devam eder. Yenileme başarısız olursa eski tablo kullanılır.
+    """
+
+    def __init__(self, fetch=CurrencyAPI.get_rates, base: str = BUDGET_RATE_BASE,
+                 ttl: float = BUDGET_RATES_TTL, retry: float = BUDGET_RATES_RETRY):
+        self.fetch = fetch
+        self.base = base.upper()
+        self.ttl = ttl
+        self.retry = retry
+        self.table = None
+        self.next_refresh = 0.0
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)
+        self.refreshing = False
+        self.refreshes = 0
+        self.failures = 0
+
+    # === KUR TABLOSU ===
+    def rates(self) -> RateTable:
+        """Güncel (ya da yenilenemediyse son) kur tablosu"""
+        with self.lock:
+            now = time.time()
+            refresh = now >= self.next_refresh and not self.refreshing
+            if refresh:
+                self.refreshing = True
+            elif self.table is None:
+                # İlk tablo başka istekte yükleniyor: onu bekle
+                self.ready.wait_for(lambda: not self.refreshing)
+        if refresh:
+            self._refresh(now)
+        table = self.table
+        if table is None:
+            raise RatesUnavailableError("Currency rates are not available, please try again later")
+        return table
+
+    def _refresh(self, now: float):
+        """Ağ isteği kilit dışında; yeni tablo kilit altında yerine konur"""
+        table = None
+        try:
+            result = self.fetch(self.base)
+            if result.get("success"):
+                try:
+                    table = RateTable(self.base, {code: entry["value"] for code, entry in result["rates"].items()},
+                                      now)
+                except (KeyError, TypeError, ValueError) as e:
+                    result = {"error": f"Invalid rate table: {e}"}
+        except Exception as e:
+            result = {"error": str(e)}
+        finally:
+            with self.lock:
+                if table is not None:
+                    self.table = table
+                    self.next_refresh = now + self.ttl
+                    self.refreshes += 1
+                else:
+                    self.next_refresh = now + self.retry
+                    self.failures += 1
+                self.refreshing = False
+                self.ready.notify_all()
+        if table is None:
+            print(f"Currency rates error: {result.get('error')}")
+
+    def convert(self, amount: float, from_currency: str, to_currency: str) -> dict:
+        """Tek dönüşüm, CurrencyAPI.convert ile aynı biçimde (API çağrısı yerine tablo)"""
+        from_currency, to_currency = from_currency.upper(), to_currency.upper()
+        try:
+            table = self.rates()
+            converted = float(table.convert([amount], [from_currency], to_currency)[0])
+        except (RatesUnavailableError, ValueError) as e:
+            return {"success": False, "error": str(e)}
+        rate = converted / amount if amount else float(table.convert([1.0], [from_currency], to_currency)[0])
+        return {
+            "success": True,
+            "from_currency": from_currency,
+            "to_currency": to_currency,
+            "amount": amount,
+            "rate": rate,
+            "converted": round(converted, 2),
+            "formatted": (
+                f"{amount} {from_currency} = {round(converted, 2)} {to_currency} (Rate: {round(rate, 4)})"
+            )
+        }
+
+    # === BÜTÇE ===
+    @staticmethod
+    def _number(item: dict, key: str, default: float) -> float:
+        value = item.get(key, default)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value < 0:
+            raise ValueError(f"'{key}' must be a non-negative number")
+        return float(value)
+
+    def _parse_items(self, items: list, currency: str) -> tuple:
+        """Kalemleri sütun dizilerine ayır"""
+        if not isinstance(items, list) or not items:
+            raise ValueError("items must be a non-empty list")
+        if len(items) > BUDGET_MAX_ITEMS:
+            raise ValueError(f"At most {BUDGET_MAX_ITEMS} items are allowed")
+
+        amounts, quantities, per_day, per_person, currencies, categories = [], [], [], [], [], []
+        for position, item in enumerate(items):
+            if not isinstance(item, dict):
+                raise ValueError(f"Item {position} must be an object")
+            try:
+                amounts.append(self._number(item, "amount", None))
+                quantities.append(self._number(item, "quantity", 1))
+            except ValueError as e:
+                raise ValueError(f"Item {position}: {e}") from None
+            per_day.append(bool(item.get("per_day", False)))
+            per_person.append(bool(item.get("per_person", False)))
+            currencies.append(str(item.get("currency") or currency).strip().upper())
+            categories.append(str(item.get("category") or "other").strip().lower())
+        return (np.array(amounts), np.array(quantities), np.array(per_day), np.array(per_person),
+                currencies, categories)
+
+    def estimate(self, items: list, currency: str, days: int = 1, travelers: int = 1) -> dict:
+        """
+        Gider kalemlerinden toplam bütçe.
+        Kalem: {"amount", "currency", "category", "quantity", "per_day", "per_person"};
+        per_day kalemler gün sayısıyla, per_person kalemler kişi sayısıyla çarpılır.
+        """
+        currency = (currency or self.base).strip().upper()
+        if not isinstance(days, int) or not isinstance(travelers, int) or days < 1 or travelers < 1:
+            raise ValueError("days and travelers must be positive integers")
+        amounts, quantities, per_day, per_person, currencies, categories = self._parse_items(items, currency)
+
+        table = self.rates()
+        multipliers = quantities * np.where(per_day, days, 1) * np.where(per_person, travelers, 1)
+        converted = table.convert(amounts * multipliers, currencies, currency)
+
+        names, inverse = np.unique(categories, return_inverse=True)
+        by_category = np.bincount(inverse, weights=converted, minlength=len(names))
+        order = np.argsort(-by_category, kind="stable")
+        total = float(converted.sum())
+
+        return {
+            "currency": currency,
+            "days": days,
+            "travelers": travelers,
+            "total": round(total, 2),
+            "per_day": round(total / days, 2),
+            "per_person": round(total / travelers, 2),
+            "by_category": {str(names[i]): round(float(by_category[i]), 2) for i in order},
+            "items": [
+                dict(item, converted=round(value, 2)) for item, value in zip(items, converted.tolist())
+            ],
+            "rates": {
+                "base": table.base,
+                "fetched_at": table.fetched_at,
+                "stale": time.time() - table.fetched_at > self.ttl,
+            },
+        }
+
+    def stats(self) -> dict:
+        with self.lock:
+            table = self.table
+            return {
+                "base": self.base,
+                "currencies": len(table) if table else 0,
+                "age_seconds": round(time.time() - table.fetched_at) if table else None,
+                "refreshes": self.refreshes,
+                "failures": self.failures,
+            }
+
+
+def format_budget(budget: dict) -> str:
+    """Özet ajanı için hesaplanmış bütçe metni"""
+    currency = budget["currency"]
+    lines = [
+        f"Total: {budget['total']:.2f} {currency} for {budget['days']} days and "
+        f"{budget['travelers']} traveler(s) ({budget['per_person']:.2f} per person, "
+        f"{budget['per_day']:.2f} per day)"
+    ]
+    lines += [f"- {category.title()}: {amount:.2f} {currency}" for category, amount in budget["by_category"].items()]
+    return "\n".join(lines)
@@ -0,0 +1,66 @@
+import re
+import zlib
+import numpy as np
+
+# Anlamı taşımayan soru kalıpları
+STOPWORDS = frozenset("""
+a an the to in at on of for and or is are was be do does can could should would will
+i me my we our you your what which where when how who why some any please tell about
+there here with from by into this that it its
+""".split())
+
+# Sık sorulan kavramların eş anlamlıları tek köke indirgenir
+SYNONYMS = {
+    "eat": "food", "eating": "food", "foods": "food", "dish": "food", "dishes": "food",
+    "cuisine": "food", "meal": "food", "meals": "food", "restaurant": "food", "restaurants": "food",
+    "top": "best", "must": "best", "greatest": "best", "recommended": "best",
+    "see": "visit", "sights": "visit", "sightseeing": "visit", "attractions": "visit",
+    "attraction": "visit", "places": "visit", "place": "visit", "landmarks": "visit",
+    "hotel": "stay", "hotels": "stay", "accommodation": "stay", "sleep": "stay",
+    "cheap": "budget", "affordable": "budget", "inexpensive": "budget",
+    "museums": "museum", "beaches": "beach", "nightlife": "night",
+}
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class HashedNgramEmbedder:
+    """Ağ ve GPU gerektirmeyen hashlenmiş n-gram vektörleri"""
+
+    def __init__(self, dim: int = 1024, char_ngram: int = 3, word_weight: float = 2.0):
+        self.dim = dim
+        self.char_ngram = char_ngram
+        self.word_weight = word_weight
+
+    def tokens(self, text: str) -> list:
+        """Metni normalize edilmiş anahtar kelimelere ayır"""
+        words = TOKEN_RE.findall(text.lower())
+        return [SYNONYMS.get(w, w) for w in words if w not in STOPWORDS]
+
+    def _features(self, text: str):
+        """Kelime ve karakter n-gram özellikleri"""
+        for word in self.tokens(text):
+            yield "w:" + word, self.word_weight
+            padded = f"#{word}#"
+            for i in range(max(1, len(padded) - self.char_ngram + 1)):
+                yield "c:" + padded[i:i + self.char_ngram], 1.0
+
+    def embed(self, text: str) -> np.ndarray:
+        """Tek metni L2-normalize float32 vektöre çevir"""
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in self._features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            # İşaretli hashing: çakışmalar birbirini kısmen götürür
+            vec[h % self.dim] += weight if (h >> 31) & 1 else -weight
+
+        norm = np.linalg.norm(vec)
+        if norm > 0:
+            vec /= norm
+        return vec
+
+    def embed_many(self, texts: list) -> np.ndarray:
+        """Birden fazla metni (n, dim) matrisine çevir"""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            matrix[i] = self.embed(text)
+        return matrix
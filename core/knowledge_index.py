@@ -0,0 +1,238 @@
+import os
+import re
+import json
+import threading
+import numpy as np
+from core.embeddings import HashedNgramEmbedder, STOPWORDS, TOKEN_RE
+from config.settings import KNOWLEDGE_SOURCE_PATH, KNOWLEDGE_INDEX_DIR, KNOWLEDGE_INDEX_DIM
+
+KIND_LABELS = {
+    "poi": "place to visit",
+    "dish": "local dish",
+    "culture": "cultural experience",
+}
+
+# Basit bilgi sorularını türüne göre yakalayan anahtar kelimeler
+LOOKUP_KEYWORDS = {
+    "dish": re.compile(r"\b(eat|food|foods|dish|dishes|cuisine|must-try)\b", re.IGNORECASE),
+    "poi": re.compile(r"\b(visit|see|sights|attractions|landmarks|places|sightseeing)\b", re.IGNORECASE),
+    "culture": re.compile(r"\b(culture|cultural|traditions|experiences|customs)\b", re.IGNORECASE),
+}
+LOOKUP_QUESTION_RE = re.compile(
+    r"^\s*(what|which|where|list|recommend|suggest|best|top|must)\b", re.IGNORECASE
+)
+# Bu kelimeler varsa soru basit bir listeleme değildir
+LOOKUP_EXCLUDE_RE = re.compile(
+    r"\b(plan|itinerary|day|days|week|budget|weather|flight|flights|hotel|why|how)\b", re.IGNORECASE
+)
+
+# Soru kalıbının parçası olan kelimeler; bunlar, tür kelimesi ve şehir dışında
+# bir şey kalırsa ("vegetarian", "avoid", "not", "gluten free") soru LLM'e gider
+LOOKUP_FILLER = STOPWORDS | frozenset("""
+list recommend suggest best top must try good great famous popular local traditional typical
+things thing go should need know give show us some most
+""".split())
+
+EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "metadata.json"
+
+
+def build_index(source_path: str = KNOWLEDGE_SOURCE_PATH, output_dir: str = KNOWLEDGE_INDEX_DIR,
+                dim: int = KNOWLEDGE_INDEX_DIM) -> int:
+    """Kaynak JSON'dan embedding matrisi ve metadata dosyasını üret"""
+    with open(source_path, encoding="utf-8") as f:
+        source = json.load(f)
+
+    entries = []
+    for city, data in source.items():
+        for kind in KIND_LABELS:
+            for item in data.get(kind, []):
+                entries.append({
+                    "city": city,
+                    "country": data.get("country", ""),
+                    "kind": kind,
+                    "name": item["name"],
+                    "description": item["description"],
+                })
+
+    embedder = HashedNgramEmbedder(dim=dim)
+    texts = [
+        f"{e['name']} {KIND_LABELS[e['kind']]} {e['city']} {e['description']}"
+        for e in entries
+    ]
+    vectors = embedder.embed_many(texts)
+
+    os.makedirs(output_dir, exist_ok=True)
+    np.save(os.path.join(output_dir, EMBEDDINGS_FILE), vectors)
+    with open(os.path.join(output_dir, METADATA_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "dim": dim,
+            "source_mtime": os.path.getmtime(source_path),
+            "entries": entries,
+        }, f, ensure_ascii=False)
+
+    return len(entries)
+
+
+class KnowledgeIndex:
+    """Şehir bazlı yerel bilgi indeksi (memory-mapped embedding matrisi)"""
+
+    def __init__(self, index_dir: str = KNOWLEDGE_INDEX_DIR, source_path: str = KNOWLEDGE_SOURCE_PATH,
+                 dim: int = KNOWLEDGE_INDEX_DIM):
+        self.index_dir = index_dir
+        self.source_path = source_path
+        self.embedder = HashedNgramEmbedder(dim=dim)
+        self.vectors = None
+        self.entries = []
+        self.city_rows = {}
+        self.kinds = np.array([], dtype="<U8")
+        self.city_re = None
+        self._city_lookup = {}
+        # İndeks ilk aramada yüklenir (gerekirse oluşturulur); import ve nesne oluşturma ucuz kalır
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    def ensure_loaded(self):
+        """İndeks henüz yüklenmediyse yükle (thread'ler arasında tek sefer)"""
+        if self.loaded:
+            return
+        with self.lock:
+            if not self.loaded:
+                self.load()
+                self.loaded = True
+
+    def _is_stale(self, metadata_path: str) -> bool:
+        """İndeks yok ya da kaynak dosyadan eski mi?"""
+        if not os.path.exists(metadata_path):
+            return True
+        if not os.path.exists(self.source_path):
+            return False
+        with open(metadata_path, encoding="utf-8") as f:
+            metadata = json.load(f)
+        return (metadata.get("dim") != self.embedder.dim or
+                metadata.get("source_mtime") != os.path.getmtime(self.source_path))
+
+    def load(self):
+        """İndeksi diskten yükle; gerekiyorsa önce oluştur"""
+        metadata_path = os.path.join(self.index_dir, METADATA_FILE)
+        try:
+            if self._is_stale(metadata_path):
+                count = build_index(self.source_path, self.index_dir, self.embedder.dim)
+                print(f"📚 Knowledge index built: {count} entries")
+
+            with open(metadata_path, encoding="utf-8") as f:
+                metadata = json.load(f)
+            self.vectors = np.load(os.path.join(self.index_dir, EMBEDDINGS_FILE), mmap_mode="r")
+        except Exception as e:
+            print(f"Knowledge index error: {e}")
+            return
+
+        self.entries = metadata["entries"]
+        self.kinds = np.array([e["kind"] for e in self.entries])
+        self.city_rows = {}
+        for i, entry in enumerate(self.entries):
+            self.city_rows.setdefault(entry["city"], []).append(i)
+        self.city_rows = {city: np.array(rows) for city, rows in self.city_rows.items()}
+
+        # Uzun isimler önce: "New York" > "York"
+        names = sorted(self.city_rows, key=len, reverse=True)
+        self.city_re = re.compile(
+            r"\b(" + "|".join(re.escape(n) for n in names) + r")\b", re.IGNORECASE
+        ) if names else None
+        self._city_lookup = {n.lower(): n for n in names}
+
+    def detect_city(self, text: str):
+        """Metinde geçen ilk bilinen şehri bul"""
+        self.ensure_loaded()
+        if not self.city_re:
+            return None
+        match = self.city_re.search(text)
+        return self._city_lookup[match.group(1).lower()] if match else None
+
+    def search(self, query: str, city: str = None, kinds: tuple = None, k: int = 5) -> list:
+        """Sorguya en yakın k kaydı döndür"""
+        self.ensure_loaded()
+        if self.vectors is None or not self.entries:
+            return []
+
+        if city:
+            rows = self.city_rows.get(city)
+            if rows is None:
+                return []
+        else:
+            rows = np.arange(len(self.entries))
+
+        if kinds:
+            rows = rows[np.isin(self.kinds[rows], kinds)]
+        if len(rows) == 0:
+            return []
+
+        scores = self.vectors[rows] @ self.embedder.embed(query)
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [dict(self.entries[rows[i]], score=float(scores[i])) for i in top]
+
+    def facts_for(self, city: str, kinds: tuple, limit: int = 5) -> list:
+        """Şehir için belirli türdeki kayıtları kaynak sırasıyla döndür"""
+        self.ensure_loaded()
+        rows = self.city_rows.get(city)
+        if rows is None:
+            return []
+        return [self.entries[i] for i in rows if self.entries[i]["kind"] in kinds][:limit]
+
+    @staticmethod
+    def format_facts(entries: list) -> str:
+        """Kayıtları prompt'a eklenecek satırlara çevir"""
+        return "\n".join(
+            f"- {e['name']} ({KIND_LABELS[e['kind']]}, {e['city']}): {e['description']}"
+            for e in entries
+        )
+
+    def retrieve(self, text: str, k: int = 5) -> str:
+        """Metinde bir şehir geçiyorsa ilgili bilgileri prompt formatında döndür"""
+        city = self.detect_city(text)
+        if not city:
+            return ""
+        return self.format_facts(self.search(text, city=city, k=k))
+
+    def answer_lookup(self, question: str):
+        """Basit listeleme sorularını LLM'e gitmeden indeksten yanıtla"""
+        if len(question.split()) > 14 or not LOOKUP_QUESTION_RE.search(question):
+            return None
+        if LOOKUP_EXCLUDE_RE.search(question):
+            return None
+
+        city = self.detect_city(question)
+        if not city:
+            return None
+
+        kinds = [kind for kind, pattern in LOOKUP_KEYWORDS.items() if pattern.search(question)]
+        if len(kinds) != 1:
+            return None
+
+        # Ek kısıt ya da olumsuzluk varsa hazır liste yanlış olur
+        remainder = self.city_re.sub(" ", question)
+        for pattern in LOOKUP_KEYWORDS.values():
+            remainder = pattern.sub(" ", remainder)
+        if any(word not in LOOKUP_FILLER for word in TOKEN_RE.findall(remainder.lower())):
+            return None
+
+        entries = self.facts_for(city, (kinds[0],), limit=6)
+        if not entries:
+            return None
+
+        titles = {
+            "dish": f"Must-try dishes in {city}",
+            "poi": f"Top places to visit in {city}",
+            "culture": f"Cultural experiences in {city}",
+        }
+        lines = "\n\n".join(f"- **{e['name']}**: {e['description']}" for e in entries)
+        return f"## {titles[kinds[0]]}\n\n{lines}"
+
+
+if __name__ == "__main__":
+    # Offline build: python -m core.knowledge_index
+    count = build_index()
+    print(f"📚 Knowledge index built: {count} entries -> {KNOWLEDGE_INDEX_DIR}")
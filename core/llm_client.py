@@ -1,40 +1,95 @@
-from langchain_ollama import ChatOllama
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-from langchain_community.chat_message_histories import ChatMessageHistory
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.messages import SystemMessage, HumanMessage
 from utils.api_clients import WeatherAPI, AviationAPI, CurrencyAPI
+from utils.flight_search import date_range
+from core.model_router import ModelRouter
+from core.llm_scheduler import LLMOverloadedError
+from core.memory_manager import CompactHistory
+from utils.metrics import metrics
+from config.settings import KNOWLEDGE_TOP_K
 import re
+import time
+from datetime import date, timedelta
 
 class TourismAssistant:
     """SmartTour: Gelişmiş özelliklere sahip seyahat asistanı."""
 
-    def __init__(self, model_name: str = "llama3.2:3b", memory: ChatMessageHistory = None):
-        self.llm = ChatOllama(model=model_name)
-        self.memory = memory or ChatMessageHistory()
-        self.interest_summary = ""
+    # Önceki konuşmaya atıf yapan sorular cache'lenmez
+    CONTEXT_REFERENCE_RE = re.compile(
+        r"\b(it|its|that|this|these|those|there|they|them|above|previous|earlier|"
+        r"again|more|else|same|also|another|instead)\b",
+        re.IGNORECASE
+    )
+
+    # Sabit sistem mesajı: tüm kullanıcı ve turlar için aynı önek
+    SYSTEM_MESSAGE = SystemMessage(content=(
+        "You are SmartTour, a professional, friendly, and knowledgeable tourism assistant. "
+        "You help users explore destinations, plan trips, and discover cultural and culinary highlights. "
+        "You have access to real-time weather, flight, and currency data. "
+        "Provide concise yet inspiring answers with practical travel tips and local insights. "
+        "Bracketed notes at the end of a user message contain live data and context for that message."
+    ))
+
+    # "from IST, SAW to FCO / CIA": birden çok havalimanı
+    AIRPORTS = r"([A-Z]{3}(?:(?:\s*[,/]\s*|\s+OR\s+)[A-Z]{3})*)"
+    FLIGHT_ROUTE_RE = re.compile(rf"FROM\s+{AIRPORTS}\s+TO\s+{AIRPORTS}\b")
+    ISO_DATE_RE = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+    NEXT_DAYS_RE = re.compile(r"\bnext\s+(\d{1,2})\s+days?\b")
+
+    # İlgi alanı özeti için sabit sistem mesajı
+    INTEREST_SYSTEM_MESSAGE = SystemMessage(
+        content="You summarize user's travel interests from conversation history."
+    )
+
+    def __init__(self, router: ModelRouter = None, memory=None,
+                 response_cache=None, knowledge_index=None, user_id: str = None,
+                 track_interests: bool = True, budget_engine=None, flight_search=None,
+                 interest_summary: str = ""):
+        self.router = router or ModelRouter()
+        self.user_id = user_id
+        self.track_interests = track_interests
+        self.memory = memory if memory is not None else CompactHistory()
+        # Oturumda saklanan son özet; yeni bir yanıt üretilince update_interest_summary ile yenilenir
+        self.interest_summary = interest_summary
+        self.interests_stale = False
+        self.response_cache = response_cache
+        self.knowledge_index = knowledge_index
+        # Önbellekteki kur tablosu: dönüşüm başına API çağrısı yapılmaz
+        self.budget_engine = budget_engine
+        # Paylaşılan uçuş arama servisi: çoklu rota/tarih sorguları paralel ve cache'li
+        self.flight_search = flight_search
         
         # API clients
         self.weather_api = WeatherAPI()
         self.aviation_api = AviationAPI()
         self.currency_api = CurrencyAPI()
 
-    def _build_prompt(self, user_input: str):
-        """Sistem promptunu oluştur"""
-        system_content = (
-            "You are SmartTour, a professional, friendly, and knowledgeable tourism assistant. "
-            "You help users explore destinations, plan trips, and discover cultural and culinary highlights. "
-            "You have access to real-time weather, flight, and currency data. "
-            "Provide concise yet inspiring answers with practical travel tips and local insights."
-        )
+    def _build_context(self, user_input: str) -> str:
+        """Her turda değişen bağlamı oluştur (yerel bilgiler, ilgi alanları)"""
+        parts = []
+
+        # Yerel bilgi indeksinden doğrulanmış bilgiler
+        if self.knowledge_index:
+            facts = self.knowledge_index.retrieve(user_input, k=KNOWLEDGE_TOP_K)
+            if facts:
+                parts.append(f"[Verified local facts, prefer these over guesses:\n{facts}]")
 
         if self.interest_summary:
-            system_content += (
-                f"\n\nThe user is particularly interested in: {self.interest_summary}. "
-                "You should tailor your responses with this context in mind."
+            parts.append(
+                f"[The user is particularly interested in: {self.interest_summary}. "
+                "Tailor your answer with this in mind.]"
             )
 
-        system_msg = SystemMessage(content=system_content)
-        return [system_msg] + self.memory.messages + [HumanMessage(content=user_input)]
+        return "\n\n".join(parts)
+
+    def _build_prompt(self, user_input: str):
+        """
+        Prompt'u oluştur.
+        Sistem mesajı ve geçmiş her turda aynı kalır; model sunucusu KV-cache
+        önekini yeniden kullanabilsin diye değişken bağlam en sona eklenir.
+        """
+        context = self._build_context(user_input)
+        content = f"{user_input}\n\n{context}" if context else user_input
+        return [self.SYSTEM_MESSAGE, *self.memory.messages, HumanMessage(content=content)]
 
     def _check_tool_usage(self, user_input: str) -> tuple:
         """Kullanıcının hangi aracı kullanmak istediğini tespit et"""
@@ -49,9 +104,11 @@ class TourismAssistant:
         # Flight kontrolü
         if any(word in lower_input for word in ["flight", "flights", "plane", "fly"]):
             # "flights from IST to FCO" pattern
-            flight_match = re.search(r'from\s+([A-Z]{3})\s+to\s+([A-Z]{3})', user_input.upper())
+            flight_match = self.FLIGHT_ROUTE_RE.search(user_input.upper())
             if flight_match:
-                return ("flight", (flight_match.group(1), flight_match.group(2)))
+                origins, destinations = (re.findall(r"[A-Z]{3}", group.replace(" OR ", ","))
+                                         for group in flight_match.groups())
+                return ("flight", (origins, destinations, self._flight_dates(lower_input)))
         
         # Currency kontrolü
         if any(word in lower_input for word in ["convert", "currency", "exchange", "rate"]):
@@ -65,67 +122,151 @@ class TourismAssistant:
         
         return (None, None)
 
-    def _update_interest_summary(self):
-        """İlgi alanlarını güncelle"""
-        recent_history = self.memory.messages[-6:]
-        history_text = "\n".join(
-            f"{msg.type.upper()}: {msg.content}" for msg in recent_history 
-            if isinstance(msg, (HumanMessage, AIMessage))
-        )
-
-        summarization_prompt = ChatPromptTemplate.from_messages([
-            ("system", "You summarize user's travel interests from conversation history."),
-            ("human", "Given this chat:\n\n{history}\n\nWhat are the user's travel preferences?")
-        ])
-
-        chain = summarization_prompt | self.llm
-        result = chain.invoke({"history": history_text})
+    @classmethod
+    def _flight_dates(cls, lower_input: str, today: date = None) -> list:
+        """Sorudaki tarih/aralık: "2026-05-01", "2026-05-01 to 2026-05-04", "next 3 days", "this week"..."""
+        today = today or date.today()
+        try:
+            dates = [date.fromisoformat(d) for d in cls.ISO_DATE_RE.findall(lower_input)]
+        except ValueError:
+            dates = []
+        if dates:
+            return date_range(dates[0], (dates[-1] - dates[0]).days + 1)
+        next_days = cls.NEXT_DAYS_RE.search(lower_input)
+        if next_days:
+            return date_range(today, int(next_days.group(1)))
+        if "next week" in lower_input:
+            return date_range(today + timedelta(days=7 - today.weekday()), 7)
+        if "this week" in lower_input:
+            return date_range(today, 7 - today.weekday())
+        if "tomorrow" in lower_input:
+            return date_range(today + timedelta(days=1), 1)
+        if "today" in lower_input:
+            return date_range(today, 1)
+        return None
+
+    @metrics.timed("smarttour_span_seconds", span="chat.interest_summary")
+    def update_interest_summary(self) -> str:
+        """
+        İlgi alanlarını güncelle ve özeti döndür. Yanıt akışının parçası değildir:
+        çağıran taraf yanıt gönderildikten sonra (arka planda) çalıştırır.
+        Hazır (cache/indeks) yanıtlardan sonra özet değişmez, çağrı yapılmaz.
+        """
+        if not self.track_interests or not self.interests_stale:
+            return self.interest_summary
+        self.interests_stale = False
+        history_text = "\n".join(f"{role.upper()}: {text}" for role, text in self.memory.tail(6))
+
+        messages = [
+            self.INTEREST_SYSTEM_MESSAGE,
+            HumanMessage(content=f"Given this chat:\n\n{history_text}\n\nWhat are the user's travel preferences?")
+        ]
+        try:
+            result = self.router.invoke("interest_summary", messages, user_id=self.user_id)
+        except LLMOverloadedError:
+            # Arka plan işi: model meşgulse önceki özetle devam et
+            return self.interest_summary
         self.interest_summary = result.content.strip()
+        return self.interest_summary
+
+    def _is_cacheable(self, user_input: str, tool_type) -> bool:
+        """Yanıt konuşma bağlamından ve canlı veriden bağımsız mı?"""
+        if self.response_cache is None or tool_type is not None:
+            return False
+        return not self.CONTEXT_REFERENCE_RE.search(user_input)
+
+    def _replay(self, user_input: str, answer: str):
+        """Hazır yanıtı stream token'ları gibi parçalayarak döndür"""
+        for token in re.findall(r"\S+\s*|\s+", answer):
+            yield token
+        self.memory.add_turn(user_input, answer)
 
     def chat_stream(self, user_input: str):
         """Streaming yanıt döner"""
+        request_started = time.perf_counter()
         # Tool kullanımını kontrol et
         tool_type, tool_params = self._check_tool_usage(user_input)
         
+        # Basit listeleme soruları: doğrudan yerel bilgi indeksinden yanıtla
+        if tool_type is None and self.knowledge_index:
+            lookup_answer = self.knowledge_index.answer_lookup(user_input)
+            if lookup_answer is not None:
+                metrics.observe("smarttour_chat_ttft_seconds", time.perf_counter() - request_started)
+                yield from self._replay(user_input, lookup_answer)
+                return
+
+        # Semantic cache: bağlamdan bağımsız sorular için hazır yanıt
+        cacheable = self._is_cacheable(user_input, tool_type)
+        if cacheable:
+            cached_answer = self.response_cache.get(user_input)
+            metrics.inc("smarttour_cache_requests_total", cache="response",
+                        result="hit" if cached_answer is not None else "miss")
+            if cached_answer is not None:
+                metrics.observe("smarttour_chat_ttft_seconds", time.perf_counter() - request_started)
+                yield from self._replay(user_input, cached_answer)
+                return
+        
+        question = user_input
+        # Veri geldiyse model yalnızca onu ifade eder: küçük/hızlı model yeterli
+        task = "chat"
+
         # Eğer bir tool kullanılacaksa, önce API'den veri al
+        tool_started = time.perf_counter()
         if tool_type == "weather" and tool_params:
             weather_data = self.weather_api.get_weather(tool_params)
             if weather_data["success"]:
                 user_input = f"{user_input}\n\n[Weather Data: {weather_data['formatted']}]"
+                task = "tool_answer"
         
         elif tool_type == "flight" and tool_params:
-            dep, arr = tool_params
-            flights = self.aviation_api.get_flights(dep, arr)
+            origins, destinations, dates = tool_params
+            if self.flight_search:
+                flights = self.flight_search.search(origins, destinations, dates)
+            else:
+                flights = self.aviation_api.get_flights(origins[0], destinations[0], dates[0] if dates else None)
             if flights["success"]:
                 flight_info = self.aviation_api.format_flights(flights)
                 user_input = f"{user_input}\n\n[Flight Data:\n{flight_info}]"
+                task = "tool_answer"
         
         elif tool_type == "currency" and tool_params:
             amount, from_curr, to_curr = tool_params
-            conversion = self.currency_api.convert(amount, from_curr, to_curr)
+            converter = self.budget_engine or self.currency_api
+            conversion = converter.convert(amount, from_curr, to_curr)
             if conversion["success"]:
                 user_input = f"{user_input}\n\n[Currency: {conversion['formatted']}]"
+                task = "tool_answer"
         
+        if tool_type:
+            metrics.observe("smarttour_span_seconds", time.perf_counter() - tool_started, span="chat.tool_fetch")
+
         # LLM ile yanıt üret
-        messages = self._build_prompt(user_input)
-        full_response = ""
+        with metrics.span("chat.build_prompt"):
+            messages = self._build_prompt(user_input)
+        parts = []
+        started = time.perf_counter()
+
+        with metrics.span("chat.generation"):
+            for chunk in self.router.stream(task, messages, user_id=self.user_id):
+                if chunk.content:
+                    if not parts:
+                        metrics.observe("smarttour_chat_ttft_seconds", time.perf_counter() - request_started)
+                    parts.append(chunk.content)
+                    yield chunk.content
+
+        full_response = "".join(parts)
 
-        for chunk in self.llm.stream(messages):
-            if hasattr(chunk, "content"):
-                token = chunk.content
-                full_response += token
-                yield token
+        if cacheable:
+            self.response_cache.set(question, full_response, time.perf_counter() - started)
 
         # Hafızayı güncelle
-        self.memory.add_user_message(user_input)
-        self.memory.add_ai_message(full_response)
-        self._update_interest_summary()
+        self.memory.add_turn(user_input, full_response)
+        self.interests_stale = True
 
     def chat(self, user_input: str) -> str:
         """Streaming olmayan versiyon"""
         messages = self._build_prompt(user_input)
-        response = self.llm.invoke(messages)
-        self.memory.add_user_message(user_input)
-        self.memory.add_ai_message(response.content)
-        self._update_interest_summary()
+        response = self.router.invoke("chat", messages, user_id=self.user_id)
+        self.memory.add_turn(user_input, response.content)
+        self.interests_stale = True
         return response.content
\ No newline at end of file
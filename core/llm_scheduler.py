@@ -0,0 +1,177 @@
+import math
+import time
+import threading
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from utils.metrics import metrics
+from config.settings import LLM_MAX_CONCURRENT, LLM_QUEUE_LIMITS, LLM_QUEUE_TIMEOUTS
+
+# Öncelik sırası: önce interaktif sohbet, sonra plan ajanları, en son arka plan işleri
+PRIORITIES = ("interactive", "plan", "background")
+
+
+class LLMOverloadedError(Exception):
+    """LLM kuyruğu dolu ya da bekleme süresi aşıldı (HTTP 503 + Retry-After)"""
+
+    def __init__(self, message: str, retry_after: int = 1, priority: str = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.priority = priority
+
+
+class _Waiter:
+    __slots__ = ("priority", "user_id", "event", "enqueued_at", "granted")
+
+    def __init__(self, priority: str, user_id: str):
+        self.priority = priority
+        self.user_id = user_id
+        self.event = threading.Event()
+        self.enqueued_at = time.perf_counter()
+        self.granted = False
+
+
+class LLMScheduler:
+    """
+    Model sunucusuna giden istekler için kabul kontrolü.
+    En fazla max_concurrent istek aynı anda çalışır; bekleyenler öncelik
+    sınıfına göre, aynı sınıf içinde kullanıcılar arasında sırayla (round-robin)
+    slot alır. Kuyruk doluysa ya da bekleme süresi aşılırsa LLMOverloadedError.
+    """
+
+    def __init__(self, max_concurrent: int = LLM_MAX_CONCURRENT, queue_limits: dict = None,
+                 queue_timeouts: dict = None, window: int = 500):
+        self.max_concurrent = max_concurrent
+        self.queue_limits = dict(LLM_QUEUE_LIMITS, **(queue_limits or {}))
+        self.queue_timeouts = dict(LLM_QUEUE_TIMEOUTS, **(queue_timeouts or {}))
+        self.lock = threading.Lock()
+        self.active = 0
+        # Öncelik -> {user_id: bekleyenler}; sözlük sırası round-robin sırasıdır
+        self.queues = {priority: OrderedDict() for priority in PRIORITIES}
+        self.queued = {priority: 0 for priority in PRIORITIES}
+        self.admitted = {priority: 0 for priority in PRIORITIES}
+        self.rejected = {priority: 0 for priority in PRIORITIES}
+        self.waits = {priority: deque(maxlen=window) for priority in PRIORITIES}
+        self.avg_hold = 2.0  # slot başına ortalama süre (saniye, EMA)
+
+    def _retry_after(self, priority: str) -> int:
+        """Öndeki istekler ve ortalama süreye göre tahmini bekleme"""
+        ahead = sum(self.queued[p] for p in PRIORITIES[:PRIORITIES.index(priority) + 1])
+        return max(1, math.ceil(self.avg_hold * (ahead + 1) / max(1, self.max_concurrent)))
+
+    def _reject(self, priority: str, reason: str, message: str):
+        self.rejected[priority] += 1
+        metrics.inc("smarttour_llm_rejections_total", priority=priority, reason=reason)
+        raise LLMOverloadedError(message, retry_after=self._retry_after(priority), priority=priority)
+
+    def _grant(self, waiter: _Waiter):
+        waiter.granted = True
+        self.active += 1
+        self.admitted[waiter.priority] += 1
+        wait = time.perf_counter() - waiter.enqueued_at
+        self.waits[waiter.priority].append(wait)
+        metrics.observe("smarttour_llm_queue_wait_seconds", wait, priority=waiter.priority)
+
+    def _dispatch(self):
+        """Boş slotları en yüksek öncelikli kuyruktan, kullanıcılar arasında sırayla dağıt"""
+        while self.active < self.max_concurrent:
+            for priority in PRIORITIES:
+                users = self.queues[priority]
+                if users:
+                    break
+            else:
+                return
+
+            user_id, waiters = next(iter(users.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                users.move_to_end(user_id)  # sıradaki istek için kuyruğun sonuna
+            else:
+                del users[user_id]
+            self.queued[priority] -= 1
+            self._grant(waiter)
+            waiter.event.set()
+
+    def acquire(self, priority: str = "interactive", user_id: str = None) -> _Waiter:
+        """Slot al; gerekirse sırayı bekle"""
+        if priority not in self.queues:
+            priority = "interactive"
+        waiter = _Waiter(priority, user_id or "anonymous")
+
+        with self.lock:
+            if self.active < self.max_concurrent and not any(self.queued.values()):
+                self._grant(waiter)
+                return waiter
+
+            if self.queued[priority] >= self.queue_limits[priority]:
+                self._reject(priority, "queue_full", f"LLM queue is full ({priority})")
+
+            self.queues[priority].setdefault(waiter.user_id, deque()).append(waiter)
+            self.queued[priority] += 1
+
+        if waiter.event.wait(self.queue_timeouts[priority]):
+            return waiter
+
+        with self.lock:
+            if waiter.granted:  # zaman aşımıyla aynı anda slot verilmiş olabilir
+                return waiter
+            waiters = self.queues[priority][waiter.user_id]
+            waiters.remove(waiter)
+            if not waiters:
+                del self.queues[priority][waiter.user_id]
+            self.queued[priority] -= 1
+            self._reject(priority, "timeout", f"LLM queue wait exceeded {self.queue_timeouts[priority]}s")
+
+    def release(self, waiter: _Waiter, held_seconds: float = None):
+        """Slotu bırak ve sıradakine ver"""
+        with self.lock:
+            self.active -= 1
+            if held_seconds is not None:
+                self.avg_hold = 0.9 * self.avg_hold + 0.1 * held_seconds
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority: str = "interactive", user_id: str = None):
+        """with scheduler.slot("plan", user_id): ... """
+        waiter = self.acquire(priority, user_id)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(waiter, time.perf_counter() - started)
+
+    def is_idle(self) -> bool:
+        """Boş slot var ve kimse beklemiyor mu?"""
+        with self.lock:
+            return self.active < self.max_concurrent and not any(self.queued.values())
+
+    def queue_depths(self) -> dict:
+        """Öncelik sınıfı başına kuyruk uzunluğu (metrics gauge)"""
+        with self.lock:
+            return {(("priority", p),): self.queued[p] for p in PRIORITIES}
+
+    @staticmethod
+    def _percentile_ms(values, pct: float):
+        if not values:
+            return None
+        ordered = sorted(values)
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct))] * 1000, 1)
+
+    def stats(self) -> dict:
+        """Aktif istekler, kuyruk derinliği ve bekleme süreleri"""
+        with self.lock:
+            return {
+                "active": self.active,
+                "max_concurrent": self.max_concurrent,
+                "avg_hold_ms": round(self.avg_hold * 1000, 1),
+                "classes": {
+                    priority: {
+                        "queued": self.queued[priority],
+                        "waiting_users": len(self.queues[priority]),
+                        "admitted": self.admitted[priority],
+                        "rejected": self.rejected[priority],
+                        "wait_ms_p50": self._percentile_ms(self.waits[priority], 0.5),
+                        "wait_ms_p95": self._percentile_ms(self.waits[priority], 0.95),
+                    }
+                    for priority in PRIORITIES
+                },
+            }
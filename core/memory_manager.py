@@ -1,34 +1,69 @@
 from datetime import datetime, timedelta
-from langchain_community.chat_message_histories import ChatMessageHistory
+from collections import OrderedDict
+from array import array
+from langchain_core.messages import HumanMessage, AIMessage
 from utils.database import UserDatabase
+from utils.metrics import metrics
+from config.settings import (
+    CACHE_MAX_ENTRIES, CLI_HISTORY_TOKENS, SESSION_TIMEOUT, SESSION_HISTORY_MESSAGES, SESSION_HISTORY_TOKENS,
+    SESSION_COMPRESS_MIN_CHARS
+)
 import hashlib
+import sys
+import time
+import threading
+import zlib
 
 class SessionManager:
     """Kullanıcı oturumlarını yönet"""
     
-    def __init__(self):
-        self.sessions = {}  # user_id -> ChatMessageHistory
-        self.db = UserDatabase()
+    def __init__(self, db: UserDatabase = None, timeout: float = SESSION_TIMEOUT):
+        self.sessions = OrderedDict()  # user_id -> CompactHistory (en eski erişim başta)
+        self.interests = {}  # user_id -> ilgi alanı özeti (oturumla birlikte silinir)
+        self.last_seen = {}
+        self.timeout = timeout
+        self.db = db or UserDatabase()
     
     def generate_user_id(self, ip_address: str) -> str:
         """IP adresinden kullanıcı ID'si oluştur"""
         return hashlib.md5(ip_address.encode()).hexdigest()[:16]
     
-    def get_session(self, user_id: str) -> ChatMessageHistory:
+    def get_session(self, user_id: str):
         """Kullanıcı oturumunu al veya oluştur"""
+        now = time.monotonic()
+        self._evict_idle(now)
         if user_id not in self.sessions:
-            self.sessions[user_id] = ChatMessageHistory()
+            self.sessions[user_id] = CompactHistory()
             self.db.create_user(user_id)
             
             # Önceki sohbet geçmişini yükle
             history = self.db.get_chat_history(user_id, limit=5)
             for item in history:
-                self.sessions[user_id].add_user_message(item["user_message"])
-                self.sessions[user_id].add_ai_message(item["bot_message"])
+                self.sessions[user_id].add_turn(item["user_message"], item["bot_message"])
         
+        self.sessions.move_to_end(user_id)
+        self.last_seen[user_id] = now
         self.db.update_last_active(user_id)
         return self.sessions[user_id]
     
+    def _evict_idle(self, now: float):
+        """Boşta kalan oturumları bellekten at (geçmişleri veritabanında kalır)"""
+        while self.sessions:
+            user_id = next(iter(self.sessions))
+            if now - self.last_seen.get(user_id, now) < self.timeout:
+                break
+            del self.sessions[user_id]
+            self.last_seen.pop(user_id, None)
+            self.interests.pop(user_id, None)
+    
+    def get_interest_summary(self, user_id: str) -> str:
+        return self.interests.get(user_id, "")
+    
+    def set_interest_summary(self, user_id: str, summary: str):
+        """Özeti oturuma yaz; oturum bu arada silindiyse atla"""
+        if summary and user_id in self.sessions:
+            self.interests[user_id] = summary
+    
     def save_message(self, user_id: str, user_message: str, bot_message: str):
         """Mesajı veritabanına kaydet"""
         self.db.save_chat(user_id, user_message, bot_message)
@@ -37,42 +72,223 @@ class SessionManager:
         """Kullanıcı oturumunu temizle"""
         if user_id in self.sessions:
             del self.sessions[user_id]
+            self.last_seen.pop(user_id, None)
+            self.interests.pop(user_id, None)
     
-    def get_user_stats(self, user_id: str) -> dict:
-        """Kullanıcı istatistiklerini al"""
-        history = self.db.get_chat_history(user_id, limit=100)
-        plans = self.db.get_travel_plans(user_id)
-        favorites = self.db.get_favorites(user_id)
+    def get_user_stats(self, user_id: str, version: tuple = None) -> dict:
+        """Kullanıcı istatistiklerini al (version: db.get_history_version sonucu)"""
+        # Yalnızca sayılar: kayıtların kendisi yüklenmez
+        messages, _, plans, _, favorites, _ = version or self.db.get_history_version(user_id)
         
         return {
-            "total_messages": len(history),
-            "total_plans": len(plans),
-            "total_favorites": len(favorites),
-            "recent_cities": list(set([p["city"] for p in plans[-5:]]))
+            "total_messages": messages,
+            "total_plans": plans,
+            "total_favorites": favorites,
+            "recent_cities": self.db.get_recent_plan_cities(user_id)
         }
 
 
+def estimate_tokens(text: str) -> int:
+    """Kaba token tahmini (~4 karakter/token); tokenizer yüklemeden bütçe hesabı için"""
+    return len(text) // 4 + 1
+
+
+class CompactHistory:
+    """
+    Canlı oturumlar için kompakt sohbet geçmişi (ChatMessageHistory ile aynı arayüz).
+    Mesajlar sabit boyutlu bir halka tamponda rol + metin olarak tutulur: uzun
+    metinler zlib ile sıkıştırılır, kısa olanlar intern edilir. LangChain mesaj
+    nesneleri yalnızca prompt oluşturulurken üretilir. Tampon ya da token
+    bütçesi dolunca en eski mesajlar atılır; son tur her zaman korunur.
+    Aynı kullanıcının eşzamanlı istekleri aynı geçmişi paylaşır: tampon bir
+    kilitle korunur ve bir tur (soru + yanıt) tek adımda eklenir.
+    """
+    
+    __slots__ = ("capacity", "max_tokens", "tokens", "_texts", "_roles", "_costs", "_start", "_size", "_lock")
+    
+    HUMAN, AI = 0, 1
+    ROLE_NAMES = ("human", "ai")
+    INTERN_MAX_CHARS = 64
+    
+    def __init__(self, max_messages: int = SESSION_HISTORY_MESSAGES, max_tokens: int = SESSION_HISTORY_TOKENS):
+        self.capacity = max(2, max_messages)
+        self.max_tokens = max_tokens
+        self.tokens = 0
+        self._texts = [None] * self.capacity  # str ya da zlib ile sıkıştırılmış UTF-8 bytes
+        self._roles = bytearray(self.capacity)
+        self._costs = array("I", bytes(4 * self.capacity))
+        self._start = 0
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return self._size
+    
+    @staticmethod
+    def _pack(text: str):
+        if len(text) >= SESSION_COMPRESS_MIN_CHARS:
+            packed = zlib.compress(text.encode("utf-8"))
+            if len(packed) < len(text) * 0.8:
+                return packed
+        elif len(text) <= CompactHistory.INTERN_MAX_CHARS:
+            return sys.intern(text)  # "hi", "thanks" gibi tekrarlar tek kopya
+        return text
+    
+    @staticmethod
+    def _unpack(value) -> str:
+        return zlib.decompress(value).decode("utf-8") if isinstance(value, bytes) else value
+    
+    def _append(self, role: int, text: str):
+        if self._size == self.capacity:
+            self._popleft()
+        i = (self._start + self._size) % self.capacity
+        cost = estimate_tokens(text)
+        self._texts[i] = self._pack(text)
+        self._roles[i] = role
+        self._costs[i] = cost
+        self._size += 1
+        self.tokens += cost
+        self._trim()
+    
+    def _popleft(self):
+        i = self._start
+        self.tokens -= self._costs[i]
+        self._texts[i] = None
+        self._start = (i + 1) % self.capacity
+        self._size -= 1
+    
+    def _trim(self):
+        while self.max_tokens and self.tokens > self.max_tokens and self._size > 2:
+            self._popleft()
+        # Geçmiş bir kullanıcı mesajıyla başlasın
+        while self._size > 2 and self._roles[self._start] != self.HUMAN:
+            self._popleft()
+    
+    def _entries(self, last: int = None) -> list:
+        """(rol, metin) çiftleri, eskiden yeniye"""
+        with self._lock:
+            count = self._size if last is None else min(last, self._size)
+            indices = [(self._start + offset) % self.capacity for offset in range(self._size - count, self._size)]
+            packed = [(self._roles[i], self._texts[i]) for i in indices]
+        return [(role, self._unpack(text)) for role, text in packed]
+    
+    @property
+    def messages(self) -> list:
+        return [HumanMessage(content=text) if role == self.HUMAN else AIMessage(content=text)
+                for role, text in self._entries()]
+    
+    def tail(self, count: int) -> list:
+        """Son mesajlar ("human"/"ai", metin); mesaj nesnesi üretmeden"""
+        return [(self.ROLE_NAMES[role], text) for role, text in self._entries(count)]
+    
+    def add_message(self, message):
+        if message.type not in self.ROLE_NAMES:
+            raise ValueError(f"Unsupported message type: {message.type}")
+        with self._lock:
+            self._append(self.ROLE_NAMES.index(message.type), message.content)
+    
+    def add_user_message(self, content: str):
+        with self._lock:
+            self._append(self.HUMAN, content)
+    
+    def add_ai_message(self, content: str):
+        with self._lock:
+            self._append(self.AI, content)
+    
+    def add_turn(self, user_message: str, ai_message: str):
+        """Soru ve yanıtı birlikte ekle (eşzamanlı turlar birbirine karışmaz)"""
+        with self._lock:
+            self._append(self.HUMAN, user_message)
+            self._append(self.AI, ai_message)
+    
+    def clear(self):
+        with self._lock:
+            self._texts = [None] * self.capacity
+            self._start = 0
+            self._size = 0
+            self.tokens = 0
+
+
+class TokenBudgetHistory(CompactHistory):
+    """CLI geçmişi: sınırı mesaj sayısı yerine token bütçesi belirler"""
+    
+    __slots__ = ()
+    
+    def __init__(self, max_tokens: int = CLI_HISTORY_TOKENS, max_messages: int = 256):
+        super().__init__(max_messages=max_messages, max_tokens=max_tokens)
+
+
+def plan_cache_key(city: str, days: int, interests: list = None, budget: dict = None) -> str:
+    """Plan cache anahtarı (şehir ve ilgi alanları normalize edilir; bütçeli planlar ayrı tutulur)"""
+    normalized = sorted({i.strip().lower() for i in interests or [] if i.strip()})
+    key = f"plan:{city.strip().title()}:{days}:{'-'.join(normalized)}"
+    if budget:
+        totals = (budget["currency"], budget["total"], budget["travelers"], sorted(budget["by_category"].items()))
+        key += ":budget-" + hashlib.sha1(repr(totals).encode()).hexdigest()[:12]
+    return key
+
+
 class CacheManager:
-    """API sonuçlarını cache'le"""
+    """
+    API sonuçlarını cache'le.
+    En fazla max_entries kayıt tutulur (en uzun süredir kullanılmayan çıkar);
+    süresi dolan kayıtlar da her expiry süresinde bir toplu olarak temizlenir.
+    """
     
-    def __init__(self, expiry_seconds: int = 1800):
-        self.cache = {}
+    def __init__(self, expiry_seconds: int = 1800, max_entries: int = CACHE_MAX_ENTRIES):
+        self.cache = OrderedDict()  # anahtar -> (veri, zaman); en eski erişim başta
         self.expiry = expiry_seconds
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.next_sweep = time.monotonic() + expiry_seconds
+        self.evictions = 0
+    
+    def __len__(self):
+        return len(self.cache)
     
     def get(self, key: str):
         """Cache'den veri al"""
-        if key in self.cache:
-            data, timestamp = self.cache[key]
-            if datetime.now() - timestamp < timedelta(seconds=self.expiry):
-                return data
-            else:
+        # Anahtar öneki cache türünü belirtir: "geo:...", "plan:..."
+        cache_name = key.split(":", 1)[0]
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is not None:
+                data, timestamp = entry
+                if datetime.now() - timestamp < timedelta(seconds=self.expiry):
+                    self.cache.move_to_end(key)
+                    metrics.inc("smarttour_cache_requests_total", cache=cache_name, result="hit")
+                    return data
                 del self.cache[key]
+        metrics.inc("smarttour_cache_requests_total", cache=cache_name, result="miss")
         return None
     
+    def ttl(self, key: str):
+        """Kaydın kalan ömrü (saniye); yoksa None. İsabet sayacını etkilemez"""
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        remaining = self.expiry - (datetime.now() - entry[1]).total_seconds()
+        return remaining if remaining > 0 else None
+    
     def set(self, key: str, value):
-        """Cache'e veri kaydet"""
-        self.cache[key] = (value, datetime.now())
+        """Cache'e veri kaydet; sınır aşılırsa en uzun süredir kullanılmayanı çıkar"""
+        with self.lock:
+            self.cache[key] = (value, datetime.now())
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+                self.evictions += 1
+            if time.monotonic() >= self.next_sweep:
+                self._sweep()
+    
+    def _sweep(self):
+        """Bir daha okunmayan süresi dolmuş kayıtları at"""
+        cutoff = datetime.now() - timedelta(seconds=self.expiry)
+        for key in [k for k, (_, timestamp) in self.cache.items() if timestamp <= cutoff]:
+            del self.cache[key]
+        self.next_sweep = time.monotonic() + self.expiry
     
     def clear(self):
         """Tüm cache'i temizle"""
-        self.cache.clear()
\ No newline at end of file
+        with self.lock:
+            self.cache.clear()
\ No newline at end of file
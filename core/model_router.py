@@ -0,0 +1,268 @@
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import nullcontext, contextmanager
+from utils.metrics import metrics
+from core.backend_pool import BackendPool, is_backend_error
+from config.settings import (
+    LLM_TASK_PROFILES, LLM_MODEL, LLM_TEMPERATURE, LLM_KEEP_ALIVE, LLM_NUM_CTX, LLM_BACKEND_FAILOVER
+)
+
+DEFAULT_PROFILE = {
+    "model": LLM_MODEL,
+    "temperature": LLM_TEMPERATURE,
+    "num_predict": None,
+    "num_ctx": LLM_NUM_CTX,
+    "priority": "interactive",
+}
+
+
+# Arka plan işleri (ör. plan ön hesaplama) tüm çağrılarını daha düşük öncelikle yapabilsin
+_priority_override = contextvars.ContextVar("llm_priority_override", default=None)
+
+
+class TaskMetrics:
+    """Bir görev tipi için gecikme ve token sayaçları"""
+
+    def __init__(self, window: int = 500):
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.generation_seconds = 0.0
+        self.latencies = deque(maxlen=window)
+        self.ttfts = deque(maxlen=window)
+
+    @staticmethod
+    def _percentile(values, pct: float):
+        if not values:
+            return None
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+    def as_dict(self) -> dict:
+        latencies = list(self.latencies)
+        ttfts = list(self.ttfts)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "avg_output_tokens": round(self.output_tokens / self.calls, 1) if self.calls else 0,
+            "tokens_per_second": (
+                round(self.output_tokens / self.generation_seconds, 1) if self.generation_seconds else None
+            ),
+            "latency_ms_p50": self._ms(self._percentile(latencies, 0.5)),
+            "latency_ms_p95": self._ms(self._percentile(latencies, 0.95)),
+            "ttft_ms_p50": self._ms(self._percentile(ttfts, 0.5)),
+            "ttft_ms_p95": self._ms(self._percentile(ttfts, 0.95)),
+        }
+
+    @staticmethod
+    def _ms(seconds):
+        return round(seconds * 1000, 1) if seconds is not None else None
+
+
+class ModelRouter:
+    """Görev tipine göre model ve üretim ayarı seçen yönlendirici"""
+
+    def __init__(self, profiles: dict = None, scheduler=None, pool: BackendPool = None):
+        profiles = profiles or LLM_TASK_PROFILES
+        self.scheduler = scheduler
+        self.pool = pool or BackendPool()
+        self.profiles = {task: dict(DEFAULT_PROFILE, **profile) for task, profile in profiles.items()}
+        self._llms = {}
+        self._metrics = {task: TaskMetrics() for task in self.profiles}
+        self.lock = threading.Lock()
+
+    def profile(self, task: str) -> dict:
+        """Görev profilini döndür; bilinmeyen görevler varsayılanı kullanır"""
+        return self.profiles.get(task, DEFAULT_PROFILE)
+
+    def get_llm(self, task: str, base_url: str = None):
+        """Görev ve sunucu için ChatOllama örneği (her çift için bir kez oluşturulur)"""
+        base_url = base_url or self.pool.urls[0]
+        with self.lock:
+            if (task, base_url) not in self._llms:
+                # langchain_ollama ağır bir import; ilk model çağrısına kadar ertelenir
+                from langchain_ollama import ChatOllama
+                profile = self.profile(task)
+                self._llms[task, base_url] = ChatOllama(
+                    model=profile["model"],
+                    temperature=profile["temperature"],
+                    num_predict=profile["num_predict"],
+                    num_ctx=profile["num_ctx"],
+                    keep_alive=LLM_KEEP_ALIVE,
+                    base_url=base_url,
+                )
+            return self._llms[task, base_url]
+
+    def warm_up(self) -> dict:
+        """Profillerdeki her modeli her sunucuda bir kez çağırıp belleğe yükle"""
+        from langchain_core.messages import HumanMessage
+        results = {}
+        for base_url in self.pool.urls:
+            for task, profile in self.profiles.items():
+                name = profile["model"] if len(self.pool) == 1 else f"{profile['model']}@{base_url}"
+                if name in results:
+                    continue
+                started = time.perf_counter()
+                try:
+                    # Aynı num_ctx ile: farklı bağlam boyu modeli yeniden yükletir
+                    self.get_llm(task, base_url).invoke([HumanMessage(content="hi")],
+                                                        **self._options(task, {"num_predict": 1}))
+                    results[name] = round(time.perf_counter() - started, 2)
+                except Exception as e:
+                    print(f"Warm-up error ({name}): {e}")
+                    results[name] = None
+        return results
+
+    def _options(self, task: str, overrides: dict) -> dict:
+        """Çağrıya özel ayarları profille birleştir"""
+        if not overrides:
+            return {}
+        profile = self.profile(task)
+        options = {
+            key: profile[key] for key in ("temperature", "num_predict", "num_ctx")
+            if profile[key] is not None
+        }
+        options.update(overrides)
+        # options verilince ChatOllama kendi ayarlarını göndermez; hepsi burada
+        return {"options": options}
+
+    @staticmethod
+    def _token_counts(message) -> tuple:
+        """Yanıttan prompt ve üretilen token sayılarını çıkar"""
+        usage = getattr(message, "usage_metadata", None) or {}
+        metadata = getattr(message, "response_metadata", None) or {}
+        prompt_tokens = usage.get("input_tokens", metadata.get("prompt_eval_count", 0)) or 0
+        output_tokens = usage.get("output_tokens", metadata.get("eval_count", 0)) or 0
+        return prompt_tokens, output_tokens
+
+    def record(self, task: str, latency: float, prompt_tokens: int = 0, output_tokens: int = 0,
+               ttft: float = None, error: bool = False):
+        """Görev metriklerini güncelle"""
+        self._export(task, latency, prompt_tokens, output_tokens, ttft, error)
+        with self.lock:
+            metrics = self._metrics.setdefault(task, TaskMetrics())
+            metrics.calls += 1
+            if error:
+                metrics.errors += 1
+                return
+            metrics.latencies.append(latency)
+            metrics.prompt_tokens += prompt_tokens
+            metrics.output_tokens += output_tokens
+            metrics.generation_seconds += latency - (ttft or 0.0)
+            if ttft is not None:
+                metrics.ttfts.append(ttft)
+
+    @staticmethod
+    def _export(task: str, latency: float, prompt_tokens: int, output_tokens: int, ttft: float, error: bool):
+        """Görev metriklerini Prometheus histogramlarına da yaz"""
+        if not metrics.enabled:
+            return
+        if error:
+            metrics.inc("smarttour_llm_errors_total", task=task)
+            return
+        metrics.observe("smarttour_llm_request_seconds", latency, task=task)
+        if ttft is not None:
+            metrics.observe("smarttour_llm_ttft_seconds", ttft, task=task)
+        generation = latency - (ttft or 0.0)
+        if output_tokens and generation > 0:
+            metrics.observe("smarttour_llm_tokens_per_second", output_tokens / generation, task=task)
+        metrics.inc("smarttour_llm_tokens_total", prompt_tokens, task=task, kind="prompt")
+        metrics.inc("smarttour_llm_tokens_total", output_tokens, task=task, kind="output")
+
+    @staticmethod
+    @contextmanager
+    def priority(priority: str):
+        """Bu blok içindeki tüm çağrılar verilen öncelik sınıfını kullanır"""
+        token = _priority_override.set(priority)
+        try:
+            yield
+        finally:
+            _priority_override.reset(token)
+
+    def _slot(self, task: str, user_id: str = None):
+        """Scheduler varsa görevin öncelik sınıfında slot al"""
+        if self.scheduler is None:
+            return nullcontext()
+        priority = _priority_override.get() or self.profile(task)["priority"]
+        return self.scheduler.slot(priority, user_id)
+
+    def _backends(self, user_id: str = None):
+        """Denenecek sunucular: (sunucu, son deneme mi?); kullanıcı aynı sunucuya yapışır"""
+        backends = self.pool.candidates(user_id)[:1 + LLM_BACKEND_FAILOVER]
+        for i, backend in enumerate(backends):
+            yield backend, i == len(backends) - 1
+
+    def invoke(self, task: str, messages: list, user_id: str = None, **overrides):
+        """Görevin modeliyle tek seferlik yanıt üret"""
+        options = self._options(task, overrides)
+        with self._slot(task, user_id):
+            started = time.perf_counter()
+            for backend, last in self._backends(user_id):
+                self.pool.acquire(backend)
+                attempt_started = time.perf_counter()
+                error = None
+                try:
+                    response = self.get_llm(task, backend.url).invoke(messages, **options)
+                except Exception as e:
+                    error = e
+                finally:
+                    self.pool.release(backend, time.perf_counter() - attempt_started, error, user_id)
+                if error is None:
+                    break
+                # Bağlantı hatasında yanıt henüz üretilmedi; başka sunucuda dene
+                if last or not is_backend_error(error):
+                    self.record(task, time.perf_counter() - started, error=True)
+                    raise error
+
+        prompt_tokens, output_tokens = self._token_counts(response)
+        self.record(task, time.perf_counter() - started, prompt_tokens, output_tokens)
+        return response
+
+    def stream(self, task: str, messages: list, user_id: str = None, **overrides):
+        """Görevin modeliyle streaming yanıt üret (chunk'ları aynen döndürür)"""
+        options = self._options(task, overrides)
+        # Slot akış bitene (ya da generator kapanana) kadar tutulur
+        with self._slot(task, user_id):
+            started = time.perf_counter()
+            ttft = None
+            usage_chunk = None
+            yielded = False
+            for backend, last in self._backends(user_id):
+                self.pool.acquire(backend)
+                error = None
+                try:
+                    for chunk in self.get_llm(task, backend.url).stream(messages, **options):
+                        if ttft is None and chunk.content:
+                            ttft = time.perf_counter() - started
+                        # Kullanım bilgisi son chunk'ta olmayabilir (ardından boş bir chunk gelebilir)
+                        if getattr(chunk, "usage_metadata", None) or getattr(chunk, "response_metadata", None):
+                            usage_chunk = chunk
+                        yielded = True
+                        yield chunk
+                except Exception as e:
+                    error = e
+                finally:
+                    # Sunucu gecikmesi olarak ilk token süresi (prefill yükünü yansıtır)
+                    self.pool.release(backend, ttft, error, user_id)
+                if error is None:
+                    break
+                # Yarıda kalan akış başka sunucuda tekrarlanamaz
+                if last or yielded or not is_backend_error(error):
+                    self.record(task, time.perf_counter() - started, error=True)
+                    raise error
+
+            prompt_tokens, output_tokens = self._token_counts(usage_chunk)
+            self.record(task, time.perf_counter() - started, prompt_tokens, output_tokens, ttft=ttft)
+
+    def stats(self) -> dict:
+        """Görev bazında model ve metrikler"""
+        with self.lock:
+            return {
+                task: dict(model=self.profile(task)["model"], **metrics.as_dict())
+                for task, metrics in self._metrics.items()
+            }
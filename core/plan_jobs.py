@@ -0,0 +1,206 @@
+import time
+import uuid
+import threading
+from datetime import datetime, timedelta
+from core.memory_manager import plan_cache_key
+from core.llm_scheduler import LLMOverloadedError
+from core.agents import PlanCancelledError
+from utils.metrics import metrics
+from config.settings import (
+    PLAN_JOB_WORKERS, PLAN_JOB_MAX_ATTEMPTS, PLAN_JOB_RETRY_BACKOFF, PLAN_JOB_POLL_INTERVAL,
+    PLAN_JOB_LEASE_SECONDS, PLAN_JOB_MAX_PENDING, PLAN_JOB_RETENTION_DAYS, PLAN_JOB_CANCEL_CHECK_INTERVAL
+)
+
+
+class PlanJobQueue:
+    """
+    SQLite'ta tutulan plan üretim kuyruğu ve worker havuzu.
+    İşler yeniden başlatmadan sonra da kalır; çalışan işler kiralanır (lease),
+    kirası dolan iş başka bir worker tarafından tekrar alınır. Hata alan işler
+    artan beklemeyle yeniden denenir; başarılı ajan çıktıları orkestratörün
+    ajan cache'inde kaldığından tekrar denemede yalnızca başarısız ajan çalışır.
+    İptal edilen (ya da kirası başka worker'a geçen) çalışan iş, kira yenileyicinin
+    işaretlediği olayla sıradaki ajan çağrısında durdurulur.
+    """
+
+    def __init__(self, db, orchestrator, cache, workers: int = PLAN_JOB_WORKERS,
+                 max_attempts: int = PLAN_JOB_MAX_ATTEMPTS, poll_interval: float = PLAN_JOB_POLL_INTERVAL,
+                 lease_seconds: float = PLAN_JOB_LEASE_SECONDS):
+        self.db = db
+        self.orchestrator = orchestrator
+        self.cache = cache
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.lock = threading.Lock()
+        self.running = {}  # claim_token -> job_id
+        self.aborts = {}  # claim_token -> threading.Event (iş bu worker'da durdurulmalı)
+        self.counters = {"completed": 0, "retried": 0, "failed": 0, "discarded": 0, "aborted": 0}
+
+    # === API ===
+    def submit(self, user_id: str, city: str, days: int, interests: list = None):
+        """İşi kuyruğa ekle; aynı kullanıcının aynı bekleyen işi varsa onu döndür"""
+        interests = interests or []
+        params = {"city": city, "days": days, "interests": interests}
+        job, created = self.db.create_plan_job(
+            uuid.uuid4().hex[:16], user_id, plan_cache_key(city, days, interests), params,
+            max_pending=PLAN_JOB_MAX_PENDING
+        )
+        if created:
+            self.wake.set()
+        return job, created
+
+    def get(self, job_id: str, user_id: str):
+        """Kullanıcının işi (başkasınınsa None)"""
+        job = self.db.get_plan_job(job_id)
+        if job is None or job["user_id"] != user_id:
+            return None
+        return job
+
+    def cancel(self, job_id: str, user_id: str) -> bool:
+        if not self.db.cancel_plan_job(job_id, user_id):
+            return False
+        # Bu süreçte çalışıyorsa hemen durdur; diğer süreçlerdeki worker'lar kira yenilemesinde fark eder
+        with self.lock:
+            for claim_token, running_id in self.running.items():
+                if running_id == job_id:
+                    self.aborts[claim_token].set()
+        return True
+
+    # === WORKER ===
+    def _execute(self, job: dict, abort: threading.Event = None) -> dict:
+        """Planı üret (aynı plan cache'te varsa onu kullan)"""
+        params = job["params"]
+        city, days, interests = params["city"], params["days"], params["interests"]
+        plan = self.cache.get(job["job_key"])
+        if not plan:
+            plan = self.orchestrator.create_complete_plan(city, days, interests, user_id=job["user_id"],
+                                                          cancelled=abort)
+            self.cache.set(job["job_key"], plan)
+        return plan
+
+    def _process(self, job: dict, claim_token: str, abort: threading.Event = None):
+        try:
+            with metrics.span("plan_jobs.run"):
+                plan = self._execute(job, abort)
+        except PlanCancelledError:
+            # İş artık bu worker'ın değil: satır zaten iptal edildi ya da başka worker'da
+            self._count("aborted")
+            return
+        except LLMOverloadedError as e:
+            # Model meşgul: hata sayılmaz, tahmini bekleme sonrası tekrar
+            self.db.update_plan_job(claim_token, "queued", error=str(e),
+                                    run_after=time.time() + e.retry_after, count_attempt=False)
+            return
+        except Exception as e:
+            print(f"Plan job error ({job['id']}, attempt {job['attempts']}): {e}")
+            if job["attempts"] < self.max_attempts:
+                delay = PLAN_JOB_RETRY_BACKOFF * 2 ** (job["attempts"] - 1)
+                self.db.update_plan_job(claim_token, "queued", error=str(e), run_after=time.time() + delay)
+                self._count("retried")
+            else:
+                self.db.update_plan_job(claim_token, "failed", error=str(e))
+                self._count("failed")
+            return
+
+        if not self.db.update_plan_job(claim_token, "done", result=plan):
+            # Bu sırada iptal edildi ya da kirası başka worker'a geçti
+            self._count("discarded")
+            return
+        params = job["params"]
+        self.db.save_travel_plan(
+            user_id=job["user_id"],
+            title=f"{params['city']} - {params['days']} Days",
+            city=params["city"],
+            date_range=f"{params['days']} days",
+            plan_data=plan
+        )
+        self._count("completed")
+
+    def _count(self, name: str):
+        with self.lock:
+            self.counters[name] += 1
+
+    def _worker(self):
+        while not self.stop_event.is_set():
+            claim_token = uuid.uuid4().hex
+            try:
+                job = self.db.claim_plan_job(claim_token, time.time(), self.lease_seconds, self.max_attempts)
+            except Exception as e:
+                print(f"Plan job queue error: {e}")
+                job = None
+            if job is None:
+                self.wake.wait(self.poll_interval)
+                self.wake.clear()
+                continue
+
+            abort = threading.Event()
+            with self.lock:
+                self.running[claim_token] = job["id"]
+                self.aborts[claim_token] = abort
+            try:
+                self._process(job, claim_token, abort)
+            except Exception as e:
+                print(f"Plan job queue error: {e}")
+            finally:
+                with self.lock:
+                    del self.running[claim_token]
+                    del self.aborts[claim_token]
+
+    def _heartbeat(self):
+        """Çalışan işlerin kirasını düzenli olarak uzat; iptal edilen ya da kaybedilen işleri durdur"""
+        interval = min(self.lease_seconds / 3, PLAN_JOB_CANCEL_CHECK_INTERVAL)
+        while not self.stop_event.wait(interval):
+            with self.lock:
+                tokens = list(self.running)
+            if not tokens:
+                continue
+            try:
+                lost = self.db.extend_plan_job_leases(tokens, time.time() + self.lease_seconds)
+            except Exception as e:
+                print(f"Plan job queue error: {e}")
+                continue
+            with self.lock:
+                for claim_token in lost:
+                    abort = self.aborts.get(claim_token)
+                    if abort is not None:
+                        abort.set()
+
+    def start(self):
+        """Eski işleri temizle, worker'ları ve kira yenileyiciyi başlat"""
+        if self.threads:
+            return
+        before = (datetime.now() - timedelta(days=PLAN_JOB_RETENTION_DAYS)).isoformat()
+        self.db.purge_plan_jobs(before)
+        self.stop_event.clear()
+        targets = [self._worker] * self.workers + [self._heartbeat]
+        for i, target in enumerate(targets):
+            thread = threading.Thread(target=target, name=f"plan-job-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        """Worker'ları durdur; yarım kalan işler hemen kuyruğa geri döner"""
+        self.stop_event.set()
+        self.wake.set()
+        with self.lock:
+            tokens = list(self.running)
+        for claim_token in tokens:
+            self.db.update_plan_job(claim_token, "queued", count_attempt=False)
+        # Kuyruğa dönen işlerin ajanları da dursun: join beklemesi bir ajan çağrısını geçmez
+        with self.lock:
+            for abort in self.aborts.values():
+                abort.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def stats(self) -> dict:
+        with self.lock:
+            stats = dict(self.counters, workers=self.workers, running=len(self.running))
+        stats["jobs"] = self.db.count_plan_jobs()
+        return stats
@@ -0,0 +1,138 @@
+import re
+import threading
+
+# Bölüm başlıkları: "Day 1:", "## Day 2 - Old Town", "**Food**", "### Culture:"
+DAY_HEADER_RE = re.compile(r"^\s*(?:#+\s*)?\**\s*Day\s+(\d+)\b[^\n]*$", re.IGNORECASE)
+TOPIC_HEADER_RE = re.compile(r"^\s*(?:#+\s*([^\n]+?)|\*\*([^*\n]+)\*\*:?|([A-Z][^:\n]{1,40}):)\s*$")
+LIST_ITEM_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+(.+)$")
+TIME_LABEL_RE = re.compile(r"^\**\s*(?:morning|afternoon|evening|night|lunch|dinner|breakfast)\s*\**\s*:\s*\**",
+                           re.IGNORECASE)
+BOLD_RE = re.compile(r"\*\*([^*]+)\*\*")
+
+
+def _clean(text: str, max_chars: int) -> str:
+    """Markdown işaretlerini at ve kısalt"""
+    text = re.sub(r"[*_`#]", "", text).strip(" -–:;,.")
+    if len(text) > max_chars:
+        text = text[:max_chars].rsplit(" ", 1)[0] + "…"
+    return text
+
+
+def day_highlights(lines: list, max_items: int = 3, max_chars: int = 60) -> list:
+    """Bir günün etkinliklerinden kısa özet (zaman etiketleri olmadan)"""
+    items = []
+    for line in lines:
+        match = LIST_ITEM_RE.match(line)
+        if not match:
+            continue
+        activity = TIME_LABEL_RE.sub("", match.group(1).strip())
+        # "Colosseum: book early" -> "Colosseum"
+        activity = re.split(r"\s[-–]\s|:\s", activity, maxsplit=1)[0]
+        activity = _clean(activity, max_chars)
+        if activity:
+            items.append(activity)
+        if len(items) >= max_items:
+            break
+    return items
+
+
+def item_names(lines: list, max_items: int = 6, max_chars: int = 40) -> list:
+    """Liste maddelerinden isimler (yemek, müze, festival...)"""
+    names = []
+    for line in lines:
+        match = LIST_ITEM_RE.match(line)
+        if not match:
+            continue
+        text = match.group(1)
+        bold = BOLD_RE.search(text)
+        name = bold.group(1) if bold else re.split(r"\s[-–]\s|:\s|\s\(", text, maxsplit=1)[0]
+        name = _clean(name, max_chars)
+        if name:
+            names.append(name)
+        if len(names) >= max_items:
+            break
+    return names
+
+
+class SectionBuffer:
+    """
+    Akan model çıktısını satır satır bölümlere ayırır. Bir bölüm, sonraki
+    başlık geldiğinde, özütü max_items maddeye ulaştığında ya da akış
+    bittiğinde kapanır ve hemen kısa özütü çıkarılır; bölüm başına tutulan
+    satır sayısı sınırlıdır. expected bölümün hepsi kapanınca (ya da akış
+    bitince) ready işaretlenir: özet, akışın geri kalanını beklemeden başlar.
+    """
+
+    def __init__(self, header_re: re.Pattern, extract, max_sections: int = 14,
+                 max_lines: int = 40, max_items: int = None, expected: int = None):
+        self.header_re = header_re
+        self.extract = extract
+        self.max_sections = max_sections
+        self.max_lines = max_lines
+        self.partial = ""
+        self.title = None
+        self.lines = []
+        self.sections = []  # (başlık, özet maddeleri)
+        self.overflowed = False  # max_sections aşıldı: özet eksik kalır
+        self.max_items = max_items
+        self.expected = expected
+        self.ready = threading.Event()
+
+    def feed(self, text: str):
+        """Yeni token'ları ekle; tamamlanan satırları işle"""
+        self.partial += text
+        if "\n" not in self.partial:
+            return
+        *complete, self.partial = self.partial.split("\n")
+        for line in complete:
+            self._line(line)
+
+    def _line(self, line: str):
+        if not line.strip():
+            return
+        match = self.header_re.match(line)
+        if match:
+            self._close_section()
+            self.title = _clean(next((g for g in match.groups() if g), line), 40)
+            if self.title.isdigit():
+                self.title = f"Day {self.title}"
+        elif self.title is not None and len(self.lines) < self.max_lines:
+            self.lines.append(line)
+            # Özüt doldu: bölümün geri kalanı özeti değiştirmez
+            if self.max_items and LIST_ITEM_RE.match(line) and len(self.extract(self.lines)) >= self.max_items:
+                self._close_section()
+
+    def _close_section(self):
+        if self.title is not None:
+            items = self.extract(self.lines)
+            if items and len(self.sections) < self.max_sections:
+                self.sections.append((self.title, items))
+            elif items:
+                self.overflowed = True
+        self.title = None
+        self.lines = []
+        if self.expected and len(self.sections) >= self.expected:
+            self.ready.set()
+
+    def close(self) -> list:
+        """Akış bitti: son satırı ve bölümü kapat"""
+        if self.partial:
+            self._line(self.partial)
+            self.partial = ""
+        self._close_section()
+        self.ready.set()
+        return self.sections
+
+    def render(self, separator: str = "; ") -> str:
+        """Hazır bölümler; ready'den sonra akış sürse de yalnızca expected bölüm"""
+        sections = self.sections[:self.expected] if self.expected else list(self.sections)
+        return "\n".join(f"{title}: {separator.join(items)}" for title, items in sections)
+
+
+def itinerary_buffer(days: int = None) -> SectionBuffer:
+    """Günde en fazla 3 etkinlik özetlenir; son gün dolunca sonraki ipuçları beklenmez"""
+    return SectionBuffer(DAY_HEADER_RE, day_highlights, max_items=3, expected=days)
+
+
+def experience_buffer() -> SectionBuffer:
+    return SectionBuffer(TOPIC_HEADER_RE, item_names)
@@ -0,0 +1,170 @@
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from core.memory_manager import plan_cache_key
+from core.llm_scheduler import LLMOverloadedError
+from utils.metrics import metrics
+from config.settings import (
+    PLAN_WARM_INTERVAL, PLAN_WARM_TOP_N, PLAN_WARM_MIN_REQUESTS, PLAN_WARM_LOOKBACK_DAYS,
+    PLAN_WARM_REFRESH_MARGIN, PLAN_WARM_CONCURRENCY, PLAN_WARM_DEFAULT_DAYS
+)
+
+WARMER_USER_ID = "plan-warmer"
+
+
+class PlanWarmer:
+    """
+    Popüler plan isteklerini model boştayken önceden hesaplayıp plan cache'ine yazar.
+    Adaylar travel_plans ve favorites tablolarından çıkarılır; cache'te olmayan
+    ya da süresi dolmak üzere olan planlar arka plan önceliğiyle yenilenir.
+    """
+
+    def __init__(self, orchestrator, cache, db, router, scheduler=None,
+                 interval: float = PLAN_WARM_INTERVAL, top_n: int = PLAN_WARM_TOP_N,
+                 concurrency: int = PLAN_WARM_CONCURRENCY):
+        self.orchestrator = orchestrator
+        self.cache = cache
+        self.db = db
+        self.router = router
+        self.scheduler = scheduler
+        self.interval = interval
+        self.top_n = top_n
+        # Her zaman en az bir slot interaktif isteklere kalsın
+        if scheduler is not None:
+            concurrency = min(concurrency, max(1, scheduler.max_concurrent - 1))
+        self.concurrency = concurrency
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.counters = {"rounds": 0, "warmed": 0, "refreshed": 0, "skipped_busy": 0, "failed": 0}
+        self.last_round = None
+        self.last_candidates = []
+
+    # === ADAYLAR ===
+    def candidates(self) -> list:
+        """Ön hesaplanacak (şehir, gün, ilgi alanları) kombinasyonları, popülerlik sırasıyla"""
+        since = (datetime.now() - timedelta(days=PLAN_WARM_LOOKBACK_DAYS)).isoformat()
+        scores = {}
+
+        for row in self.db.get_popular_plan_requests(since, limit=self.top_n * 3):
+            if row["requests"] < PLAN_WARM_MIN_REQUESTS:
+                continue
+            try:
+                days = int(row["days"])
+            except (TypeError, ValueError):
+                continue
+            key = plan_cache_key(row["city"], days, row["interests"])
+            entry = scores.setdefault(key, {
+                "city": row["city"].strip().title(), "days": days,
+                "interests": sorted({i.strip().lower() for i in row["interests"] if i.strip()}),
+                "score": 0.0
+            })
+            # Farklı kullanıcılar tekrarlardan daha değerli
+            entry["score"] += row["users"] + 0.1 * row["requests"]
+
+        # Favori şehirler: varsayılan gün sayısıyla genel plan
+        for row in self.db.get_popular_favorite_cities(since, limit=self.top_n):
+            if row["users"] < PLAN_WARM_MIN_REQUESTS:
+                continue
+            key = plan_cache_key(row["city"], PLAN_WARM_DEFAULT_DAYS, [])
+            entry = scores.setdefault(key, {
+                "city": row["city"].strip().title(), "days": PLAN_WARM_DEFAULT_DAYS,
+                "interests": [], "score": 0.0
+            })
+            entry["score"] += 0.5 * row["users"]
+
+        ranked = sorted(scores.items(), key=lambda item: item[1]["score"], reverse=True)
+        return [dict(entry, key=key) for key, entry in ranked[:self.top_n]]
+
+    def due(self, candidates: list) -> list:
+        """Cache'te olmayan ya da süresi yakında dolacak adaylar"""
+        due = []
+        for candidate in candidates:
+            ttl = self.cache.ttl(candidate["key"])
+            if ttl is None or ttl < PLAN_WARM_REFRESH_MARGIN:
+                due.append(dict(candidate, refresh=ttl is not None))
+        return due
+
+    # === ÇALIŞTIRMA ===
+    def _idle(self) -> bool:
+        return self.scheduler is None or self.scheduler.is_idle()
+
+    def _warm(self, candidate: dict):
+        """Tek bir planı arka plan önceliğiyle hesapla ve cache'e yaz"""
+        if self.stop_event.is_set():
+            return
+        if not self._idle():
+            self._count("skipped_busy")
+            return
+
+        try:
+            with self.router.priority("background"), metrics.span("plan_warmer.plan"):
+                # Yenilemede ajan cache'i atlanır; yoksa aynı çıktı tekrar damgalanır
+                # Sıralı akış: plan başına tek model slotu, böylece concurrency sınırı
+                # (max_concurrent - 1) interaktif isteklere gerçekten bir slot bırakır
+                plan = self.orchestrator.create_complete_plan(
+                    candidate["city"], candidate["days"], candidate["interests"],
+                    user_id=WARMER_USER_ID, reuse=not candidate["refresh"], pipelined=False
+                )
+        except LLMOverloadedError:
+            self._count("skipped_busy")
+            return
+        except Exception as e:
+            print(f"Plan warmer error ({candidate['key']}): {e}")
+            self._count("failed")
+            return
+
+        self.cache.set(candidate["key"], plan)
+        self._count("refreshed" if candidate["refresh"] else "warmed")
+
+    def _count(self, name: str):
+        with self.lock:
+            self.counters[name] += 1
+
+    def run_once(self) -> int:
+        """Bir tur: adayları bul, gerekenleri eşzamanlılık sınırıyla hesapla"""
+        try:
+            candidates = self.candidates()
+        except Exception as e:
+            print(f"Plan warmer error: {e}")
+            return 0
+
+        due = self.due(candidates)
+        with self.lock:
+            self.counters["rounds"] += 1
+            self.last_round = datetime.now().isoformat()
+            self.last_candidates = [c["key"] for c in candidates]
+
+        if not due or not self._idle():
+            return 0
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="plan-warmer") as pool:
+            list(pool.map(self._warm, due))
+        return len(due)
+
+    def _loop(self):
+        while not self.stop_event.wait(self.interval):
+            self.run_once()
+
+    def start(self):
+        """Arka plan thread'ini başlat"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._loop, name="plan-warmer", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return dict(
+                self.counters,
+                running=bool(self.thread and self.thread.is_alive()),
+                concurrency=self.concurrency,
+                last_round=self.last_round,
+                candidates=list(self.last_candidates),
+            )
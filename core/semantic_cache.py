@@ -0,0 +1,149 @@
+import re
+import csv
+import time
+import threading
+from pathlib import Path
+import numpy as np
+from core.embeddings import HashedNgramEmbedder, STOPWORDS, SYNONYMS, TOKEN_RE
+from config.settings import GEOCODE_CENTROIDS_PATH
+
+# Yanıtı değiştiren kısıtlar (diyet, olumsuzluk, kiminle/ne zaman); eş anlamlı kökleriyle
+CONSTRAINT_WORDS = frozenset("""
+vegetarian vegan halal kosher gluten lactose dairy nut nuts seafood pork alcohol
+not no avoid without never except budget luxury kids children family solo couple romantic
+winter summer spring autumn fall night rainy
+""".split())
+
+
+def load_place_names(path: str = GEOCODE_CENTROIDS_PATH) -> list:
+    """Şehir ve ülke adları (yerel şehir tablosundan)"""
+    if not Path(path).exists():
+        return []
+    with open(path, encoding="utf-8") as f:
+        return sorted({name for row in csv.DictReader(f) for name in (row["city"], row["country"]) if name})
+
+
+class SemanticCache:
+    """
+    Birbirine çok benzeyen sorular için yanıt cache'i.
+    İsabet embedding benzerliğiyle belirlenir; ek olarak yer adları, sayılar ve
+    kısıtlar ("vegetarian", "avoid") iki soruda aynı olmalıdır.
+    """
+
+    # Cümle içinde büyük harfle başlayan kelimeler ve sayılar
+    ENTITY_RE = re.compile(r"\b(?:[A-Z][\w'-]+|\d+(?:[.,]\d+)?)\b")
+
+    def __init__(self, max_entries: int = 2048, threshold: float = 0.8,
+                 dim: int = 1024, expiry_seconds: int = 1800, places: list = None):
+        self.embedder = HashedNgramEmbedder(dim=dim)
+        places = load_place_names() if places is None else places
+        # Küçük harfle yazılmış bilinen yerler de yakalanır ("rome", "new york")
+        self.place_re = re.compile(
+            r"\b(" + "|".join(re.escape(p) for p in sorted(places, key=len, reverse=True)) + r")\b",
+            re.IGNORECASE
+        ) if places else None
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.expiry = expiry_seconds
+
+        # Sabit boyutlu indeks: satır i <-> entries[i]
+        self.vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self.last_used = np.zeros(max_entries, dtype=np.float64)
+        self.entries = [None] * max_entries
+        self.size = 0
+        self.lock = threading.Lock()
+
+        # İstatistikler
+        self.lookups = 0
+        self.hits = 0
+        self.seconds_saved = 0.0
+
+    def _entities(self, text: str) -> frozenset:
+        """Birebir eşleşmesi gereken kelimeler: yer adları, sayılar ve kısıtlar"""
+        entities = set()
+        if self.place_re:
+            entities.update(match.lower() for match in self.place_re.findall(text))
+        # Listede olmayan özel isimler; cümle başındaki kelime büyük harfle yazıldığı için sayılmaz
+        for match in self.ENTITY_RE.findall(text.split(None, 1)[1] if " " in text.strip() else ""):
+            word = match.lower().split("'")[0]
+            if word not in STOPWORDS and word not in SYNONYMS:
+                entities.add(word)
+        entities.update(
+            word for word in (SYNONYMS.get(w, w) for w in TOKEN_RE.findall(text.lower())) if word in CONSTRAINT_WORDS
+        )
+        return frozenset(entities)
+
+    def get(self, question: str):
+        """Benzer bir soru daha önce yanıtlandıysa yanıtı döndür"""
+        query = self.embedder.embed(question)
+        entities = self._entities(question)
+        now = time.time()
+
+        with self.lock:
+            self.lookups += 1
+            if self.size == 0:
+                return None
+
+            scores = self.vectors[:self.size] @ query
+            for idx in np.argsort(scores)[::-1]:
+                if scores[idx] < self.threshold:
+                    break
+
+                entry = self.entries[idx]
+                if now - entry["created_at"] > self.expiry:
+                    continue
+                # "rome" sorusu "paris" yanıtını, "vegetarian" sorusu genel yanıtı almamalı
+                if entry["entities"] != entities:
+                    continue
+
+                self.last_used[idx] = now
+                self.hits += 1
+                self.seconds_saved += entry["generation_seconds"]
+                return entry["answer"]
+
+        return None
+
+    def set(self, question: str, answer: str, generation_seconds: float = 0.0):
+        """Yanıtı indekse ekle; doluysa en uzun süre kullanılmayanı çıkar"""
+        if not answer.strip():
+            return
+
+        vector = self.embedder.embed(question)
+        entry = {
+            "question": question,
+            "answer": answer,
+            "entities": self._entities(question),
+            "generation_seconds": generation_seconds,
+            "created_at": time.time(),
+        }
+
+        with self.lock:
+            if self.size < self.max_entries:
+                idx = self.size
+                self.size += 1
+            else:
+                idx = int(np.argmin(self.last_used))
+
+            self.vectors[idx] = vector
+            self.last_used[idx] = entry["created_at"]
+            self.entries[idx] = entry
+
+    def stats(self) -> dict:
+        """Cache isabet oranı ve kazanılan süre"""
+        with self.lock:
+            return {
+                "entries": self.size,
+                "max_entries": self.max_entries,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                "seconds_saved": round(self.seconds_saved, 2),
+            }
+
+    def clear(self):
+        """Tüm cache'i temizle"""
+        with self.lock:
+            self.vectors[:] = 0
+            self.last_used[:] = 0
+            self.entries = [None] * self.max_entries
+            self.size = 0
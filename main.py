@@ -1,54 +1,204 @@
-from langchain_ollama import ChatOllama  # Ollama LLM interface
-from langchain_core.messages import SystemMessage, HumanMessage  # Chat message classes
-from langchain_community.chat_message_histories import ChatMessageHistory  # For chat memory
-
-# Initialize LLaMA model (English)
-llm = ChatOllama(model="llama3.2:3b")  # You can use 'llama3.2:3b' or another local model
-
-# Initialize memory (to store conversation history)
-memory = ChatMessageHistory()
-
-# Welcome message
-print("🤖 Welcome to the Smart Tourism Guide!\n")
-print("🌍 I'm your intelligent travel companion, ready to make your journeys unforgettable.")
-print("✨ I can assist you with trip planning, personalized travel recommendations, and transportation tips.")
-print("🍽️ From local cuisine to cultural heritage, vacation spots, and accommodation options, "
-      "I'll help you discover the most suitable routes and activities for your interests.")
-print("💡 Tell me what kind of experience you're looking for, and let's start exploring together!\n")
-
-# Main loop
-while True:
-    # Get user input
-    user_input = input("You: ")
-
-    # Exit condition
-    if user_input.lower() in ["exit", "quit", "bye"]:
-        print("Bot: ✈️ The Smart Tourism Guide session has ended.")
-        print("Bot: It was a pleasure assisting you! Remember, I’m always here to help with your next journey — "
-              "from destinations to travel tips.")
-        print("Bot: 🌞 Wishing you safe travels, wonderful memories, and an unforgettable adventure ahead!")
-        break
-
-    # Create all required messages for the model: system message + memory + human message
-    messages = [
-        SystemMessage(
-            content=(
-                "You are SmartTour, an intelligent, professional, and friendly tourism assistant. "
-                "You are designed to help users explore the world and plan memorable trips. "
-                "Always respond clearly, kindly, and with enthusiasm. "
-                "Provide detailed, accurate, and inspiring information about destinations, local cuisine, "
-                "cultural and historical landmarks, transportation options, and accommodation suggestions. "
-                "Offer creative itineraries and helpful travel tips that make every journey special."
-            )
-        )
-    ] + memory.messages + [HumanMessage(content=user_input)]
-
-    # Get model response
-    response = llm.invoke(messages)
-
-    # Print bot response
-    print("Bot:", response.content)
-
-    # Save conversation to memory
-    memory.add_user_message(user_input)
-    memory.add_ai_message(response.content)
+"""
+SmartTour command line interface.
+
+Interactive mode streams answers token by token through TourismAssistant
+(tools, local knowledge and response cache included). Conversations are
+stored in the user database and can be resumed with --session; only a
+token-budgeted slice of the history is sent to the model.
+
+Batch mode reads one prompt per line from a file (or "-" for stdin),
+answers them concurrently and writes JSON lines in input order.
+
+Usage:
+    python main.py
+    python main.py --session rome-trip
+    python main.py --batch prompts.txt --workers 4 --output answers.jsonl
+    cat prompts.txt | python main.py --batch -
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import (
+    CLI_HISTORY_TOKENS, CLI_RESUME_TURNS, LLM_MAX_CONCURRENT, OLLAMA_BASE_URLS,
+    SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_DIM, CACHE_EXPIRY
+)
+
+EXIT_COMMANDS = {"exit", "quit", "bye"}
+
+
+def create_services():
+    """Shared, thread-safe components (heavy imports are deferred until here)"""
+    from core.model_router import ModelRouter
+    from core.knowledge_index import KnowledgeIndex
+    from core.semantic_cache import SemanticCache
+    from core.budget_engine import BudgetEngine
+    from core.memory_manager import CacheManager
+    from utils.flight_search import FlightSearchService
+
+    response_cache = SemanticCache(
+        max_entries=SEMANTIC_CACHE_SIZE,
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        dim=SEMANTIC_CACHE_DIM,
+        expiry_seconds=CACHE_EXPIRY
+    )
+    return {"router": ModelRouter(), "knowledge_index": KnowledgeIndex(), "response_cache": response_cache,
+            "budget_engine": BudgetEngine(), "flight_search": FlightSearchService(CacheManager(CACHE_EXPIRY))}
+
+
+def print_welcome():
+    print("🤖 Welcome to the Smart Tourism Guide!\n")
+    print("🌍 I'm your intelligent travel companion, ready to make your journeys unforgettable.")
+    print("✨ I can assist you with trip planning, personalized travel recommendations, and transportation tips.")
+    print("🍽️ From local cuisine to cultural heritage, vacation spots, and accommodation options, "
+          "I'll help you discover the most suitable routes and activities for your interests.")
+    print("💡 Tell me what kind of experience you're looking for, and let's start exploring together!\n")
+
+
+def print_goodbye():
+    print("Bot: ✈️ The Smart Tourism Guide session has ended.")
+    print("Bot: It was a pleasure assisting you! Remember, I’m always here to help with your next journey — "
+          "from destinations to travel tips.")
+    print("Bot: 🌞 Wishing you safe travels, wonderful memories, and an unforgettable adventure ahead!")
+
+
+# === INTERACTIVE MODE ===
+def run_interactive(args) -> int:
+    from core.llm_client import TourismAssistant
+    from core.memory_manager import TokenBudgetHistory
+    from utils.database import UserDatabase
+
+    db = UserDatabase()
+    user_id = f"cli-{args.session}"
+    db.create_user(user_id)
+
+    # Resume: recent turns from the database, trimmed to the token budget
+    history = TokenBudgetHistory(max_tokens=args.history_tokens)
+    previous = [] if args.new else db.get_chat_history(user_id, limit=args.resume_turns)
+    for item in previous:
+        history.add_turn(item["user_message"], item["bot_message"])
+
+    assistant = TourismAssistant(memory=history, user_id=user_id, **create_services())
+
+    print_welcome()
+    if previous:
+        print(f"(Resumed session '{args.session}' with {len(previous)} previous turns. "
+              "Type /clear to forget them.)\n")
+
+    try:
+        while True:
+            try:
+                user_input = input("You: ").strip()
+            except (EOFError, KeyboardInterrupt):
+                print()
+                print_goodbye()
+                break
+
+            if not user_input:
+                continue
+            if user_input.lower() in EXIT_COMMANDS:
+                print_goodbye()
+                break
+            if user_input == "/clear":
+                history.clear()
+                print("Bot: Conversation context cleared.")
+                continue
+
+            # Stream the answer as it is generated
+            print("Bot: ", end="", flush=True)
+            parts = []
+            try:
+                for token in assistant.chat_stream(user_input):
+                    parts.append(token)
+                    print(token, end="", flush=True)
+            except KeyboardInterrupt:
+                print(" [interrupted]")
+                continue
+            except Exception as e:
+                print(f"\nError: {e}")
+                continue
+            print()
+
+            db.save_chat(user_id, user_input, "".join(parts))
+            # The answer is already on screen: refresh the interest summary for the next turn
+            assistant.update_interest_summary()
+    finally:
+        db.close()
+    return 0
+
+
+# === BATCH MODE ===
+def read_prompts(source: str) -> list:
+    """One prompt per line; empty lines and lines starting with '#' are skipped"""
+    stream = sys.stdin if source == "-" else open(source, encoding="utf-8")
+    try:
+        return [line.strip() for line in stream if line.strip() and not line.lstrip().startswith("#")]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def answer_prompt(services: dict, index: int, prompt: str) -> dict:
+    """Answer a single prompt with a fresh, independent conversation"""
+    from core.llm_client import TourismAssistant
+    from core.memory_manager import TokenBudgetHistory
+
+    assistant = TourismAssistant(memory=TokenBudgetHistory(), user_id=f"batch-{index}",
+                                 track_interests=False, **services)
+    started = time.perf_counter()
+    try:
+        answer = "".join(assistant.chat_stream(prompt))
+        return {"index": index, "prompt": prompt, "answer": answer,
+                "seconds": round(time.perf_counter() - started, 3)}
+    except Exception as e:
+        return {"index": index, "prompt": prompt, "error": str(e),
+                "seconds": round(time.perf_counter() - started, 3)}
+
+
+def run_batch(args) -> int:
+    prompts = read_prompts(args.batch)
+    services = create_services()
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+
+    started = time.perf_counter()
+    errors = 0
+    try:
+        # The worker count is the concurrency limit towards the model server
+        with ThreadPoolExecutor(max_workers=max(1, args.workers), thread_name_prefix="batch") as pool:
+            results = pool.map(lambda item: answer_prompt(services, *item), enumerate(prompts))
+            for result in results:  # input order
+                errors += "error" in result
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Answered {len(prompts) - errors}/{len(prompts)} prompts in {elapsed:.1f}s "
+          f"with {args.workers} workers", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SmartTour command line assistant")
+    parser.add_argument("--session", default="default", help="Session name to resume or create")
+    parser.add_argument("--new", action="store_true", help="Do not load previous turns of the session")
+    parser.add_argument("--history-tokens", type=int, default=CLI_HISTORY_TOKENS,
+                        help="Token budget for the history sent to the model")
+    parser.add_argument("--resume-turns", type=int, default=CLI_RESUME_TURNS,
+                        help="Number of stored turns loaded when resuming")
+    parser.add_argument("--batch", metavar="FILE", help="Answer prompts from FILE ('-' for stdin) and exit")
+    parser.add_argument("--workers", type=int, default=LLM_MAX_CONCURRENT * len(OLLAMA_BASE_URLS),
+                        help="Concurrent prompts in batch mode")
+    parser.add_argument("--output", help="JSON lines output file for batch mode (default: stdout)")
+    args = parser.parse_args()
+
+    if args.batch:
+        return run_batch(args)
+    return run_interactive(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+const chatArea = document.getElementById('chatArea');
+const userInput = document.getElementById('userInput');
+const typingIndicator = document.getElementById('typingIndicator');
+let userLocation = null;
+let userCity = "your area";
+
+function sendSuggestion(text) {
+    userInput.value = text;
+    sendMessage();
+}
+
+function parseMarkdown(text) {
+    text = text.replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>');
+    text = text.replace(/^## (.+)$/gm, '<h2>$1</h2>');
+    text = text.replace(/^### (.+)$/gm, '<h3>$1</h3>');
+    text = text.split('\n\n').map(para => {
+        if (!para.match(/^<(h2|h3)/)) {
+            return '<p>' + para.trim() + '</p>';
+        }
+        return para;
+    }).join('\n');
+    return text;
+}
+
+// Tamamlanan paragraflar bir kez işlenir; her token'da tüm mesaj yeniden işlenmez
+const INCREMENTAL_RENDER = true;
+
+function createIncrementalRenderer(container) {
+    const tail = document.createElement('p');
+    container.appendChild(tail);
+    let pending = '';
+
+    return {
+        append(text) {
+            pending += text;
+            const boundary = pending.lastIndexOf('\n\n');
+            if (boundary !== -1) {
+                const completed = pending.slice(0, boundary);
+                if (completed.trim()) {
+                    tail.insertAdjacentHTML('beforebegin', parseMarkdown(completed));
+                }
+                pending = pending.slice(boundary + 2);
+            }
+            tail.textContent = pending;
+        },
+        finish() {
+            if (pending.trim()) {
+                tail.insertAdjacentHTML('beforebegin', parseMarkdown(pending));
+            }
+            tail.remove();
+            pending = '';
+        }
+    };
+}
+
+function createFullRenderer(container) {
+    const parts = [];
+    return {
+        append(text) {
+            parts.push(text);
+            container.textContent = parts.join('');
+        },
+        finish() {
+            container.innerHTML = parseMarkdown(parts.join(''));
+        }
+    };
+}
+
+function addMessage(content, isUser) {
+    const messageDiv = document.createElement('div');
+    messageDiv.className = `message ${isUser ? 'user' : 'bot'}`;
+
+    const avatar = document.createElement('div');
+    avatar.className = `avatar ${isUser ? 'user-avatar' : 'bot-avatar'}`;
+    avatar.textContent = isUser ? '👤' : '🤖';
+
+    const messageContent = document.createElement('div');
+    messageContent.className = `message-content ${isUser ? 'user-message' : 'bot-message'}`;
+
+    if (isUser) {
+        messageContent.textContent = content;
+    } else {
+        messageContent.innerHTML = parseMarkdown(content);
+    }
+
+    messageDiv.appendChild(avatar);
+    messageDiv.appendChild(messageContent);
+    chatArea.appendChild(messageDiv);
+    chatArea.scrollTop = chatArea.scrollHeight;
+}
+
+function showTyping() {
+    typingIndicator.style.display = 'flex';
+    chatArea.scrollTop = chatArea.scrollHeight;
+}
+
+function hideTyping() {
+    typingIndicator.style.display = 'none';
+}
+
+function requestLocation() {
+    if (!navigator.geolocation) {
+        alert("Geolocation not supported");
+        return;
+    }
+
+    document.getElementById("locationText").textContent = "Detecting...";
+
+    navigator.geolocation.getCurrentPosition(
+        async (position) => {
+            userLocation = {
+                lat: position.coords.latitude,
+                lon: position.coords.longitude,
+            };
+            document.getElementById("locationText").textContent = "Location Shared";
+            userInput.value = "What's interesting around me?";
+            await sendMessage();
+        },
+        () => {
+            document.getElementById("locationText").textContent = "Enable Location";
+            alert("Unable to get location");
+        }
+    );
+}
+
+async function sendMessage() {
+    const message = userInput.value.trim();
+    if (!message) return;
+
+    addMessage(message, true);
+    userInput.value = '';
+    showTyping();
+
+    try {
+        const requestBody = { message };
+        if (userLocation) requestBody.location = userLocation;
+
+        const response = await fetch('/chat', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify(requestBody)
+        });
+
+        hideTyping();
+
+        if (!response.ok) {
+            const data = await response.json().catch(() => ({}));
+            addMessage(errorMessage(response, data), false);
+            return;
+        }
+
+        const botMessageDiv = document.createElement('div');
+        botMessageDiv.className = 'message bot';
+
+        const avatar = document.createElement('div');
+        avatar.className = 'avatar bot-avatar';
+        avatar.textContent = '🤖';
+
+        const messageContent = document.createElement('div');
+        messageContent.className = 'message-content bot-message';
+
+        botMessageDiv.appendChild(avatar);
+        botMessageDiv.appendChild(messageContent);
+        chatArea.appendChild(botMessageDiv);
+
+        const renderer = INCREMENTAL_RENDER
+            ? createIncrementalRenderer(messageContent)
+            : createFullRenderer(messageContent);
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+
+            // Bir SSE olayı birden fazla okumaya bölünebilir
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+
+            for (const event of events) {
+                if (event.startsWith('data: ')) {
+                    try {
+                        const data = JSON.parse(event.slice(6));
+                        if (data.token) {
+                            renderer.append(data.token);
+                            chatArea.scrollTop = chatArea.scrollHeight;
+                        }
+                        if (data.done) {
+                            renderer.finish();
+                        }
+                    } catch (e) {}
+                }
+            }
+        }
+    } catch (error) {
+        hideTyping();
+        addMessage('Error: ' + error.message, false);
+    }
+}
+
+function errorMessage(response, data) {
+    // 503: model sunucusu meşgul, 429: istek limiti; Retry-After saniye sonra tekrar denenebilir
+    const wait = response.headers.get('Retry-After') || data.retry_after || 5;
+    if (response.status === 503) {
+        return `⏳ SmartTour is busy right now. Please try again in ${wait} seconds.`;
+    }
+    if (response.status === 429) {
+        return `⏳ You're sending requests too quickly. Please wait ${wait} seconds.`;
+    }
+    return 'Error: ' + (data.error || response.statusText);
+}
+
+async function downloadPDF() {
+    const sampleData = {
+        title: "My Travel Plan",
+        city: "Rome",
+        date: "2025-11-10 to 2025-11-13",
+        plan: ["Day 1: Colosseum", "Day 2: Vatican", "Day 3: Trastevere"],
+        recommendations: ["Try Carbonara", "Visit Trevi Fountain"]
+    };
+
+    try {
+        const response = await fetch("/generate_pdf", {
+            method: "POST",
+            headers: {"Content-Type": "application/json"},
+            body: JSON.stringify(sampleData)
+        });
+
+        if (!response.ok) throw new Error('PDF generation failed');
+
+        const blob = await response.blob();
+        const url = window.URL.createObjectURL(blob);
+        const a = document.createElement("a");
+        a.href = url;
+        a.download = "SmartTour_Plan.pdf";
+        a.click();
+        window.URL.revokeObjectURL(url);
+
+        addMessage("✅ Your travel plan has been downloaded!", false);
+    } catch (error) {
+        addMessage("❌ Sorry, couldn't generate PDF", false);
+    }
+}
+
+async function showPlanCreator() {
+    const city = prompt("Which city? (e.g., Paris, Rome, Tokyo)");
+    if (!city) return;
+
+    const days = prompt("How many days? (e.g., 3, 5, 7)");
+    if (!days) return;
+
+    addMessage(`Creating a ${days}-day plan for ${city}...`, false);
+    showTyping();
+
+    try {
+        const response = await fetch('/create_plan', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({
+                city: city,
+                days: parseInt(days),
+                interests: []
+            })
+        });
+
+        hideTyping();
+        const plan = await response.json();
+        if (!response.ok) {
+            addMessage(errorMessage(response, plan), false);
+            return;
+        }
+        addMessage(plan.full_text, false);
+    } catch (error) {
+        hideTyping();
+        addMessage("Error creating plan", false);
+    }
+}
+
+async function showHistory() {
+    try {
+        const response = await fetch('/user/history');
+        const data = await response.json();
+
+        if (data.success && data.plans.length > 0) {
+            let historyHTML = "📜 Your Travel Plans:\n\n";
+            data.plans.forEach((plan, i) => {
+                historyHTML += `${i+1}. ${plan.title} - ${plan.city}\n`;
+            });
+            addMessage(historyHTML, false);
+        } else {
+            addMessage("You don't have any saved plans yet!", false);
+        }
+    } catch (error) {
+        addMessage("Could not load history", false);
+    }
+}
+
+window.onload = () => {
+    userInput.focus();
+};
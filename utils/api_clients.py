@@ -1,16 +1,40 @@
 import requests
+import functools
+import orjson
 from datetime import datetime
+from utils.metrics import metrics
 from config.settings import (
     OPENWEATHER_API_KEY,
     AVIATIONSTACK_API_KEY,
-    CURRENCYAPI_KEY
+    CURRENCYAPI_KEY,
+    WEATHER_API_URL,
+    AVIATION_API_URL,
+    CURRENCY_API_URL
 )
 
+
+def track_api(api_name: str):
+    """API çağrısının süresini ve başarısız sonuçları metriklere yaz"""
+    def decorator(fn):
+        if not metrics.enabled:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with metrics.timer("smarttour_api_call_seconds", api=api_name):
+                result = fn(*args, **kwargs)
+            if isinstance(result, dict) and not result.get("success", True):
+                metrics.inc("smarttour_api_errors_total", api=api_name)
+            return result
+        return wrapper
+    return decorator
+
 class WeatherAPI:
     """OpenWeatherMap API client"""
-    BASE_URL = "https://api.openweathermap.org/data/2.5/weather"
+    BASE_URL = WEATHER_API_URL
     
     @staticmethod
+    @track_api("weather")
     def get_weather(city_name: str) -> dict:
         """Hava durumu bilgisi al"""
         try:
@@ -49,47 +73,55 @@ class WeatherAPI:
 
 class AviationAPI:
     """Aviationstack API client for flight data"""
-    BASE_URL = "http://api.aviationstack.com/v1/flights"
+    BASE_URL = AVIATION_API_URL
+    NO_FLIGHTS = "No flights found"
     
     @staticmethod
-    def get_flights(dep_iata: str, arr_iata: str, date: str = None) -> dict:
+    @track_api("flights")
+    def get_flights(dep_iata: str, arr_iata: str, date: str = None, limit: int = 5, session=None) -> dict:
         """
         Uçuş bilgisi al
         dep_iata: Kalkış havalimanı kodu (örn: 'IST')
         arr_iata: Varış havalimanı kodu (örn: 'FCO')
         date: YYYY-MM-DD formatında tarih (opsiyonel)
+        limit: Sağlayıcıdan istenen satır sayısı (varsayılan sayfa 100 satırdır)
+        session: Bağlantıları yeniden kullanmak için requests.Session (opsiyonel)
         """
         try:
             params = {
                 "access_key": AVIATIONSTACK_API_KEY,
                 "dep_iata": dep_iata,
                 "arr_iata": arr_iata,
+                "limit": limit,
             }
             
             if date:
                 params["flight_date"] = date
             
-            response = requests.get(AviationAPI.BASE_URL, params=params, timeout=10)
+            response = (session or requests).get(AviationAPI.BASE_URL, params=params, timeout=10)
             
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 
                 if not data.get("data"):
                     return {
                         "success": False,
-                        "error": "No flights found"
+                        "error": AviationAPI.NO_FLIGHTS
                     }
                 
                 flights = []
-                for flight in data["data"][:5]:  # İlk 5 uçuş
+                for flight in data["data"][:limit]:
+                    # Yalnızca gereken alanlar tutulur (canlı konum, uçak vb. atılır)
+                    departure = flight.get("departure") or {}
+                    arrival = flight.get("arrival") or {}
                     flights.append({
-                        "airline": flight["airline"]["name"],
-                        "flight_number": flight["flight"]["iata"],
-                        "departure": flight["departure"]["airport"],
-                        "arrival": flight["arrival"]["airport"],
-                        "dep_time": flight["departure"]["scheduled"],
-                        "arr_time": flight["arrival"]["scheduled"],
-                        "status": flight["flight_status"]
+                        "airline": (flight.get("airline") or {}).get("name"),
+                        "flight_number": (flight.get("flight") or {}).get("iata"),
+                        "departure": departure.get("airport"),
+                        "arrival": arrival.get("airport"),
+                        "dep_time": departure.get("scheduled"),
+                        "arr_time": arrival.get("scheduled"),
+                        "status": flight.get("flight_status")
                     })
                 
                 return {
@@ -127,9 +159,10 @@ class AviationAPI:
 
 class CurrencyAPI:
     """CurrencyAPI.com client"""
-    BASE_URL = "https://api.currencyapi.com/v3/latest"
+    BASE_URL = CURRENCY_API_URL
     
     @staticmethod
+    @track_api("currency")
     def convert(amount: float, from_currency: str, to_currency: str) -> dict:
         """
         Döviz dönüşümü yap
@@ -180,6 +213,7 @@ class CurrencyAPI:
             return {"success": False, "error": str(e)}
     
     @staticmethod
+    @track_api("currency_rates")
     def get_rates(base_currency: str = "USD") -> dict:
         """Tüm döviz kurlarını al"""
         try:
@@ -0,0 +1,79 @@
+import gzip
+import hashlib
+import functools
+import threading
+import zstandard
+from utils.metrics import metrics
+from config.settings import COMPRESSION_MIN_BYTES, COMPRESSION_GZIP_LEVEL, COMPRESSION_ZSTD_LEVEL
+
+# Sunucunun tercih sırası (istemcinin q değerleri eşitse)
+ENCODINGS = ("zstd", "gzip")
+
+_local = threading.local()  # ZstdCompressor thread-safe değil
+
+
+def _zstd_compressor():
+    compressor = getattr(_local, "zstd", None)
+    if compressor is None:
+        compressor = _local.zstd = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL)
+    return compressor
+
+
+@functools.lru_cache(maxsize=256)  # istemcilerin gönderdiği başlık çeşidi azdır
+def negotiate(accept_encoding: str):
+    """Accept-Encoding başlığından desteklenen en iyi kodlama; yoksa None"""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+    wildcard = weights.get("*", 0.0)
+    best = max(ENCODINGS, key=lambda e: (weights.get(e, wildcard), -ENCODINGS.index(e)))
+    return best if weights.get(best, wildcard) > 0 else None
+
+
+def compress(body: bytes, encoding: str, level: int = None) -> bytes:
+    """level verilmezse istek başına sıkıştırma için ayarlanan seviye kullanılır"""
+    if encoding == "zstd":
+        compressor = _zstd_compressor() if level is None else zstandard.ZstdCompressor(level=level)
+        return compressor.compress(body)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=level or COMPRESSION_GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def encode_body(body: bytes, accept_encoding: str, min_bytes: int = COMPRESSION_MIN_BYTES) -> tuple:
+    """Yanıt gövdesini istemcinin kabul ettiği kodlamayla sıkıştır: (gövde, başlıklar)"""
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = negotiate(accept_encoding) if len(body) >= min_bytes else None
+    if encoding is None:
+        return body, headers
+    compressed = compress(body, encoding)
+    metrics.inc("smarttour_response_bytes_total", len(body), encoding=encoding, stage="raw")
+    metrics.inc("smarttour_response_bytes_total", len(compressed), encoding=encoding, stage="sent")
+    headers["Content-Encoding"] = encoding
+    return compressed, headers
+
+
+def make_etag(*parts) -> str:
+    """Parçalardan zayıf ETag (aynı içerik farklı kodlamalarla gönderilebilir)"""
+    digest = hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match başlığı ETag'i içeriyor mu? (zayıf karşılaştırma)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
@@ -1,17 +1,50 @@
 import sqlite3
 import json
+import functools
+import threading
+import re
+import html
 from datetime import datetime
 from pathlib import Path
+from utils.metrics import metrics
 from config.settings import DATABASE_PATH
 
+
+def synchronized(method):
+    """Paylaşılan bağlantı ve cursor'a thread'lerden sırayla eriş (bağlantı ilk çağrıda açılır)"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            if self.conn is None:
+                self._connect()
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class UserDatabase:
     """Kullanıcı oturumları ve geçmişi için SQLite veritabanı"""
     
-    def __init__(self):
-        Path("data").mkdir(exist_ok=True)
-        self.conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False)
+    # İlk sayfada skorlanacak en fazla aday (en yeni kayıtlar); sonraki sayfalarda tarama büyür
+    SEARCH_CANDIDATE_LIMIT = 200
+    
+    def __init__(self, path: str = DATABASE_PATH):
+        # Nesneyi oluşturmak dosyaya dokunmaz: bağlantı ve şema ilk sorguda hazırlanır
+        self.path = path
+        self.conn = None
+        self.cursor = None
+        self.lock = threading.RLock()
+    
+    def _connect(self):
+        """Bağlantıyı aç, tabloları ve arama indeksini hazırla"""
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
         self.cursor = self.conn.cursor()
-        self._create_tables()
+        try:
+            self._create_tables()
+        except Exception:
+            # Yarım kalan şema: bir sonraki çağrı yeniden denesin
+            self.close()
+            raise
     
     def _create_tables(self):
         """Tabloları oluştur"""
@@ -64,8 +97,109 @@ class UserDatabase:
             )
         """)
         
+        # Plan üretim işleri (kalıcı kuyruk)
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS plan_jobs (
+                id TEXT PRIMARY KEY,
+                user_id TEXT,
+                job_key TEXT,
+                params TEXT,
+                status TEXT,
+                attempts INTEGER DEFAULT 0,
+                run_after REAL DEFAULT 0,
+                lease_until REAL DEFAULT 0,
+                claim_token TEXT,
+                result TEXT,
+                error TEXT,
+                created_at TEXT,
+                updated_at TEXT,
+                FOREIGN KEY (user_id) REFERENCES users(user_id)
+            )
+        """)
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_plan_jobs_status ON plan_jobs (status, run_after)"
+        )
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_plan_jobs_user ON plan_jobs (user_id, job_key, status)"
+        )
+        
+        # Kullanıcı başına keyset sayfalama (WHERE user_id = ? AND id < ? ORDER BY id DESC)
+        for table in ("chat_history", "travel_plans", "favorites"):
+            self.cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_user ON {table} (user_id, id)")
+        
+        self._create_search_index()
+        
         self.conn.commit()
     
+    def _create_search_index(self):
+        """Sohbet ve planlar için FTS5 arama indeksini oluştur"""
+        existing = {
+            row[0] for row in self.cursor.execute(
+                "SELECT name FROM sqlite_master WHERE name IN ('chat_history_fts', 'travel_plans_fts')"
+            )
+        }
+        
+        # Sohbet indeksi: chat_history tablosunu içerik kaynağı olarak kullanır
+        self.cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS chat_history_fts USING fts5(
+                user_id, user_message, bot_message,
+                content='chat_history', content_rowid='id',
+                tokenize='porter unicode61 remove_diacritics 2'
+            )
+        """)
+        
+        # Plan indeksi: plan_data JSON'u yerine düz metin tutar
+        self.cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS travel_plans_fts USING fts5(
+                user_id, title, city, body,
+                tokenize='porter unicode61 remove_diacritics 2'
+            )
+        """)
+        
+        # Mevcut kayıtları bir kez indeksle
+        if "chat_history_fts" not in existing:
+            self.cursor.execute("INSERT INTO chat_history_fts(chat_history_fts) VALUES('rebuild')")
+        
+        if "travel_plans_fts" not in existing:
+            rows = self.cursor.execute(
+                "SELECT id, user_id, title, city, plan_data FROM travel_plans"
+            ).fetchall()
+            for plan_id, user_id, title, city, plan_json in rows:
+                try:
+                    plan_data = json.loads(plan_json) if plan_json else {}
+                except ValueError:
+                    plan_data = {}
+                self._index_travel_plan(plan_id, user_id, title, city, plan_data)
+    
+    @staticmethod
+    def _plan_search_text(plan_data) -> str:
+        """Plan verisindeki metinleri aranabilir düz metne çevir"""
+        parts = []
+        
+        def collect(value, key=None):
+            if key == "full_text":  # Diğer alanların tekrarı
+                return
+            if isinstance(value, str):
+                parts.append(value)
+            elif isinstance(value, dict):
+                for k, v in value.items():
+                    collect(v, k)
+            elif isinstance(value, list):
+                for v in value:
+                    collect(v)
+        
+        collect(plan_data)
+        return "\n".join(parts)
+    
+    def _index_travel_plan(self, plan_id: int, user_id: str, title: str, city: str, plan_data):
+        """Planı arama indeksine ekle"""
+        self.cursor.execute("""
+            INSERT INTO travel_plans_fts (rowid, user_id, title, city, body)
+            VALUES (?, ?, ?, ?, ?)
+        """, (plan_id, user_id, title, city, self._plan_search_text(plan_data)))
+    
+    @metrics.timed("smarttour_db_query_seconds", op="create_user")
+    @synchronized
     def create_user(self, user_id: str, preferences: dict = None):
         """Yeni kullanıcı oluştur"""
         try:
@@ -83,6 +217,8 @@ class UserDatabase:
             print(f"DB Error: {e}")
             return False
     
+    @metrics.timed("smarttour_db_query_seconds", op="update_last_active")
+    @synchronized
     def update_last_active(self, user_id: str):
         """Son aktivite zamanını güncelle"""
         now = datetime.now().isoformat()
@@ -91,6 +227,8 @@ class UserDatabase:
         """, (now, user_id))
         self.conn.commit()
     
+    @metrics.timed("smarttour_db_query_seconds", op="save_chat")
+    @synchronized
     def save_chat(self, user_id: str, user_message: str, bot_message: str):
         """Sohbet kaydı kaydet"""
         try:
@@ -101,32 +239,42 @@ class UserDatabase:
                 VALUES (?, ?, ?, ?)
             """, (user_id, timestamp, user_message, bot_message))
             
+            self.cursor.execute("""
+                INSERT INTO chat_history_fts (rowid, user_id, user_message, bot_message)
+                VALUES (?, ?, ?, ?)
+            """, (self.cursor.lastrowid, user_id, user_message, bot_message))
+            
             self.conn.commit()
             return True
         except Exception as e:
             print(f"DB Error: {e}")
             return False
     
-    def get_chat_history(self, user_id: str, limit: int = 10):
-        """Kullanıcının sohbet geçmişini al"""
+    @metrics.timed("smarttour_db_query_seconds", op="get_chat_history")
+    @synchronized
+    def get_chat_history(self, user_id: str, limit: int = 10, before_id: int = None):
+        """Kullanıcının sohbet geçmişini al (before_id: bu kayıttan eski olanlar)"""
         self.cursor.execute("""
-            SELECT timestamp, user_message, bot_message 
+            SELECT id, timestamp, user_message, bot_message 
             FROM chat_history 
-            WHERE user_id = ? 
-            ORDER BY timestamp DESC 
+            WHERE user_id = ? AND id < ?
+            ORDER BY id DESC 
             LIMIT ?
-        """, (user_id, limit))
+        """, (user_id, before_id or 2 ** 63 - 1, limit))
         
         results = self.cursor.fetchall()
         return [
             {
-                "timestamp": r[0],
-                "user_message": r[1],
-                "bot_message": r[2]
+                "id": r[0],
+                "timestamp": r[1],
+                "user_message": r[2],
+                "bot_message": r[3]
             }
             for r in reversed(results)
         ]
     
+    @metrics.timed("smarttour_db_query_seconds", op="save_travel_plan")
+    @synchronized
     def save_travel_plan(self, user_id: str, title: str, city: str, 
                          date_range: str, plan_data: dict):
         """Seyahat planı kaydet"""
@@ -139,34 +287,109 @@ class UserDatabase:
                 VALUES (?, ?, ?, ?, ?, ?)
             """, (user_id, timestamp, title, city, date_range, plan_json))
             
+            plan_id = self.cursor.lastrowid
+            self._index_travel_plan(plan_id, user_id, title, city, plan_data)
+            
             self.conn.commit()
-            return self.cursor.lastrowid
+            return plan_id
         except Exception as e:
             print(f"DB Error: {e}")
             return None
     
-    def get_travel_plans(self, user_id: str):
-        """Kullanıcının tüm planlarını al"""
-        self.cursor.execute("""
-            SELECT id, created_at, title, city, date_range, plan_data
+    @metrics.timed("smarttour_db_query_seconds", op="get_travel_plans")
+    @synchronized
+    def get_travel_plans(self, user_id: str, limit: int = -1, before_id: int = None,
+                         summary: bool = False):
+        """Kullanıcının planlarını al, en yeniden eskiye (summary: plan_data olmadan)"""
+        columns = "id, created_at, title, city, date_range" + ("" if summary else ", plan_data")
+        self.cursor.execute(f"""
+            SELECT {columns}
             FROM travel_plans
-            WHERE user_id = ?
-            ORDER BY created_at DESC
-        """, (user_id,))
+            WHERE user_id = ? AND id < ?
+            ORDER BY id DESC
+            LIMIT ?
+        """, (user_id, before_id or 2 ** 63 - 1, limit))
         
-        results = self.cursor.fetchall()
-        return [
-            {
+        plans = []
+        for r in self.cursor.fetchall():
+            plan = {
                 "id": r[0],
                 "created_at": r[1],
                 "title": r[2],
                 "city": r[3],
-                "date_range": r[4],
-                "plan_data": json.loads(r[5])
+                "date_range": r[4]
             }
-            for r in results
+            if not summary:
+                plan["plan_data"] = json.loads(r[5])
+            plans.append(plan)
+        return plans
+    
+    @metrics.timed("smarttour_db_query_seconds", op="get_travel_plan")
+    @synchronized
+    def get_travel_plan(self, user_id: str, plan_id: int):
+        """Kullanıcının tek bir planı (plan_data dahil); yoksa None"""
+        row = self.cursor.execute("""
+            SELECT id, created_at, title, city, date_range, plan_data
+            FROM travel_plans
+            WHERE id = ? AND user_id = ?
+        """, (plan_id, user_id)).fetchone()
+        
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "created_at": row[1],
+            "title": row[2],
+            "city": row[3],
+            "date_range": row[4],
+            "plan_data": json.loads(row[5])
+        }
+    
+    @metrics.timed("smarttour_db_query_seconds", op="get_popular_plan_requests")
+    @synchronized
+    def get_popular_plan_requests(self, since: str, limit: int = 50):
+        """Son dönemde en çok istenen şehir/gün/ilgi alanı kombinasyonları"""
+        self.cursor.execute("""
+            SELECT city,
+                   json_extract(plan_data, '$.days') AS days,
+                   json_extract(plan_data, '$.interests') AS interests,
+                   COUNT(*) AS requests,
+                   COUNT(DISTINCT user_id) AS users
+            FROM travel_plans
+            WHERE created_at >= ? AND json_extract(plan_data, '$.days') IS NOT NULL
+            GROUP BY lower(city), days, interests
+            ORDER BY users DESC, requests DESC
+            LIMIT ?
+        """, (since, limit))
+        
+        return [
+            {
+                "city": r[0],
+                "days": r[1],
+                "interests": json.loads(r[2]) if r[2] else [],
+                "requests": r[3],
+                "users": r[4]
+            }
+            for r in self.cursor.fetchall()
         ]
     
+    @metrics.timed("smarttour_db_query_seconds", op="get_popular_favorite_cities")
+    @synchronized
+    def get_popular_favorite_cities(self, since: str, limit: int = 50):
+        """En çok favorilere eklenen şehirler"""
+        self.cursor.execute("""
+            SELECT city, COUNT(DISTINCT user_id) AS users
+            FROM favorites
+            WHERE added_at >= ? AND city != ''
+            GROUP BY lower(city)
+            ORDER BY users DESC
+            LIMIT ?
+        """, (since, limit))
+        
+        return [{"city": r[0], "users": r[1]} for r in self.cursor.fetchall()]
+    
+    @metrics.timed("smarttour_db_query_seconds", op="add_favorite")
+    @synchronized
     def add_favorite(self, user_id: str, city: str, category: str, notes: str = ""):
         """Favori şehir/yer ekle"""
         try:
@@ -183,26 +406,383 @@ class UserDatabase:
             print(f"DB Error: {e}")
             return False
     
-    def get_favorites(self, user_id: str):
-        """Kullanıcının favorilerini al"""
+    @metrics.timed("smarttour_db_query_seconds", op="get_favorites")
+    @synchronized
+    def get_favorites(self, user_id: str, limit: int = -1, before_id: int = None):
+        """Kullanıcının favorilerini al, en yeniden eskiye"""
         self.cursor.execute("""
-            SELECT city, category, notes, added_at
+            SELECT id, city, category, notes, added_at
             FROM favorites
-            WHERE user_id = ?
-            ORDER BY added_at DESC
-        """, (user_id,))
+            WHERE user_id = ? AND id < ?
+            ORDER BY id DESC
+            LIMIT ?
+        """, (user_id, before_id or 2 ** 63 - 1, limit))
         
         results = self.cursor.fetchall()
         return [
             {
-                "city": r[0],
-                "category": r[1],
-                "notes": r[2],
-                "added_at": r[3]
+                "id": r[0],
+                "city": r[1],
+                "category": r[2],
+                "notes": r[3],
+                "added_at": r[4]
             }
             for r in results
         ]
     
+    @metrics.timed("smarttour_db_query_seconds", op="get_history_version")
+    @synchronized
+    def get_history_version(self, user_id: str) -> tuple:
+        """Sohbet, plan ve favorilerin (kayıt sayısı, son id) özeti; değişince ETag da değişir"""
+        return self.cursor.execute("""
+            SELECT (SELECT COUNT(*) FROM chat_history WHERE user_id = :u),
+                   (SELECT MAX(id) FROM chat_history WHERE user_id = :u),
+                   (SELECT COUNT(*) FROM travel_plans WHERE user_id = :u),
+                   (SELECT MAX(id) FROM travel_plans WHERE user_id = :u),
+                   (SELECT COUNT(*) FROM favorites WHERE user_id = :u),
+                   (SELECT MAX(id) FROM favorites WHERE user_id = :u)
+        """, {"u": user_id}).fetchone()
+    
+    @metrics.timed("smarttour_db_query_seconds", op="get_recent_plan_cities")
+    @synchronized
+    def get_recent_plan_cities(self, user_id: str, limit: int = 5) -> list:
+        """Son planlardaki farklı şehirler"""
+        rows = self.cursor.execute("""
+            SELECT city FROM travel_plans
+            WHERE user_id = ?
+            ORDER BY id DESC
+            LIMIT ?
+        """, (user_id, limit)).fetchall()
+        return list(dict.fromkeys(r[0] for r in rows))
+    
+    @staticmethod
+    def _build_match_query(query: str, columns: str, user_id: str) -> str:
+        """Kullanıcı sorgusunu güvenli bir FTS5 MATCH ifadesine çevir"""
+        terms = re.findall(r"\w+", query.lower())
+        if not terms:
+            return ""
+        
+        # Her terim tırnak içinde: FTS5 operatörleri kullanıcıdan gelemez
+        text_query = " AND ".join(f'"{term}"' for term in terms[:16])
+        return f'{{{columns}}}: ({text_query}) AND user_id: "{user_id}"'
+    
+    @staticmethod
+    def _rank_candidates(rows, weights):
+        """
+        Aday satırları BM25 benzeri bir skorla puanla.
+        rows: (row, [vurgulanmış alanlar]) çiftleri
+        FTS5 bm25() tüm tablo için terim frekansı saydığından sık geçen
+        kelimelerde yavaşlar; skor yalnızca kullanıcının adayları üzerinden hesaplanır.
+        Skor, ağırlıkların verebileceği en yüksek değere bölünür (0-1): farklı
+        ağırlıklı tabloların sonuçları birleştirilirken karşılaştırılabilir olur.
+        """
+        if not rows:
+            return []
+        
+        lengths = [[len(col.split()) if col else 0 for col in cols] for _, cols in rows]
+        avg_lengths = [max(1.0, sum(l[i] for l in lengths) / len(lengths)) for i in range(len(weights))]
+        
+        max_score = 2.2 * sum(weights)
+        ranked = []
+        for (row, cols), col_lengths in zip(rows, lengths):
+            score = 0.0
+            for col, length, avg, weight in zip(cols, col_lengths, avg_lengths, weights):
+                tf = col.count("\x01") if col else 0
+                if tf:
+                    score += weight * tf * 2.2 / (tf + 1.2 * (0.25 + 0.75 * length / avg))
+            ranked.append((score / max_score, row, cols))
+        
+        return ranked
+    
+    @staticmethod
+    def _make_snippet(text: str, max_words: int = 16) -> str:
+        """Vurgulanmış metinden <mark> etiketli kısa parça üret"""
+        words = text.split()
+        first = next((i for i, w in enumerate(words) if "\x01" in w), 0)
+        start = max(0, first - max_words // 3)
+        part = " ".join(words[start:start + max_words])
+        
+        snippet = html.escape(part).replace("\x01", "<mark>").replace("\x02", "</mark>")
+        if snippet.count("<mark>") > snippet.count("</mark>"):
+            snippet += "</mark>"
+        if start > 0:
+            snippet = "…" + snippet
+        if start + max_words < len(words):
+            snippet += "…"
+        return snippet
+    
+    def search_chat_history(self, user_id: str, query: str, limit: int = 20):
+        """Sohbet geçmişinde tam metin arama"""
+        return self._search_chat_history(user_id, query, limit, max(self.SEARCH_CANDIDATE_LIMIT, limit))[0]
+    
+    @metrics.timed("smarttour_db_query_seconds", op="search_chat_history")
+    @synchronized
+    def _search_chat_history(self, user_id: str, query: str, limit: int, candidates: int) -> tuple:
+        """(sonuçlar, aday sınırı aşıldı mı): en yeni `candidates` eşleşme skorlanır"""
+        match = self._build_match_query(query, "user_message bot_message", user_id)
+        if not match:
+            return [], False
+        
+        self.cursor.execute("""
+            SELECT c.id, c.timestamp, c.user_message,
+                   highlight(chat_history_fts, 1, char(1), char(2)),
+                   highlight(chat_history_fts, 2, char(1), char(2))
+            FROM chat_history_fts
+            JOIN chat_history c ON c.id = chat_history_fts.rowid
+            WHERE chat_history_fts MATCH ?
+            ORDER BY chat_history_fts.rowid DESC
+            LIMIT ?
+        """, (match, candidates + 1))
+        
+        rows = [(r[:3], r[3:]) for r in self.cursor.fetchall()]
+        truncated = len(rows) > candidates
+        rows = rows[:candidates]
+        ranked = self._rank_candidates(rows, weights=(2.0, 1.0))
+        ranked.sort(key=lambda item: (-item[0], -item[1][0]))
+        
+        return [
+            {
+                "type": "chat",
+                "id": row[0],
+                "timestamp": row[1],
+                "title": row[2][:80],
+                "score": round(score, 4),
+                # Eşleşme hangi alandaysa onun parçasını göster
+                "snippet": self._make_snippet(cols[0] if "\x01" in cols[0] else cols[1])
+            }
+            for score, row, cols in ranked[:limit]
+        ], truncated
+    
+    def search_travel_plans(self, user_id: str, query: str, limit: int = 20):
+        """Kayıtlı planlarda tam metin arama"""
+        return self._search_travel_plans(user_id, query, limit, max(self.SEARCH_CANDIDATE_LIMIT, limit))[0]
+    
+    @metrics.timed("smarttour_db_query_seconds", op="search_travel_plans")
+    @synchronized
+    def _search_travel_plans(self, user_id: str, query: str, limit: int, candidates: int) -> tuple:
+        """(sonuçlar, aday sınırı aşıldı mı): en yeni `candidates` eşleşme skorlanır"""
+        match = self._build_match_query(query, "title city body", user_id)
+        if not match:
+            return [], False
+        
+        self.cursor.execute("""
+            SELECT p.id, p.created_at, p.title, p.city,
+                   highlight(travel_plans_fts, 1, char(1), char(2)),
+                   highlight(travel_plans_fts, 2, char(1), char(2)),
+                   highlight(travel_plans_fts, 3, char(1), char(2))
+            FROM travel_plans_fts
+            JOIN travel_plans p ON p.id = travel_plans_fts.rowid
+            WHERE travel_plans_fts MATCH ?
+            ORDER BY travel_plans_fts.rowid DESC
+            LIMIT ?
+        """, (match, candidates + 1))
+        
+        rows = [(r[:4], r[4:]) for r in self.cursor.fetchall()]
+        truncated = len(rows) > candidates
+        rows = rows[:candidates]
+        ranked = self._rank_candidates(rows, weights=(3.0, 3.0, 1.0))
+        ranked.sort(key=lambda item: (-item[0], -item[1][0]))
+        
+        return [
+            {
+                "type": "plan",
+                "id": row[0],
+                "timestamp": row[1],
+                "title": row[2],
+                "city": row[3],
+                "score": round(score, 4),
+                "snippet": self._make_snippet(cols[2] if "\x01" in cols[2] else cols[0])
+            }
+            for score, row, cols in ranked[:limit]
+        ], truncated
+    
+    def search(self, user_id: str, query: str, scope: str = "all",
+               limit: int = 20, offset: int = 0):
+        """
+        Sohbet ve planlarda birleşik, sayfalı arama.
+        Aday taraması sayfayla büyür; truncated=True ise sıralama yalnızca en
+        yeni eşleşmeler üzerindendir (daha eski eşleşmeler sonraki sayfalarda taranır).
+        """
+        # Sayfanın sonrasında kayıt olup olmadığını anlamak için bir fazlasını çek
+        window = offset + limit + 1
+        candidates = max(self.SEARCH_CANDIDATE_LIMIT, window)
+        results = []
+        truncated = False
+        
+        if scope in ("all", "chat"):
+            found, cut = self._search_chat_history(user_id, query, window, candidates)
+            results.extend(found)
+            truncated |= cut
+        if scope in ("all", "plans"):
+            found, cut = self._search_travel_plans(user_id, query, window, candidates)
+            results.extend(found)
+            truncated |= cut
+        
+        results.sort(key=lambda r: r["score"], reverse=True)
+        page = results[offset:offset + limit]
+        
+        return {
+            "results": page,
+            "has_more": len(results) > offset + limit,
+            "truncated": truncated
+        }
+    
+    # === PLAN JOBS ===
+    PLAN_JOB_COLUMNS = ("id", "user_id", "job_key", "params", "status", "attempts",
+                        "run_after", "result", "error", "created_at", "updated_at")
+    PENDING_JOB_STATUSES = ("queued", "running")
+    
+    def _plan_job_row(self, row) -> dict:
+        job = dict(zip(self.PLAN_JOB_COLUMNS, row))
+        job["params"] = json.loads(job["params"]) if job["params"] else {}
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+    
+    @metrics.timed("smarttour_db_query_seconds", op="create_plan_job")
+    @synchronized
+    def create_plan_job(self, job_id: str, user_id: str, job_key: str, params: dict,
+                        max_pending: int = None):
+        """
+        Plan işi ekle. Kullanıcının aynı anahtarlı bekleyen işi varsa onu döndürür.
+        Dönüş: (iş, yeni mi); bekleyen iş sınırı aşılmışsa (None, False)
+        """
+        columns = ", ".join(self.PLAN_JOB_COLUMNS)
+        self.cursor.execute(f"""
+            SELECT {columns} FROM plan_jobs
+            WHERE user_id = ? AND job_key = ? AND status IN ('queued', 'running')
+            ORDER BY created_at LIMIT 1
+        """, (user_id, job_key))
+        existing = self.cursor.fetchone()
+        if existing:
+            return self._plan_job_row(existing), False
+        
+        if max_pending is not None:
+            self.cursor.execute(
+                "SELECT COUNT(*) FROM plan_jobs WHERE user_id = ? AND status IN ('queued', 'running')",
+                (user_id,)
+            )
+            if self.cursor.fetchone()[0] >= max_pending:
+                return None, False
+        
+        now = datetime.now().isoformat()
+        self.cursor.execute("""
+            INSERT INTO plan_jobs (id, user_id, job_key, params, status, created_at, updated_at)
+            VALUES (?, ?, ?, ?, 'queued', ?, ?)
+        """, (job_id, user_id, job_key, json.dumps(params), now, now))
+        self.conn.commit()
+        return self.get_plan_job(job_id), True
+    
+    @metrics.timed("smarttour_db_query_seconds", op="get_plan_job")
+    @synchronized
+    def get_plan_job(self, job_id: str):
+        """Plan işini getir (yoksa None)"""
+        columns = ", ".join(self.PLAN_JOB_COLUMNS)
+        self.cursor.execute(f"SELECT {columns} FROM plan_jobs WHERE id = ?", (job_id,))
+        row = self.cursor.fetchone()
+        return self._plan_job_row(row) if row else None
+    
+    @metrics.timed("smarttour_db_query_seconds", op="claim_plan_job")
+    @synchronized
+    def claim_plan_job(self, claim_token: str, now: float, lease_seconds: float, max_attempts: int = None):
+        """
+        Sıradaki işi al: zamanı gelmiş bekleyen iş ya da süresi dolmuş kiralık iş
+        (çöken/yeniden başlayan worker). Tek UPDATE olduğu için süreçler arası güvenli.
+        Kirası dolan iş bir deneme sayılır; max_attempts denemeyi tüketmişse
+        (ör. her seferinde worker'ı çökertiyorsa) yeniden alınmaz, failed olur.
+        """
+        if max_attempts is not None:
+            self.cursor.execute("""
+                UPDATE plan_jobs
+                SET status = 'failed', claim_token = NULL, updated_at = ?,
+                    error = 'Worker stopped before finishing the job (lease expired ' || attempts || ' times)'
+                WHERE status = 'running' AND lease_until < ? AND attempts >= ?
+            """, (datetime.now().isoformat(), now, max_attempts))
+        self.cursor.execute("""
+            UPDATE plan_jobs
+            SET status = 'running', attempts = attempts + 1, claim_token = ?,
+                lease_until = ?, updated_at = ?
+            WHERE id = (
+                SELECT id FROM plan_jobs
+                WHERE (status = 'queued' AND run_after <= ?)
+                   OR (status = 'running' AND lease_until < ?)
+                ORDER BY created_at LIMIT 1
+            )
+        """, (claim_token, now + lease_seconds, datetime.now().isoformat(), now, now))
+        self.conn.commit()
+        if self.cursor.rowcount == 0:
+            return None
+        
+        columns = ", ".join(self.PLAN_JOB_COLUMNS)
+        self.cursor.execute(f"SELECT {columns} FROM plan_jobs WHERE claim_token = ?", (claim_token,))
+        row = self.cursor.fetchone()
+        return self._plan_job_row(row) if row else None
+    
+    @metrics.timed("smarttour_db_query_seconds", op="extend_plan_job_leases")
+    @synchronized
+    def extend_plan_job_leases(self, claim_tokens: list, lease_until: float) -> list:
+        """Çalışan işlerin kira süresini uzat; artık bu worker'da olmayanları (iptal, kira kaybı) döndür"""
+        lost = []
+        for token in claim_tokens:
+            self.cursor.execute(
+                "UPDATE plan_jobs SET lease_until = ? WHERE claim_token = ? AND status = 'running'",
+                (lease_until, token)
+            )
+            if self.cursor.rowcount == 0:
+                lost.append(token)
+        self.conn.commit()
+        return lost
+    
+    @metrics.timed("smarttour_db_query_seconds", op="update_plan_job")
+    @synchronized
+    def update_plan_job(self, claim_token: str, status: str, result: dict = None,
+                        error: str = None, run_after: float = 0, count_attempt: bool = True) -> bool:
+        """
+        Çalışan işin sonucunu yaz (done/failed) ya da tekrar kuyruğa al (queued).
+        İş bu sırada iptal edildiyse ya da başka worker'a geçtiyse False.
+        """
+        self.cursor.execute("""
+            UPDATE plan_jobs
+            SET status = ?, result = ?, error = ?, run_after = ?, claim_token = NULL,
+                attempts = attempts - ?, updated_at = ?
+            WHERE claim_token = ? AND status = 'running'
+        """, (status, json.dumps(result) if result is not None else None, error, run_after,
+              0 if count_attempt else 1, datetime.now().isoformat(), claim_token))
+        self.conn.commit()
+        return self.cursor.rowcount > 0
+    
+    @metrics.timed("smarttour_db_query_seconds", op="cancel_plan_job")
+    @synchronized
+    def cancel_plan_job(self, job_id: str, user_id: str) -> bool:
+        """Bekleyen ya da çalışan işi iptal et (çalışan işin sonucu atılır)"""
+        self.cursor.execute("""
+            UPDATE plan_jobs SET status = 'cancelled', claim_token = NULL, updated_at = ?
+            WHERE id = ? AND user_id = ? AND status IN ('queued', 'running')
+        """, (datetime.now().isoformat(), job_id, user_id))
+        self.conn.commit()
+        return self.cursor.rowcount > 0
+    
+    @metrics.timed("smarttour_db_query_seconds", op="count_plan_jobs")
+    @synchronized
+    def count_plan_jobs(self) -> dict:
+        """Durum başına iş sayısı"""
+        self.cursor.execute("SELECT status, COUNT(*) FROM plan_jobs GROUP BY status")
+        return dict(self.cursor.fetchall())
+    
+    @metrics.timed("smarttour_db_query_seconds", op="purge_plan_jobs")
+    @synchronized
+    def purge_plan_jobs(self, before: str) -> int:
+        """Belirli tarihten eski, bitmiş işleri sil"""
+        self.cursor.execute("""
+            DELETE FROM plan_jobs
+            WHERE status IN ('done', 'failed', 'cancelled') AND updated_at < ?
+        """, (before,))
+        self.conn.commit()
+        return self.cursor.rowcount
+    
     def close(self):
-        """Bağlantıyı kapat"""
-        self.conn.close()
\ No newline at end of file
+        """Bağlantıyı kapat (hiç açılmadıysa bir şey yapmaz)"""
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+                self.cursor = None
\ No newline at end of file
@@ -0,0 +1,177 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import requests
+from requests.adapters import HTTPAdapter
+from utils.api_clients import AviationAPI
+from utils.metrics import metrics
+from config.settings import (
+    FLIGHT_SEARCH_WORKERS, FLIGHT_RATE_PER_SECOND, FLIGHT_RATE_BURST, FLIGHT_RATE_MAX_WAIT,
+    FLIGHT_ROUTE_LIMIT, FLIGHT_RESULT_LIMIT, FLIGHT_MAX_DATES, FLIGHT_MAX_QUERIES
+)
+
+
+def date_range(start: date, days: int) -> list:
+    """start'tan itibaren days gün (YYYY-MM-DD), en fazla FLIGHT_MAX_DATES"""
+    return [(start + timedelta(days=i)).isoformat() for i in range(max(1, min(days, FLIGHT_MAX_DATES)))]
+
+
+class ProviderRateLimit:
+    """
+    Sağlayıcı geneli token bucket (tüm işçiler tek limiti paylaşır).
+    acquire sıradaki token'ı ayırır ve zamanı gelene kadar bekler.
+    """
+
+    def __init__(self, rate: float = FLIGHT_RATE_PER_SECOND, burst: int = FLIGHT_RATE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, max_wait: float = FLIGHT_RATE_MAX_WAIT) -> bool:
+        """Token al; max_wait'ten uzun beklemek gerekecekse False"""
+        if self.rate <= 0:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+            if wait > max_wait:
+                return False
+            self.tokens -= 1
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+
+class FlightSearchService:
+    """
+    Çoklu havalimanı / tarih aralığı uçuş araması.
+    Her (kalkış, varış, tarih) rotası ayrı bir sorgudur: cache'te yoksa
+    sağlayıcı limitine uyarak paralel sorgulanır; aynı rota için aynı anda
+    tek istek gider. Sağlayıcıdan rota başına yalnızca gereken satır istenir.
+    Sonuçlar birleştirilip kalkış saatine göre sıralanır.
+    """
+
+    def __init__(self, cache, workers: int = FLIGHT_SEARCH_WORKERS, limiter: ProviderRateLimit = None,
+                 per_route: int = FLIGHT_ROUTE_LIMIT, max_queries: int = FLIGHT_MAX_QUERIES,
+                 max_wait: float = FLIGHT_RATE_MAX_WAIT):
+        self.cache = cache
+        self.limiter = limiter or ProviderRateLimit()
+        self.per_route = per_route
+        self.max_queries = max_queries
+        self.max_wait = max_wait
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="flight-search")
+        # İşçiler arasında paylaşılan bağlantı havuzu
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=workers))
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=workers))
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.upstream_calls = 0
+        self.throttled = 0
+
+    @staticmethod
+    def route_key(dep: str, arr: str, day: str = None) -> str:
+        return f"flights:{dep}:{arr}:{day or 'any'}"
+
+    # === ROTA SORGUSU ===
+    def _submit(self, key: str, dep: str, arr: str, day: str):
+        """Rota için çalışan sorgu varsa onu, yoksa yenisini döndür"""
+        with self.lock:
+            future = self.inflight.get(key)
+            if future is None:
+                future = self.inflight[key] = self.executor.submit(self._fetch, key, dep, arr, day)
+            return future
+
+    def _fetch(self, key: str, dep: str, arr: str, day: str) -> dict:
+        try:
+            if not self.limiter.acquire(self.max_wait):
+                with self.lock:
+                    self.throttled += 1
+                metrics.inc("smarttour_api_errors_total", api="flights")
+                return {"success": False, "error": "Flight provider rate limit reached, please try again later"}
+            with self.lock:
+                self.upstream_calls += 1
+            result = AviationAPI.get_flights(dep, arr, day, limit=self.per_route, session=self.session)
+            # Boş rotalar da cache'lenir: tarih aralığında çoğu gün tekrar sorulur
+            if result["success"] or result.get("error") == AviationAPI.NO_FLIGHTS:
+                self.cache.set(key, result)
+            return result
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+
+    # === ARAMA ===
+    def search(self, origins: list, destinations: list, dates: list = None,
+               limit: int = FLIGHT_RESULT_LIMIT) -> dict:
+        """
+        Tüm kalkış x varış x tarih kombinasyonlarını ara.
+        dates verilmezse sağlayıcının varsayılan (güncel) uçuşları kullanılır.
+        Dönen sözlük AviationAPI.get_flights ile aynı biçimdedir.
+        """
+        routes = [
+            (dep.upper(), arr.upper(), day)
+            for dep in dict.fromkeys(origins) for arr in dict.fromkeys(destinations)
+            for day in (dict.fromkeys(dates) if dates else [None])
+            if dep.upper() != arr.upper()
+        ]
+        if not routes:
+            return {"success": False, "error": "No routes to search"}
+        truncated = len(routes) > self.max_queries
+        routes = routes[:self.max_queries]
+
+        # Cache'tekiler hemen, diğerleri paralel
+        results = {}
+        pending = {}
+        for route in routes:
+            key = self.route_key(*route)
+            cached = self.cache.get(key)
+            if cached is not None:
+                results[route] = cached
+            else:
+                pending[route] = self._submit(key, *route)
+        for route, future in pending.items():
+            results[route] = future.result()
+
+        flights, seen, errors = [], set(), []
+        for route in routes:
+            result = results[route]
+            if not result["success"]:
+                if result.get("error") != AviationAPI.NO_FLIGHTS:
+                    errors.append(f"{route[0]}-{route[1]}{' ' + route[2] if route[2] else ''}: {result['error']}")
+                continue
+            for flight in result["flights"]:
+                identity = (flight["flight_number"], flight["dep_time"])
+                if identity not in seen:
+                    seen.add(identity)
+                    flights.append(flight)
+
+        flights.sort(key=lambda f: (f["dep_time"] or "", f["flight_number"] or ""))
+        flights = flights[:limit]
+        if not flights:
+            return {"success": False, "error": errors[0] if errors else AviationAPI.NO_FLIGHTS, "errors": errors}
+        return {
+            "success": True,
+            "flights": flights,
+            "count": len(flights),
+            "routes": len(routes),
+            "truncated": truncated,
+            "errors": errors,
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "inflight": len(self.inflight),
+                "upstream_calls": self.upstream_calls,
+                "throttled": self.throttled,
+                "rate_per_second": self.limiter.rate,
+            }
@@ -0,0 +1,232 @@
+import csv
+import math
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+import requests
+from utils.metrics import metrics
+from config.settings import (
+    NOMINATIM_URL, GEOCODE_GEOHASH_PRECISION, GEOCODE_OFFLINE_ENABLED, GEOCODE_CENTROIDS_PATH,
+    GEOCODE_OFFLINE_MAX_KM, GEOCODE_REMOTE_ENABLED, GEOCODE_REMOTE_WORKERS, GEOCODE_REMOTE_RATE,
+    GEOCODE_NEGATIVE_TTL, GEOCODE_NEGATIVE_MAX
+)
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.2
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(lat: float, lon: float, precision: int = GEOCODE_GEOHASH_PRECISION) -> str:
+    """Koordinatı geohash hücresine çevir (yakın noktalar aynı öneki paylaşır)"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, coord = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def parse_coordinates(location) -> tuple:
+    """İstekteki {"lat", "lon"} değerlerini doğrula; geçersizse None"""
+    try:
+        lat, lon = float(location["lat"]), float(location["lon"])
+    except (TypeError, KeyError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+class CentroidIndex:
+    """
+    Şehir merkezleri için grid tabanlı en yakın komşu araması.
+    Noktalar cell_deg derecelik hücrelere dağıtılır; sorgu yalnızca
+    yarıçapın kapsadığı hücrelerdeki şehirlere mesafe hesaplar.
+    """
+
+    def __init__(self, path: str = GEOCODE_CENTROIDS_PATH, cell_deg: float = 1.0):
+        self.cell_deg = cell_deg
+        self.lon_cells = int(round(360 / cell_deg))
+        self.cities, self.countries, coords = [], [], []
+
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                self.cities.append(row["city"])
+                self.countries.append(row["country"])
+                coords.append((float(row["lat"]), float(row["lon"])))
+
+        coords = np.array(coords, dtype=np.float64).reshape(-1, 2)
+        self.lat_rad = np.radians(coords[:, 0])
+        self.lon_rad = np.radians(coords[:, 1])
+
+        cells = {}
+        for idx, (lat, lon) in enumerate(coords.tolist()):
+            cells.setdefault(self._cell(lat, lon), []).append(idx)
+        self.grid = {cell: np.array(indices) for cell, indices in cells.items()}
+
+    def __len__(self):
+        return len(self.cities)
+
+    def _cell(self, lat: float, lon: float) -> tuple:
+        return int(math.floor(lat / self.cell_deg)), int(math.floor((lon + 180) / self.cell_deg)) % self.lon_cells
+
+    def _candidates(self, lat: float, lon: float, max_km: float):
+        """Yarıçapın kapsadığı hücrelerdeki şehir indeksleri"""
+        row, col = self._cell(lat, lon)
+        lat_span = math.ceil(max_km / KM_PER_DEGREE / self.cell_deg)
+        # Boylam derecesi kutuplara doğru kısalır
+        edge_lat = min(89.9, abs(lat) + lat_span * self.cell_deg)
+        lon_span = math.ceil(max_km / (KM_PER_DEGREE * math.cos(math.radians(edge_lat))) / self.cell_deg)
+        lon_span = min(lon_span, self.lon_cells // 2)
+
+        found = []
+        for r in range(row - lat_span, row + lat_span + 1):
+            for c in range(col - lon_span, col + lon_span + 1):
+                indices = self.grid.get((r, c % self.lon_cells))
+                if indices is not None:
+                    found.append(indices)
+        return np.concatenate(found) if found else None
+
+    def nearest(self, lat: float, lon: float, max_km: float = GEOCODE_OFFLINE_MAX_KM):
+        """En yakın şehir (max_km içinde): {"city", "country", "distance_km"} ya da None"""
+        indices = self._candidates(lat, lon, max_km)
+        if indices is None:
+            return None
+
+        # Haversine mesafesi
+        lat1, lon1 = math.radians(lat), math.radians(lon)
+        dlat = self.lat_rad[indices] - lat1
+        dlon = self.lon_rad[indices] - lon1
+        a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(self.lat_rad[indices]) * np.sin(dlon / 2) ** 2
+        distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+        best = int(np.argmin(distances))
+        distance = float(distances[best])
+        if distance > max_km:
+            return None
+        idx = int(indices[best])
+        return {"city": self.cities[idx], "country": self.countries[idx], "distance_km": round(distance, 1)}
+
+
+class GeocodingService:
+    """
+    Ters geocoding: cache (geohash hücresi) -> yerel şehir tablosu -> Nominatim.
+    Nominatim isteği arka planda çalışır; sonuç aynı hücredeki sonraki
+    isteklere cache'ten döner, ilk yanıt hiçbir zaman ağ çağrısını beklemez.
+    Uzak istekler saniyede `rate` ile sınırlıdır (fazlası atlanır, hücre sonraki
+    istekte yeniden denenir); sonuçsuz hücreler kısa süre tekrar sorulmaz.
+    """
+
+    def __init__(self, cache, centroids: CentroidIndex = None, remote: bool = GEOCODE_REMOTE_ENABLED,
+                 precision: int = GEOCODE_GEOHASH_PRECISION, max_km: float = GEOCODE_OFFLINE_MAX_KM,
+                 workers: int = GEOCODE_REMOTE_WORKERS, rate: float = GEOCODE_REMOTE_RATE,
+                 negative_ttl: float = GEOCODE_NEGATIVE_TTL):
+        self.cache = cache
+        if centroids is None and GEOCODE_OFFLINE_ENABLED and Path(GEOCODE_CENTROIDS_PATH).exists():
+            centroids = CentroidIndex()
+        self.centroids = centroids
+        self.remote = remote
+        self.precision = precision
+        self.max_km = max_km
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="geocode") if remote else None
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_remote = 0.0
+        self.negative_ttl = negative_ttl
+        self.misses = OrderedDict()  # hücre -> tekrar sorulabileceği zaman
+
+    def cell_key(self, lat: float, lon: float) -> str:
+        return f"geo:{geohash(lat, lon, self.precision)}"
+
+    def lookup(self, lat: float, lon: float):
+        """Şehir adını hemen döndür; bilinmiyorsa None (uzak sorgu arka planda başlar)"""
+        key = self.cell_key(lat, lon)
+        city = self.cache.get(key)
+        if city:
+            metrics.inc("smarttour_geocode_lookups_total", source="cache")
+            return city
+
+        if self.centroids is not None:
+            hit = self.centroids.nearest(lat, lon, self.max_km)
+            if hit:
+                metrics.inc("smarttour_geocode_lookups_total", source="offline")
+                self.cache.set(key, hit["city"])
+                return hit["city"]
+
+        if self.remote:
+            self._schedule(key, lat, lon)
+        metrics.inc("smarttour_geocode_lookups_total", source="miss")
+        return None
+
+    def _schedule(self, key: str, lat: float, lon: float):
+        """Aynı hücre için tek bir uzak sorgu; hız sınırı ve negatif cache'e uyarak"""
+        now = time.monotonic()
+        with self.lock:
+            if key in self.pending or self.misses.get(key, 0.0) > now:
+                return
+            if now < self.next_remote:
+                metrics.inc("smarttour_geocode_lookups_total", source="throttled")
+                return
+            self.next_remote = now + self.interval
+            self.pending.add(key)
+        self.executor.submit(self._remote_lookup, key, lat, lon)
+
+    def _remote_lookup(self, key: str, lat: float, lon: float):
+        city = None
+        try:
+            geo_url = f"{NOMINATIM_URL}?format=json&lat={lat}&lon={lon}"
+            with metrics.timer("smarttour_api_call_seconds", api="nominatim"):
+                geo_resp = requests.get(geo_url, headers={"User-Agent": "SmartTour"}, timeout=5)
+            if geo_resp.status_code == 200:
+                address = geo_resp.json().get("address", {})
+                city = address.get("city") or address.get("town") or address.get("village")
+                if city:
+                    self.cache.set(key, city)
+                    metrics.inc("smarttour_geocode_lookups_total", source="remote")
+            else:
+                metrics.inc("smarttour_api_errors_total", api="nominatim")
+        except Exception as e:
+            print(f"Geocoding error: {e}")
+            metrics.inc("smarttour_api_errors_total", api="nominatim")
+        finally:
+            with self.lock:
+                self.pending.discard(key)
+                if not city:
+                    self._remember_miss(key)
+
+    def _remember_miss(self, key: str):
+        self.misses[key] = time.monotonic() + self.negative_ttl
+        self.misses.move_to_end(key)
+        while len(self.misses) > GEOCODE_NEGATIVE_MAX:
+            self.misses.popitem(last=False)
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self.lock:
+            pending = len(self.pending)
+            negative = len(self.misses)
+        return {
+            "offline_cities": len(self.centroids) if self.centroids is not None else 0,
+            "remote": self.remote,
+            "pending": pending,
+            "negative_cells": negative,
+            "precision": self.precision,
+        }
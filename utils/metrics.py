@@ -0,0 +1,197 @@
+import time
+import bisect
+import threading
+import functools
+from contextlib import nullcontext
+from config.settings import METRICS_ENABLED
+
+# Saniye cinsinden varsayılan histogram sınırları
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 40, 80, 160, 320)
+
+_NOOP = nullcontext()
+
+
+class Histogram:
+    """Etiket kombinasyonu başına kümülatif kova sayaçları"""
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.series = {}  # labels -> [kova sayıları, toplam, adet]
+
+    def observe(self, labels: tuple, value: float):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        idx = bisect.bisect_left(self.buckets, value)
+        if idx < len(self.buckets):
+            series[0][idx] += 1
+        series[1] += value
+        series[2] += 1
+
+
+class MetricsRegistry:
+    """Histogram, sayaç ve gösterge değerleri; Prometheus metin formatı"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.families = {}  # name -> (type, help, label names, store)
+        self.gauges = {}  # name -> (help, callback)
+
+    # === KAYIT ===
+    def histogram(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.families[name] = ("histogram", help_text, labels, Histogram(buckets))
+
+    def counter(self, name: str, help_text: str, labels: tuple = ()):
+        self.families[name] = ("counter", help_text, labels, {})
+
+    def gauge(self, name: str, help_text: str, callback):
+        """Okuma anında hesaplanan gösterge: callback -> sayı ya da {etiketler: sayı}"""
+        self.gauges[name] = (help_text, callback)
+
+    # === ÖLÇÜM ===
+    def observe(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        _, _, label_names, store = self.families[name]
+        key = tuple(str(labels.get(label, "")) for label in label_names)
+        with self.lock:
+            store.observe(key, value)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        if not self.enabled:
+            return
+        _, _, label_names, store = self.families[name]
+        key = tuple(str(labels.get(label, "")) for label in label_names)
+        with self.lock:
+            store[key] = store.get(key, 0) + amount
+
+    def timer(self, name: str, **labels):
+        """Blok süresini histograma yazan context manager"""
+        if not self.enabled:
+            return _NOOP
+        return _Timer(self, name, labels)
+
+    def span(self, span_name: str):
+        """İsimli aşama süresi (smarttour_span_seconds)"""
+        return self.timer("smarttour_span_seconds", span=span_name)
+
+    def timed(self, name: str, **labels):
+        """Fonksiyon süresini ölçen decorator (kapalıyken fonksiyonu aynen döndürür)"""
+        def decorator(fn):
+            if not self.enabled:
+                return fn
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - started, **labels)
+            return wrapper
+        return decorator
+
+    # === DIŞA AKTARMA ===
+    @staticmethod
+    def _format_labels(label_names: tuple, values: tuple, extra: str = "") -> str:
+        pairs = [f'{n}="{v}"' for n, v in zip(label_names, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> str:
+        """Prometheus text exposition formatı (v0.0.4)"""
+        lines = []
+        with self.lock:
+            for name, (kind, help_text, label_names, store) in self.families.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind == "counter":
+                    for values, count in store.items():
+                        lines.append(f"{name}{self._format_labels(label_names, values)} {count}")
+                    continue
+
+                for values, (bucket_counts, total, count) in store.series.items():
+                    cumulative = 0
+                    for bound, bucket_count in zip(store.buckets, bucket_counts):
+                        cumulative += bucket_count
+                        le = self._format_labels(label_names, values, f'le="{bound}"')
+                        lines.append(f"{name}_bucket{le} {cumulative}")
+                    le = self._format_labels(label_names, values, 'le="+Inf"')
+                    lines.append(f"{name}_bucket{le} {count}")
+                    lines.append(f"{name}_sum{self._format_labels(label_names, values)} {total}")
+                    lines.append(f"{name}_count{self._format_labels(label_names, values)} {count}")
+
+        for name, (help_text, callback) in self.gauges.items():
+            try:
+                value = callback()
+            except Exception as e:
+                print(f"Metrics gauge error ({name}): {e}")
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            if isinstance(value, dict):
+                for labels, v in value.items():
+                    label_str = ",".join(f'{k}="{val}"' for k, val in labels)
+                    lines.append(f"{name}{{{label_str}}} {v}")
+            else:
+                lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def cache_hit_ratios(self) -> dict:
+        """Cache türü başına isabet oranı"""
+        _, _, _, store = self.families["smarttour_cache_requests_total"]
+        totals = {}
+        with self.lock:
+            for (cache, result), count in store.items():
+                hits, lookups = totals.get(cache, (0, 0))
+                totals[cache] = (hits + (count if result == "hit" else 0), lookups + count)
+        return {
+            (("cache", cache),): round(hits / lookups, 4)
+            for cache, (hits, lookups) in totals.items() if lookups
+        }
+
+
+class _Timer:
+    __slots__ = ("registry", "name", "labels", "started")
+
+    def __init__(self, registry: MetricsRegistry, name: str, labels: dict):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+# === UYGULAMA METRİKLERİ ===
+metrics = MetricsRegistry(enabled=METRICS_ENABLED)
+
+metrics.histogram("smarttour_span_seconds", "Duration of instrumented stages", ("span",))
+metrics.histogram("smarttour_chat_ttft_seconds", "Time from chat request to first streamed token")
+metrics.histogram("smarttour_llm_request_seconds", "LLM call duration by task", ("task",))
+metrics.histogram("smarttour_llm_ttft_seconds", "LLM time to first token by task", ("task",))
+metrics.histogram("smarttour_llm_tokens_per_second", "LLM generation speed by task", ("task",), RATE_BUCKETS)
+metrics.counter("smarttour_llm_tokens_total", "LLM tokens by task and kind (prompt/output)", ("task", "kind"))
+metrics.counter("smarttour_llm_errors_total", "Failed LLM calls by task", ("task",))
+metrics.counter("smarttour_llm_backend_errors_total", "Failed LLM calls by model server", ("backend",))
+metrics.histogram("smarttour_llm_queue_wait_seconds", "Time spent waiting for an LLM slot", ("priority",))
+metrics.counter("smarttour_llm_rejections_total", "LLM requests rejected by the scheduler", ("priority", "reason"))
+metrics.counter("smarttour_rate_limited_total", "Requests rejected by the rate limiter", ("route_class",))
+metrics.histogram("smarttour_api_call_seconds", "External API call duration", ("api",))
+metrics.counter("smarttour_api_errors_total", "Failed external API calls", ("api",))
+metrics.histogram("smarttour_db_query_seconds", "SQLite query duration", ("op",), DB_BUCKETS)
+metrics.counter("smarttour_response_bytes_total", "Compressed response bytes before/after encoding",
+                ("encoding", "stage"))
+metrics.counter("smarttour_cache_requests_total", "Cache lookups by cache and result", ("cache", "result"))
+metrics.counter("smarttour_geocode_lookups_total", "Reverse geocoding lookups by source", ("source",))
+metrics.gauge("smarttour_cache_hit_ratio", "Cache hit ratio since start", metrics.cache_hit_ratios)
@@ -1,6 +1,8 @@
 import os
 from datetime import datetime
 from fpdf import FPDF
+from utils.metrics import metrics
+from config.settings import PDF_OUTPUT_DIR
 
 class SmartTourPDF(FPDF):
     def __init__(self):
@@ -67,6 +69,7 @@ class SmartTourPDF(FPDF):
             self.cell(0, 6, line.strip(), ln=True)
 
 
+@metrics.timed("smarttour_span_seconds", span="pdf.generate")
 def generate_pdf(data, filename):
     """PDF oluştur"""
     try:
@@ -74,7 +77,7 @@ def generate_pdf(data, filename):
         print(f"Data type: {type(data)}")
         print(f"Data keys: {data.keys() if isinstance(data, dict) else 'Not a dict'}")
         
-        output_dir = os.path.join(os.getcwd(), "outputs")
+        output_dir = os.path.join(os.getcwd(), PDF_OUTPUT_DIR)
         os.makedirs(output_dir, exist_ok=True)
         output_path = os.path.join(output_dir, filename)
 
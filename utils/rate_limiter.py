@@ -0,0 +1,282 @@
+import math
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+import numpy as np
+from utils.metrics import metrics
+from config.settings import RATE_LIMITS, RATE_LIMIT_ROUTES, RATE_LIMIT_BACKEND, RATE_LIMIT_DB_PATH
+
+
+def user_key(user_id: str) -> int:
+    """Kullanıcı ID'sini 64-bit anahtara çevir (0 boş slot için ayrılmıştır)"""
+    try:
+        # SessionManager ID'leri zaten 16 haneli hex (64 bit)
+        key = int(user_id, 16) if len(user_id) <= 16 else None
+    except ValueError:
+        key = None
+    if key is None:
+        key = int.from_bytes(hashlib.blake2b(user_id.encode(), digest_size=8).digest(), "big")
+    return key or 1
+
+
+class RateLimitResult:
+    """Tek bir istek için limit kararı ve başlık değerleri"""
+    __slots__ = ("allowed", "limit", "remaining", "reset", "retry_after", "policy")
+
+    def __init__(self, allowed: bool, limit: int, remaining: float, reset: float,
+                 retry_after: float, policy: str):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+        self.retry_after = retry_after
+        self.policy = policy
+
+    def headers(self) -> dict:
+        """IETF RateLimit başlıkları (+ reddedilince Retry-After)"""
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(max(0, int(self.remaining))),
+            "RateLimit-Reset": str(math.ceil(self.reset)),
+            "RateLimit-Policy": self.policy,
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class BucketTable:
+    """
+    Açık adresli hash tablosu: 64-bit anahtar -> (token, son güncelleme).
+    Slot başına ~20 bayt; dolmuş (tekrar tam kapasiteye ulaşmış) kovalar
+    silinmiş sayılır ve süpürme sırasında atılır.
+    """
+
+    MIN_SIZE = 1024
+
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.full_after = capacity / refill_rate  # boş bir kovanın dolma süresi
+        self._allocate(self.MIN_SIZE)
+
+    def _allocate(self, size: int):
+        self.keys = np.zeros(size, dtype=np.uint64)
+        self.tokens = np.zeros(size, dtype=np.float32)
+        self.stamps = np.zeros(size, dtype=np.float64)
+        self.mask = size - 1
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _slot(self, key: int) -> int:
+        """Anahtarın slotu ya da yerleşeceği boş slot (linear probing)"""
+        keys = self.keys
+        idx = (key * 0x9E3779B97F4A7C15 >> 20) & self.mask
+        while True:
+            current = int(keys[idx])
+            if current == key or current == 0:
+                return idx
+            idx = (idx + 1) & self.mask
+
+    def consume(self, key: int, now: float, cost: float = 1.0) -> tuple:
+        """Kovadan token harca; (izin, kalan token) döndür"""
+        idx = self._slot(key)
+        if self.keys[idx] == 0:
+            if self.count + 1 > len(self.keys) // 2:
+                self.sweep(now)
+                idx = self._slot(key)
+            self.keys[idx] = key
+            self.count += 1
+            tokens = self.capacity
+        else:
+            elapsed = now - float(self.stamps[idx])
+            tokens = min(self.capacity, float(self.tokens[idx]) + elapsed * self.refill_rate)
+
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self.tokens[idx] = tokens
+        self.stamps[idx] = now
+        return allowed, tokens
+
+    def sweep(self, now: float):
+        """Dolmuş kovaları at; tabloyu canlı kova sayısına göre büyüterek/küçülterek yeniden kur"""
+        live = (self.keys != 0) & (now - self.stamps < self.full_after)
+        keys, tokens, stamps = self.keys[live], self.tokens[live], self.stamps[live]
+
+        size = self.MIN_SIZE
+        while size < 3 * (len(keys) + 1):
+            size *= 2
+        self._allocate(size)
+        for key, token, stamp in zip(keys.tolist(), tokens.tolist(), stamps.tolist()):
+            idx = self._slot(key)
+            self.keys[idx] = key
+            self.tokens[idx] = token
+            self.stamps[idx] = stamp
+        self.count = len(keys)
+
+    def memory_bytes(self) -> int:
+        return self.keys.nbytes + self.tokens.nbytes + self.stamps.nbytes
+
+
+class MemoryBucketStore:
+    """Süreç içi kova deposu (sınıf başına bir BucketTable)"""
+
+    def __init__(self, limits: dict, sweep_interval: float = 60.0):
+        self.tables = {
+            name: BucketTable(limit["capacity"], limit["refill_per_second"])
+            for name, limit in limits.items()
+        }
+        self.lock = threading.Lock()
+        self.sweep_interval = sweep_interval
+        self.last_sweep = None
+
+    def consume(self, route_class: str, key: int, now: float, cost: float = 1.0) -> tuple:
+        with self.lock:
+            if self.last_sweep is None:
+                self.last_sweep = now
+            elif now - self.last_sweep > self.sweep_interval:
+                for table in self.tables.values():
+                    table.sweep(now)
+                self.last_sweep = now
+            return self.tables[route_class].consume(key, now, cost)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                name: {"buckets": len(table), "memory_kb": round(table.memory_bytes() / 1024, 1)}
+                for name, table in self.tables.items()
+            }
+
+
+class SqliteBucketStore:
+    """
+    Birden fazla worker süreci arasında paylaşılan kova deposu.
+    Her karar tek bir IMMEDIATE transaction içinde okunup yazılır.
+    """
+
+    def __init__(self, limits: dict, db_path: str = RATE_LIMIT_DB_PATH, sweep_interval: float = 60.0):
+        self.limits = limits
+        self.db_path = db_path
+        self.sweep_interval = sweep_interval
+        self.last_sweep = 0.0
+        self.local = threading.local()
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                route_class TEXT NOT NULL,
+                bucket_key INTEGER NOT NULL,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (route_class, bucket_key)
+            ) WITHOUT ROWID
+        """)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def consume(self, route_class: str, key: int, now: float, cost: float = 1.0) -> tuple:
+        limit = self.limits[route_class]
+        capacity, rate = limit["capacity"], limit["refill_per_second"]
+        key = key - (1 << 64) if key >= (1 << 63) else key  # SQLite INTEGER işaretli
+
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM rate_buckets WHERE route_class = ? AND bucket_key = ?",
+                (route_class, key)
+            ).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (route_class, bucket_key, tokens, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (route_class, key, tokens, now)
+            )
+            if now - self.last_sweep > self.sweep_interval:
+                self._sweep(conn, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, tokens
+
+    def _sweep(self, conn: sqlite3.Connection, now: float):
+        """Tekrar dolmuş kovaları sil"""
+        for route_class, limit in self.limits.items():
+            conn.execute(
+                "DELETE FROM rate_buckets WHERE route_class = ? AND updated_at < ?",
+                (route_class, now - limit["capacity"] / limit["refill_per_second"])
+            )
+        self.last_sweep = now
+
+    def stats(self) -> dict:
+        rows = self._connection().execute(
+            "SELECT route_class, COUNT(*) FROM rate_buckets GROUP BY route_class"
+        ).fetchall()
+        counts = dict(rows)
+        return {name: {"buckets": counts.get(name, 0)} for name in self.limits}
+
+
+class RateLimiter:
+    """Endpoint sınıfı ve kullanıcı başına token-bucket limitleri"""
+
+    def __init__(self, limits: dict = None, routes: dict = None, backend: str = RATE_LIMIT_BACKEND,
+                 clock=time.time):
+        self.limits = limits or RATE_LIMITS
+        self.routes = routes or RATE_LIMIT_ROUTES
+        self.clock = clock
+        if backend == "sqlite":
+            self.store = SqliteBucketStore(self.limits)
+        else:
+            self.store = MemoryBucketStore(self.limits)
+        self.backend = backend
+        # SQLite kararı disk I/O ve kilit beklemesi içerir: async kod thread havuzunda çağırmalı
+        self.blocking = backend == "sqlite"
+        # Uzun önekler önce: "/user/search" > "/user"
+        self._prefixes = sorted(self.routes.items(), key=lambda item: len(item[0]), reverse=True)
+        self.policies = {
+            name: f"{limit['capacity']};w={round(limit['capacity'] / limit['refill_per_second'])}"
+            for name, limit in self.limits.items()
+        }
+
+    def classify(self, path: str):
+        """İstek yolunun endpoint sınıfı (limitsiz yollar için None)"""
+        for prefix, route_class in self._prefixes:
+            if path == prefix or path.startswith(prefix.rstrip("/") + "/"):
+                return route_class
+        return None
+
+    def hit(self, route_class: str, user_id: str, cost: float = 1.0) -> RateLimitResult:
+        """İsteği say ve kararı döndür"""
+        limit = self.limits[route_class]
+        capacity, rate = limit["capacity"], limit["refill_per_second"]
+        allowed, tokens = self.store.consume(route_class, user_key(user_id), self.clock(), cost)
+
+        if not allowed:
+            metrics.inc("smarttour_rate_limited_total", route_class=route_class)
+        return RateLimitResult(
+            allowed=allowed,
+            limit=capacity,
+            remaining=tokens,
+            reset=(capacity - tokens) / rate,
+            retry_after=(cost - tokens) / rate if not allowed else 0.0,
+            policy=self.policies[route_class],
+        )
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "classes": self.store.stats()}
@@ -0,0 +1,103 @@
+import time
+import asyncio
+import orjson
+
+_END = object()
+
+
+def sse_event(payload: dict) -> bytes:
+    """Tek bir SSE olayı (orjson ile)"""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+
+class TokenFramer:
+    """
+    Model token'larını zaman ve boyut sınırlı SSE çerçevelerinde birleştirir.
+    İlk token beklemeden gönderilir (TTFT artmaz); sonrakiler max_interval
+    süresi dolana ya da max_bytes aşılana kadar tamponda toplanır.
+    """
+
+    def __init__(self, max_bytes: int = 512, max_interval: float = 0.05, clock=time.perf_counter):
+        self.max_bytes = max_bytes
+        self.max_interval = max_interval
+        self.clock = clock
+        self.buffer = []
+        self.buffered_bytes = 0
+        self.last_flush = None
+        self.frames = 0
+        self.bytes_sent = 0
+
+    def push(self, token: str):
+        """Token'ı tampona ekle; çerçeve hazırsa SSE baytlarını döndür"""
+        if not token:
+            return None
+
+        self.buffer.append(token)
+        self.buffered_bytes += len(token)
+
+        now = self.clock()
+        if (self.last_flush is None or
+                self.buffered_bytes >= self.max_bytes or
+                now - self.last_flush >= self.max_interval):
+            return self.flush(now)
+        return None
+
+    def flush(self, now: float = None):
+        """Tampondaki token'ları tek çerçeve olarak döndür"""
+        if not self.buffer:
+            return None
+
+        frame = sse_event({"token": "".join(self.buffer)})
+        self.buffer.clear()
+        self.buffered_bytes = 0
+        self.last_flush = now if now is not None else self.clock()
+        self.frames += 1
+        self.bytes_sent += len(frame)
+        return frame
+
+    def frame_stream(self, tokens):
+        """
+        Token iterator'ını SSE çerçeve iterator'ına çevir.
+        Süre sınırı yalnızca yeni token gelince kontrol edilir; model duraklarsa
+        tampondaki parça bekler. Zamanlayıcılı sürüm: aframe_stream.
+        """
+        for token in tokens:
+            frame = self.push(token)
+            if frame:
+                yield frame
+        tail = self.flush()
+        if tail:
+            yield tail
+
+    async def aframe_stream(self, tokens, run_sync):
+        """
+        Senkron token iterator'ından async SSE çerçeveleri; tampon, yeni token
+        beklenmeden en geç max_interval sonunda gönderilir.
+        run_sync(fn, *args): fn'i thread havuzunda çalıştıran awaitable (ör. run_in_threadpool)
+        """
+        iterator = iter(tokens)
+        pending = None
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(run_sync(next, iterator, _END))
+            timeout = None
+            if self.buffer:
+                timeout = max(0.0, self.last_flush + self.max_interval - self.clock())
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                # Model yavaş: bekleyen parçayı şimdi gönder, token'ı beklemeye devam et
+                frame = self.flush()
+                if frame:
+                    yield frame
+                continue
+
+            token, pending = pending.result(), None
+            if token is _END:
+                break
+            frame = self.push(token)
+            if frame:
+                yield frame
+
+        tail = self.flush()
+        if tail:
+            yield tail
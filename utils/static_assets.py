@@ -0,0 +1,93 @@
+import hashlib
+import mimetypes
+from pathlib import Path
+from utils.compression import ENCODINGS, compress, negotiate, etag_matches
+from utils.metrics import metrics
+from config.settings import (
+    STATIC_DIR, STATIC_GZIP_LEVEL, STATIC_ZSTD_LEVEL, COMPRESSION_MIN_BYTES
+)
+
+LEVELS = {"zstd": STATIC_ZSTD_LEVEL, "gzip": STATIC_GZIP_LEVEL}
+
+
+class StaticAsset:
+    """Bellekte hazır yanıt: ham gövde, sıkıştırılmış kopyaları ve içerik özeti"""
+    __slots__ = ("media_type", "digest", "variants")
+
+    def __init__(self, body: bytes, media_type: str, min_bytes: int = COMPRESSION_MIN_BYTES):
+        if media_type.startswith("text/") or media_type.endswith("javascript"):
+            media_type += "; charset=utf-8"
+        self.media_type = media_type
+        self.digest = hashlib.sha256(body).hexdigest()[:20]
+        self.variants = {None: body}
+        if len(body) >= min_bytes:
+            for encoding in ENCODINGS:
+                compressed = compress(body, encoding, LEVELS[encoding])
+                if len(compressed) < len(body):
+                    self.variants[encoding] = compressed
+
+    @property
+    def version(self) -> str:
+        return self.digest[:12]
+
+    def etag(self, encoding: str = None) -> str:
+        """Strong ETag; her kodlama ayrı bir temsil olduğundan etiketi de ayrı"""
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+    def select(self, accept_encoding: str, if_none_match: str, cache_control: str) -> tuple:
+        """İsteğe uyan temsil: (durum kodu, gövde, başlıklar); ETag eşleşirse 304"""
+        encoding = negotiate(accept_encoding)
+        if encoding not in self.variants:
+            encoding = None
+        etag = self.etag(encoding)
+        headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if etag_matches(if_none_match, etag):
+            return 304, b"", headers
+        if encoding:
+            headers["Content-Encoding"] = encoding
+            metrics.inc("smarttour_response_bytes_total", len(self.variants[None]), encoding=encoding, stage="raw")
+            metrics.inc("smarttour_response_bytes_total", len(self.variants[encoding]), encoding=encoding,
+                        stage="sent")
+        return 200, self.variants[encoding], headers
+
+    def as_dict(self) -> dict:
+        return {encoding or "identity": len(body) for encoding, body in self.variants.items()}
+
+
+class StaticAssets:
+    """
+    Statik dosyalar ve önceden işlenmiş sayfalar.
+    Her dosya başlangıçta bir kez okunup sıkıştırılır; istek başına yalnızca
+    kodlama seçimi ve ETag karşılaştırması yapılır. Dosya URL'leri içerik
+    özetiyle sürümlenir (?v=...), böylece tarayıcıda süresiz önbelleklenebilir.
+    """
+
+    def __init__(self, directory: str = STATIC_DIR, prefix: str = "/static/"):
+        self.prefix = prefix
+        self.files = {}
+        self.pages = {}
+        root = Path(directory)
+        if root.is_dir():
+            for path in sorted(root.rglob("*")):
+                if path.is_file():
+                    name = path.relative_to(root).as_posix()
+                    media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                    self.files[name] = StaticAsset(path.read_bytes(), media_type)
+
+    def url(self, name: str) -> str:
+        """Şablonlar için sürümlü dosya URL'i"""
+        return f"{self.prefix}{name}?v={self.files[name].version}"
+
+    def get(self, name: str):
+        return self.files.get(name)
+
+    def add_page(self, name: str, html: str) -> StaticAsset:
+        """İstek başına değişmeyen, önceden işlenmiş HTML sayfası"""
+        page = self.pages[name] = StaticAsset(html.encode(), "text/html")
+        return page
+
+    def stats(self) -> dict:
+        return {
+            "files": {name: asset.as_dict() for name, asset in self.files.items()},
+            "pages": {name: asset.as_dict() for name, asset in self.pages.items()},
+        }